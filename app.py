@@ -6,9 +6,12 @@ from pathlib import Path
 import streamlit as st
 
 from src.logging_config import setup_logging
+from src.portfolios import create_portfolio
+from src.ui_helpers import portfolio_selector
 
 ROOT = Path(__file__).resolve().parent
-sys.path.append(str(ROOT))
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
 
 setup_logging()
 st.set_page_config(page_title="Controle de Investimentos", layout="wide")
@@ -24,5 +27,20 @@ Bem-vindo! Use o menu lateral para navegar entre as páginas:
 - **Ativos (Carteira)**: posições atuais e atualização de preços.
 - **Comparação CDI**: performance da carteira versus CDI.
 - **Dashboard (Alocação)**: gráficos de distribuição.
+- **Consolidado**: todas as carteiras somadas.
+
+Cada carteira é um banco separado; escolha a carteira ativa na barra lateral.
 """
 )
+
+portfolio_selector()
+with st.sidebar.form("nova_carteira", clear_on_submit=True):
+    nome = st.text_input("Nova carteira")
+    if st.form_submit_button("Criar"):
+        try:
+            portfolio = create_portfolio(nome)
+        except ValueError as exc:
+            st.error(str(exc))
+        else:
+            st.session_state["carteira"] = portfolio.nome
+            st.rerun()
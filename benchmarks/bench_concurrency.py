@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from benchmarks.bench_positions import synthetic_frame
+from src.db import EngineSettings, make_engine
+from src.importer import insert_transactions
+from src.models import Asset, Base, Price, Transaction
+from src.queries import latest_prices
+
+
+def transaction_chunks(size: int, chunk_size: int, n_assets: int) -> list[list[dict]]:
+    df = synthetic_frame(size, n_assets)
+    df["data"] = df["data"].dt.date
+    df["valor_total"] = df["preco_unit"] * df["quantidade"]
+    # Distinct results keep every row unique under the natural key.
+    df["resultado"] = np.arange(size, dtype=float)
+    df["ganhos"] = df["resultado"]
+    records = df.astype(object).to_dict("records")
+    return [records[start : start + chunk_size] for start in range(0, size, chunk_size)]
+
+
+def seed(engine, n_assets: int) -> None:
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Asset), [{"id": i, "nome": f"ATIVO{i:04d}"} for i in range(1, n_assets + 1)])
+        conn.execute(
+            insert(Price),
+            [
+                {"asset_id": i, "data": date(2024, 1, 2), "preco": 10.0, "fonte": "manual"}
+                for i in range(1, n_assets + 1)
+            ],
+        )
+
+
+def run(write_engine, read_engine, chunks: list[list[dict]], readers: int) -> dict[str, float]:
+    WriteSession = sessionmaker(bind=write_engine, future=True)
+    ReadSession = sessionmaker(bind=read_engine, future=True)
+    latencies: list[float] = []
+    errors = {"leitura": 0, "escrita": 0}
+    done = threading.Event()
+
+    def writer() -> None:
+        for chunk in chunks:
+            try:
+                with WriteSession() as session:
+                    insert_transactions(session, chunk)
+                    session.commit()
+            except OperationalError:
+                errors["escrita"] += 1
+        done.set()
+
+    def reader(asset_id: int) -> None:
+        while not done.is_set():
+            start = time.perf_counter()
+            try:
+                with ReadSession() as session:
+                    latest_prices(session)
+                    session.execute(
+                        select(func.sum(Transaction.quantidade)).where(Transaction.asset_id == asset_id)
+                    ).scalar()
+                latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                errors["leitura"] += 1
+
+    threads = [threading.Thread(target=reader, args=(i + 1,)) for i in range(readers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    writer()
+    elapsed = time.perf_counter() - start
+    for thread in threads:
+        thread.join()
+
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "importação (s)": elapsed,
+        "leituras": len(latencies),
+        "p50 (ms)": float(np.percentile(ms, 50)),
+        "p95 (ms)": float(np.percentile(ms, 95)),
+        "máx (ms)": float(ms.max()),
+        "erros leitura": errors["leitura"],
+        "erros escrita": errors["escrita"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Leitores concorrentes durante uma importação em lotes.")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--assets", type=int, default=500)
+    args = parser.parse_args()
+
+    chunks = transaction_chunks(args.rows, args.chunk_size, args.assets)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "padrao.db"
+        engine = create_engine(f"sqlite:///{path}", future=True)
+        seed(engine, args.assets)
+        results["padrão"] = run(engine, engine, chunks, args.readers)
+        engine.dispose()
+
+        path = Path(tmp) / "wal.db"
+        settings = EngineSettings.from_env()
+        write_engine = make_engine(path, settings)
+        read_engine = make_engine(path, settings, read_only=True)
+        seed(write_engine, args.assets)
+        results["WAL"] = run(write_engine, read_engine, chunks, args.readers)
+        write_engine.dispose()
+        read_engine.dispose()
+
+    metrics = list(results["WAL"])
+    print(f"{'':>16}" + "".join(f"{name:>12}" for name in results))
+    for metric in metrics:
+        print(f"{metric:>16}" + "".join(f"{results[name][metric]:>12.1f}" for name in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from benchmarks.bench_positions import synthetic_frame
+from src.services.portfolio import equity_curve
+
+
+def daily_prices(n_assets: int, years: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2005-01-01", periods=years * 252)
+    return pd.DataFrame(
+        {
+            "asset_id": np.repeat(np.arange(1, n_assets + 1), len(dates)),
+            "data": np.tile(dates.to_numpy(), n_assets),
+            "preco": rng.uniform(1.0, 200.0, n_assets * len(dates)),
+        }
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mede equity_curve em uma carteira sintética.")
+    parser.add_argument("--assets", type=int, default=500)
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--transactions", type=int, default=200_000)
+    args = parser.parse_args()
+
+    transactions = synthetic_frame(args.transactions, args.assets)
+    prices = daily_prices(args.assets, args.years)
+    for label, history in [("sem prices", None), (f"{len(prices):,} prices", prices)]:
+        for freq in ("D", "B"):
+            start = time.perf_counter()
+            curve = equity_curve(transactions, history, freq=freq)
+            elapsed = time.perf_counter() - start
+            print(f"{label:>20} freq={freq}: {len(curve):,} datas x {args.assets} ativos em {elapsed:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from src.models import Transaction
+from src.services.portfolio import compute_positions, compute_positions_frame
+
+
+def synthetic_frame(n: int, n_assets: int = 500, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(date(2005, 1, 1))
+    return pd.DataFrame(
+        {
+            "asset_id": rng.integers(1, n_assets + 1, n),
+            "data": start + rng.integers(0, 365 * 20, n).astype("timedelta64[D]"),
+            "tipo": np.where(rng.random(n) < 0.7, "BUY", "SELL"),
+            "preco_unit": rng.uniform(1.0, 200.0, n).round(2),
+            "quantidade": rng.integers(1, 100, n).astype(float),
+            "taxas": rng.uniform(0.0, 5.0, n).round(2),
+        }
+    )
+
+
+def to_transactions(df: pd.DataFrame) -> list[Transaction]:
+    epoch = date(1970, 1, 1)
+    days = df["data"].to_numpy("datetime64[D]").astype(np.int64)
+    return [
+        Transaction(
+            asset_id=int(asset_id),
+            data=epoch + timedelta(days=int(day)),
+            tipo=tipo,
+            preco_unit=float(preco),
+            quantidade=float(qty),
+            taxas=float(taxas),
+        )
+        for asset_id, day, tipo, preco, qty, taxas in zip(
+            df["asset_id"], days, df["tipo"], df["preco_unit"], df["quantidade"], df["taxas"]
+        )
+    ]
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compara compute_positions (loop) com compute_positions_frame.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'transações':>12} {'loop (s)':>10} {'frame (s)':>10} {'speedup':>8}")
+    for size in args.sizes:
+        df = synthetic_frame(size)
+        transactions = to_transactions(df)
+        loop = best_of(lambda: compute_positions(transactions), args.repeat)
+        frame = best_of(lambda: compute_positions_frame(df), args.repeat)
+        print(f"{size:>12,} {loop:>10.3f} {frame:>10.3f} {loop / frame:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
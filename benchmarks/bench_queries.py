@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from benchmarks.bench_positions import synthetic_frame
+from src.models import Asset, Base, Transaction
+from src.queries import transactions_frame
+from src.services.portfolio import transactions_to_frame
+
+
+def build_database(path: Path, size: int, n_assets: int = 500) -> None:
+    engine = create_engine(f"sqlite:///{path}", future=True)
+    Base.metadata.create_all(engine)
+    df = synthetic_frame(size, n_assets)
+    df["data"] = df["data"].dt.date
+    df["valor_total"] = df["preco_unit"] * df["quantidade"]
+    df["resultado"] = np.where(df["tipo"] == "SELL", 0.0, np.nan)
+    df["ganhos"] = df["resultado"]
+    records = df.astype(object).where(df.notna(), None).to_dict("records")
+    with engine.begin() as conn:
+        conn.execute(insert(Asset), [{"id": i, "nome": f"ATIVO{i:04d}"} for i in range(1, n_assets + 1)])
+        conn.execute(insert(Transaction), records)
+    engine.dispose()
+
+
+def measure(func) -> tuple[float, float]:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024**2
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compara a carga via ORM com transactions_frame.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 500_000])
+    args = parser.parse_args()
+
+    print(f"{'transações':>12} {'ORM (s)':>9} {'ORM (MiB)':>10} {'frame (s)':>10} {'frame (MiB)':>12}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "bench.db"
+            build_database(path, size)
+            engine = create_engine(f"sqlite:///{path}", future=True)
+            Session = sessionmaker(bind=engine, future=True)
+
+            def orm_path() -> None:
+                with Session() as session:
+                    transactions_to_frame(session.query(Transaction).all())
+
+            def frame_path() -> None:
+                with Session() as session:
+                    transactions_frame(session)
+
+            orm_time, orm_peak = measure(orm_path)
+            frame_time, frame_peak = measure(frame_path)
+            engine.dispose()
+        print(f"{size:>12,} {orm_time:>9.2f} {orm_peak:>10.1f} {frame_time:>10.2f} {frame_peak:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# Kept apart from suite.py, whose own imports would warm up pandas and src
+# before the clock starts. Streamlit is imported first: every page pays for it
+# alike, and it is not ours to trim.
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tempo da primeira execução de uma página em um processo novo.")
+    parser.add_argument("script", type=Path, help="app.py ou uma das páginas")
+    args = parser.parse_args()
+
+    sys.path.append(str(ROOT))
+    start = time.perf_counter()
+    app = AppTest.from_file(str(args.script), default_timeout=600).run()
+    seconds = time.perf_counter() - start
+    if app.exception:
+        raise SystemExit(f"{args.script.name}: {app.exception[0].value}")
+    print(seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from benchmarks.synthetic import generate_portfolio, write_database, write_workbook
+from src.importer import import_excel_streaming
+from src.ledger import SnapshotStore, read_ledger
+from src.migrations import migrate
+from src.models import Base
+from src.queries import (
+    assets_frame,
+    dividends_frame,
+    last_trade_prices_frame,
+    latest_prices,
+    latest_prices_frame,
+    prices_frame,
+    transactions_frame,
+)
+from src.services.cdi import cdi_accumulated_index
+from src.services.portfolio import compute_positions, equity_curve, portfolio_timeseries
+from src.services.positions import load_positions
+from src.services.snapshot import portfolio_snapshot
+
+SCALES = {
+    "pequena": {"n_assets": 20, "n_trades": 2_000, "years": 3},
+    "media": {"n_assets": 100, "n_trades": 20_000, "years": 10},
+    "grande": {"n_assets": 300, "n_trades": 200_000, "years": 20},
+}
+PAGES = sorted((ROOT / "pages").glob("*.py"))
+# CLI runs timed from a new interpreter; --help stops right after the imports.
+STARTUP_COMMANDS = {
+    "import_excel": ["import_excel.py", "--help"],
+    "export_data": ["export_data.py", "--help"],
+    "rebuild_positions": ["rebuild_positions.py", "--check"],
+}
+
+
+def best_of(func: Callable[[], object], repeat: int, setup: Callable[[], None] | None = None) -> float:
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_scale(params: dict[str, int], repeat: int, pages: bool, startup: bool) -> dict[str, float]:
+    portfolio = generate_portfolio(**params)
+    results: dict[str, float] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "carteira.db"
+        xlsx_path = Path(tmp) / "Investimentos.xlsx"
+        write_database(portfolio, db_path)
+        write_workbook(portfolio, xlsx_path)
+
+        engine = create_engine(f"sqlite:///{db_path}", future=True)
+        migrate(engine)
+        with Session(engine) as session:
+            results["transactions_frame"] = best_of(lambda: transactions_frame(session), repeat)
+            results["latest_prices"] = best_of(lambda: latest_prices(session), repeat)
+            store = SnapshotStore(Path(tmp) / "snapshots")
+            results["ledger_sql"] = best_of(lambda: read_ledger(session, 0), repeat)
+            read_ledger(session, 0, store)
+            results["ledger_snapshot"] = best_of(lambda: read_ledger(session, 0, store), repeat)
+            transactions = transactions_frame(session)
+            prices = prices_frame(session)
+            snapshot_inputs = (
+                assets_frame(session),
+                load_positions(session),
+                latest_prices_frame(session),
+                last_trade_prices_frame(session),
+                dividends_frame(session),
+            )
+        engine.dispose()
+
+        results["compute_positions"] = best_of(lambda: compute_positions(transactions), repeat)
+        results["portfolio_timeseries"] = best_of(lambda: portfolio_timeseries(transactions), repeat)
+        results["equity_curve"] = best_of(lambda: equity_curve(transactions, prices), repeat)
+        results["portfolio_snapshot"] = best_of(lambda: portfolio_snapshot(*snapshot_inputs), repeat)
+
+        days = pd.bdate_range(end=datetime(2025, 12, 31), periods=params["years"] * 252)
+        cdi = pd.DataFrame({"data": days, "cdi_diario": np.full(len(days), 0.04)})
+        results["cdi_accumulated_index"] = best_of(lambda: cdi_accumulated_index(cdi), repeat)
+
+        import_path = Path(tmp) / "importacao.db"
+
+        def fresh_database() -> None:
+            import_path.unlink(missing_ok=True)
+            engine = create_engine(f"sqlite:///{import_path}", future=True)
+            Base.metadata.create_all(engine)
+            engine.dispose()
+
+        def run_import() -> None:
+            engine = create_engine(f"sqlite:///{import_path}", future=True)
+            with Session(engine) as session:
+                import_excel_streaming(xlsx_path, session)
+            engine.dispose()
+
+        results["import_excel"] = best_of(run_import, max(1, repeat // 3), setup=fresh_database)
+
+        if pages:
+            results.update(render_pages_subprocess(db_path, repeat))
+        if startup:
+            results.update(startup_times(db_path, repeat))
+    return results
+
+
+def render_pages_subprocess(db_path: Path, repeat: int) -> dict[str, float]:
+    # src.db reads WALLET_DB_PATH at import time, so each database gets its own interpreter.
+    env = {**os.environ, "WALLET_DB_PATH": str(db_path), "WALLET_CDI_OFFLINE": "1"}
+    output = subprocess.run(
+        [sys.executable, __file__, "--render-pages", "--repeat", str(repeat)],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def render_pages(repeat: int) -> dict[str, float]:
+    from streamlit.testing.v1 import AppTest
+
+    from src.ui_helpers import clear_caches
+
+    AppTest.from_file(str(ROOT / "app.py"), default_timeout=600).run()
+    results = {}
+    for page in PAGES:
+        name = f"pagina:{page.stem}"
+        # Cold runs load the ledger again; warm runs are reruns served from the cache.
+        results[name] = best_of(lambda: AppTest.from_file(str(page), default_timeout=600).run(), repeat, clear_caches)
+        app = AppTest.from_file(str(page), default_timeout=600)
+        app.run()
+        results[f"{name}:cache"] = best_of(app.run, repeat)
+        if app.exception:
+            raise RuntimeError(f"{page.name}: {app.exception[0].value}")
+    return results
+
+
+def startup_times(db_path: Path, repeat: int) -> dict[str, float]:
+    # Every run is a new interpreter, so imports, the schema check and the first
+    # ledger load are paid each time, as when the app or a CLI starts.
+    env = {**os.environ, "WALLET_DB_PATH": str(db_path), "WALLET_CDI_OFFLINE": "1"}
+    results = {}
+    for script in [ROOT / "app.py", *PAGES]:
+        command = [sys.executable, str(ROOT / "benchmarks" / "cold_start.py"), str(script)]
+        timings = [
+            float(subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout.split()[-1])
+            for _ in range(repeat)
+        ]
+        results[f"inicio:{script.stem}"] = min(timings)
+    for name, command in STARTUP_COMMANDS.items():
+        results[f"inicio:cli:{name}"] = best_of(
+            lambda: subprocess.run([sys.executable, *command], cwd=ROOT, env=env, check=True, capture_output=True),
+            repeat,
+        )
+    return results
+
+
+def compare(
+    baseline: dict, current: dict, threshold: float, min_delta: float
+) -> list[tuple[str, str, float, float, bool]]:
+    rows = []
+    for case, scales in current["resultados"].items():
+        for scale, seconds in scales.items():
+            before = baseline["resultados"].get(case, {}).get(scale)
+            if before is None:
+                continue
+            regressed = seconds > before * (1 + threshold) and seconds - before > min_delta
+            rows.append((case, scale, before, seconds, regressed))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Suíte de benchmarks sobre carteiras sintéticas.")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["pequena", "media"])
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por caso; vale o menor tempo")
+    parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"))
+    parser.add_argument("--no-pages", action="store_true", help="Não renderiza as páginas")
+    parser.add_argument("--no-startup", action="store_true", help="Não mede a partida do app, páginas e CLIs")
+    parser.add_argument("--compare", type=Path, help="JSON de referência para checar regressões")
+    parser.add_argument("--current", type=Path, help="Compara este JSON em vez de rodar a suíte")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Piora relativa tolerada (0.25 = 25%%)")
+    parser.add_argument("--min-delta", type=float, default=0.01, help="Piora absoluta mínima em segundos")
+    parser.add_argument("--render-pages", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.render_pages:
+        print(json.dumps(render_pages(args.repeat)))
+        return
+
+    if args.current:
+        current = json.loads(args.current.read_text())
+    else:
+        current = {
+            "gerado_em": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "repeticoes": args.repeat,
+            "escalas": {scale: SCALES[scale] for scale in args.scales},
+            "resultados": {},
+        }
+        for scale in args.scales:
+            print(f"escala {scale}: {SCALES[scale]}", flush=True)
+            for case, seconds in run_scale(SCALES[scale], args.repeat, not args.no_pages, not args.no_startup).items():
+                current["resultados"].setdefault(case, {})[scale] = seconds
+                print(f"  {case:<32} {seconds * 1000:>10.1f} ms", flush=True)
+        args.output.write_text(json.dumps(current, indent=2, ensure_ascii=False))
+        print(f"resultados em {args.output}")
+
+    if args.compare:
+        rows = compare(json.loads(args.compare.read_text()), current, args.threshold, args.min_delta)
+        print(f"{'caso':<32} {'escala':<8} {'antes (ms)':>11} {'agora (ms)':>11} {'razão':>7}")
+        for case, scale, before, seconds, regressed in rows:
+            mark = "  REGRESSÃO" if regressed else ""
+            ratio = seconds / before if before else float("inf")
+            print(f"{case:<32} {scale:<8} {before * 1000:>11.1f} {seconds * 1000:>11.1f} {ratio:>7.2f}{mark}")
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
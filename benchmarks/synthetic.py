@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import argparse
+import sys
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from src.importer import transaction_fingerprints
+from src.models import Asset, Base, Dividend, Price, Transaction
+from src.services.dividends import rebuild_dividend_months
+from src.services.positions import rebuild_positions
+
+CATEGORIES = [
+    ("Ações", "Ação", "Energia"),
+    ("Ações", "Ação", "Bancos"),
+    ("FII", "Logística", None),
+    ("ETF", None, None),
+]
+INSERT_CHUNK_SIZE = 50_000
+
+
+@dataclass
+class SyntheticPortfolio:
+    assets: pd.DataFrame
+    transactions: pd.DataFrame
+    dividends: pd.DataFrame
+    prices: pd.DataFrame
+
+
+def generate_portfolio(
+    n_assets: int = 50,
+    n_trades: int = 5_000,
+    years: int = 5,
+    seed: int = 42,
+    end: date = date(2025, 12, 31),
+) -> SyntheticPortfolio:
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(end=end, periods=years * 252)
+    asset_ids = np.arange(1, n_assets + 1)
+    profile = rng.integers(0, len(CATEGORIES), n_assets)
+    assets = pd.DataFrame(
+        {
+            "id": asset_ids,
+            "nome": [f"ATV{i:04d}" for i in asset_ids],
+            "categoria": [CATEGORIES[p][0] for p in profile],
+            "tipo": [CATEGORIES[p][1] for p in profile],
+            "setor": [CATEGORIES[p][2] for p in profile],
+        }
+    )
+
+    # Geometric random walk per asset, one close per business day.
+    returns = rng.normal(0.0003, 0.02, (n_assets, len(days)))
+    closes = np.round(rng.uniform(5.0, 150.0, (n_assets, 1)) * np.exp(np.cumsum(returns, axis=1)), 2)
+    prices = pd.DataFrame(
+        {
+            "asset_id": np.repeat(asset_ids, len(days)),
+            "data": np.tile(days.to_numpy(), n_assets),
+            "preco": closes.ravel(),
+            "fonte": "manual",
+        }
+    )
+
+    transactions = _trades(rng, closes, days, n_trades)
+    dividends = _dividends(rng, transactions, assets, days)
+    return SyntheticPortfolio(assets=assets, transactions=transactions, dividends=dividends, prices=prices)
+
+
+def write_database(portfolio: SyntheticPortfolio, path: Path) -> None:
+    engine = create_engine(f"sqlite:///{path}", future=True)
+    Base.metadata.create_all(engine)
+    tables = [
+        (Asset, portfolio.assets),
+        (Transaction, portfolio.transactions.assign(fingerprint=transaction_fingerprints(portfolio.transactions))),
+        (Dividend, portfolio.dividends),
+        (Price, portfolio.prices),
+    ]
+    with engine.begin() as conn:
+        for model, frame in tables:
+            records = _records(frame)
+            for start in range(0, len(records), INSERT_CHUNK_SIZE):
+                conn.execute(insert(model.__table__), records[start : start + INSERT_CHUNK_SIZE])
+    with Session(engine) as session:
+        rebuild_positions(session)
+        rebuild_dividend_months(session)
+        session.commit()
+    engine.dispose()
+
+
+def write_workbook(portfolio: SyntheticPortfolio, path: Path) -> None:
+    names = portfolio.assets.set_index("id")["nome"]
+    categories = portfolio.assets.set_index("id")["categoria"]
+    tx = portfolio.transactions
+    buys = tx[tx["tipo"] == "BUY"]
+    sells = tx[tx["tipo"] == "SELL"]
+    sheets = {
+        "Ativos": portfolio.assets.rename(
+            columns={"nome": "Nome", "categoria": "Categoria", "tipo": "Tipo", "setor": "Setor"}
+        )[["Nome", "Categoria", "Tipo", "Setor"]],
+        "Entradas": pd.DataFrame(
+            {
+                "Nome": buys["asset_id"].map(names),
+                "Categoria": buys["asset_id"].map(categories),
+                "Data": buys["data"],
+                "Valor un": buys["preco_unit"],
+                "Quantidade": buys["quantidade"],
+                "Taxas": buys["taxas"],
+                "Custo Total": buys["valor_total"],
+            }
+        ),
+        "Saidas": pd.DataFrame(
+            {
+                "Nome": sells["asset_id"].map(names),
+                "Data": sells["data"],
+                "Valor un": sells["preco_unit"],
+                "Quantidade": sells["quantidade"],
+                "Taxas": sells["taxas"],
+                "Custo Total": sells["valor_total"],
+                "Resultado": sells["resultado"],
+                "Ganhos": sells["ganhos"],
+            }
+        ),
+        "Dividendos": pd.DataFrame(
+            {
+                "Nome": portfolio.dividends["asset_id"].map(names),
+                "Data": portfolio.dividends["data"],
+                "Valor": portfolio.dividends["valor"],
+            }
+        ),
+    }
+    # Write-only mode streams rows instead of keeping every cell object alive.
+    workbook = Workbook(write_only=True)
+    for title, frame in sheets.items():
+        sheet = workbook.create_sheet(title)
+        sheet.append(list(frame.columns))
+        for row in frame.astype(object).where(frame.notna(), None).itertuples(index=False):
+            sheet.append(list(row))
+    workbook.save(path)
+
+
+def _trades(rng: np.random.Generator, closes: np.ndarray, days: pd.DatetimeIndex, n_trades: int) -> pd.DataFrame:
+    n_assets, n_days = closes.shape
+    asset_idx = rng.integers(0, n_assets, n_trades)
+    day_idx = np.sort(rng.integers(0, n_days, n_trades))
+    wants_sell = rng.random(n_trades) < 0.3
+    lots = rng.integers(1, 200, n_trades).astype(float)
+    fractions = rng.uniform(0.1, 0.6, n_trades)
+    taxas = np.round(rng.uniform(0.0, 5.0, n_trades), 2)
+
+    held = np.zeros(n_assets)
+    cost = np.zeros(n_assets)
+    tipo = np.empty(n_trades, dtype=object)
+    quantidade = np.empty(n_trades)
+    resultado = np.full(n_trades, np.nan)
+    preco = closes[asset_idx, day_idx]
+    # Sells are capped by the quantity held, so the ledger never goes short.
+    for i in range(n_trades):
+        a = asset_idx[i]
+        if wants_sell[i] and held[a] >= 2:
+            qty = max(1.0, np.floor(held[a] * fractions[i]))
+            avg = cost[a] / held[a]
+            tipo[i] = "SELL"
+            quantidade[i] = qty
+            resultado[i] = round((preco[i] - avg) * qty - taxas[i], 2)
+            held[a] -= qty
+            cost[a] -= avg * qty
+        else:
+            tipo[i] = "BUY"
+            quantidade[i] = lots[i]
+            held[a] += lots[i]
+            cost[a] += preco[i] * lots[i] + taxas[i]
+
+    valor_total = np.round(preco * quantidade, 2)
+    return pd.DataFrame(
+        {
+            "asset_id": asset_idx + 1,
+            "data": days.to_numpy()[day_idx],
+            "tipo": tipo,
+            "preco_unit": preco,
+            "quantidade": quantidade,
+            "taxas": taxas,
+            "valor_total": np.where(tipo == "BUY", valor_total + taxas, valor_total),
+            "resultado": resultado,
+            "ganhos": resultado,
+        }
+    )
+
+
+def _dividends(
+    rng: np.random.Generator, transactions: pd.DataFrame, assets: pd.DataFrame, days: pd.DatetimeIndex
+) -> pd.DataFrame:
+    # Monthly payments for FIIs and quarterly for the rest, from the first buy on.
+    first_buy = transactions.groupby("asset_id")["data"].min()
+    months = pd.date_range(days[0], days[-1], freq="MS") + pd.offsets.Day(14)
+    rows = []
+    for asset in assets.itertuples(index=False):
+        if asset.id not in first_buy.index:
+            continue
+        step = 1 if asset.categoria == "FII" else 3
+        paid = months[::step][months[::step] >= first_buy[asset.id]]
+        rows.append(pd.DataFrame({"asset_id": asset.id, "data": paid}))
+    if not rows:
+        return pd.DataFrame(
+            {"asset_id": pd.Series(dtype="int64"), "data": pd.Series(dtype="datetime64[ns]"), "valor": []}
+        )
+    df = pd.concat(rows, ignore_index=True)
+    df["valor"] = np.round(rng.uniform(1.0, 80.0, len(df)), 2)
+    return df
+
+
+def _records(frame: pd.DataFrame) -> list[dict]:
+    frame = frame.copy()
+    for column in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[column]):
+            frame[column] = frame[column].dt.date
+    return frame.astype(object).where(frame.notna(), None).to_dict("records")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Gera uma carteira sintética em SQLite e/ou xlsx.")
+    parser.add_argument("--assets", type=int, default=50)
+    parser.add_argument("--trades", type=int, default=5_000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", type=Path, help="Arquivo SQLite de saída")
+    parser.add_argument("--xlsx", type=Path, help="Planilha de saída no formato de Investimentos.xlsx")
+    args = parser.parse_args()
+    if not args.db and not args.xlsx:
+        parser.error("informe --db e/ou --xlsx")
+
+    portfolio = generate_portfolio(args.assets, args.trades, args.years, args.seed)
+    if args.db:
+        write_database(portfolio, args.db)
+    if args.xlsx:
+        write_workbook(portfolio, args.xlsx)
+    print(
+        f"{len(portfolio.assets)} ativos, {len(portfolio.transactions):,} transações, "
+        f"{len(portfolio.dividends):,} proventos, {len(portfolio.prices):,} preços"
+    )
+
+
+if __name__ == "__main__":
+    main()
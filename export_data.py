@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from src.exporter import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORT_TABLES, export_table
+from src.init_db import init_db
+from src.logging_config import setup_logging
+from src.portfolios import add_portfolio_argument, portfolio_from_args
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Exporta tabelas do SQLite para CSV, CSV gzip ou Parquet.")
+    parser.add_argument("tabelas", nargs="+", choices=sorted(EXPORT_TABLES), help="Tabelas a exportar")
+    parser.add_argument("--formato", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--destino", type=Path, default=Path("."), help="Diretório de saída")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=EXPORT_CHUNK_SIZE,
+        help="Linhas lidas e gravadas por vez; limita a memória usada.",
+    )
+    add_portfolio_argument(parser)
+    args = parser.parse_args()
+    database = portfolio_from_args(parser, args).database()
+
+    setup_logging()
+    init_db(database)
+    args.destino.mkdir(parents=True, exist_ok=True)
+    with database.ReadSession() as session:
+        for name in args.tabelas:
+            path = args.destino / f"{name}.{args.formato}"
+            rows = export_table(session, name, path, args.formato, args.chunk_size)
+            print(f"{path}: {rows} linhas")
+
+
+if __name__ == "__main__":
+    main()
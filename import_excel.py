@@ -3,22 +3,44 @@ from __future__ import annotations
 import argparse
 from pathlib import Path
 
-from src.db import SessionLocal
-from src.importer import import_excel
+from src.importer import STREAM_CHUNK_SIZE, ImportProgress, import_workbooks
 from src.init_db import init_db
 from src.logging_config import setup_logging
+from src.portfolios import add_portfolio_argument, portfolio_from_args
+
+
+def print_progress(progress: ImportProgress) -> None:
+    total = f"/{progress.rows_total}" if progress.rows_total else ""
+    print(f"{progress.sheet}: {progress.rows_done}{total} linhas", flush=True)
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Importa a planilha Investimentos.xlsx para o SQLite.")
-    parser.add_argument("arquivo", type=Path, help="Caminho para Investimentos.xlsx")
+    parser.add_argument("arquivos", type=Path, nargs="+", help="Caminho para Investimentos.xlsx (um ou mais)")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=STREAM_CHUNK_SIZE,
+        help="Linhas gravadas por commit; uma importação interrompida retoma do último commit.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processos que leem as planilhas em paralelo (padrão: automático; 1 lê no próprio processo).",
+    )
+    add_portfolio_argument(parser)
     args = parser.parse_args()
+    database = portfolio_from_args(parser, args).database()
 
     setup_logging()
-    init_db()
-    with SessionLocal() as session:
-        result = import_excel(args.arquivo, session)
-    print(f"Importação concluída: {result}")
+    init_db(database)
+    with database.SessionLocal() as session:
+        results = import_workbooks(
+            args.arquivos, session, chunk_size=args.chunk_size, progress=print_progress, workers=args.workers
+        )
+    for path, result in zip(args.arquivos, results):
+        print(f"Importação concluída ({path.name}): {result}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from src.init_db import init_db
+from src.logging_config import setup_logging
+from src.portfolios import add_portfolio_argument, portfolio_from_args
+from src.price_importer import DEFAULT_PRICE_SOURCE, PRICE_BATCH_SIZE, PriceImportResult, import_prices
+
+
+def print_progress(result: PriceImportResult) -> None:
+    print(f"{result.rows} linhas lidas, {result.written} gravadas ({result.rows_per_second:,.0f} linhas/s)", flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Importa histórico de cotações (CSV ou Parquet) para o SQLite.")
+    parser.add_argument(
+        "arquivos",
+        type=Path,
+        nargs="+",
+        help="Arquivos com as colunas ticker (ou ativo), data, preco e, opcionalmente, fonte",
+    )
+    parser.add_argument(
+        "--fonte",
+        default=DEFAULT_PRICE_SOURCE,
+        help="Fonte gravada quando o arquivo não tem a coluna fonte.",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=PRICE_BATCH_SIZE,
+        help="Linhas lidas e gravadas por commit; uma carga interrompida termina ao rodar de novo.",
+    )
+    add_portfolio_argument(parser)
+    args = parser.parse_args()
+    database = portfolio_from_args(parser, args).database()
+
+    setup_logging()
+    init_db(database)
+    with database.SessionLocal() as session:
+        for path in args.arquivos:
+            result = import_prices(session, path, fonte=args.fonte, batch_size=args.batch_size, progress=print_progress)
+            print(
+                f"Importação concluída ({path.name}): {result.rows} linhas em {result.seconds:.1f} s "
+                f"({result.rows_per_second:,.0f} linhas/s), {result.written} gravadas, "
+                f"{result.unknown} de ativos desconhecidos, {result.invalid} inválidas"
+            )
+            if result.unknown_tickers:
+                print(f"Tickers sem ativo: {', '.join(sorted(result.unknown_tickers)[:20])}")
+
+
+if __name__ == "__main__":
+    main()
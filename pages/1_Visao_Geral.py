@@ -1,63 +1,41 @@
 from __future__ import annotations
 
 import sys
+from datetime import date
 from pathlib import Path
 
 import pandas as pd
-import plotly.express as px
 import streamlit as st
 
 ROOT = Path(__file__).resolve().parents[1]
-sys.path.append(str(ROOT))
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
 
-from src.models import Asset, Dividend, Transaction
-from src.queries import latest_prices
-from src.services.portfolio import compute_positions, portfolio_timeseries
-from src.ui_helpers import get_session
+from src.perf import span
+from src.ui_helpers import load_equity_curve, load_ledger, load_snapshot, perf_panel, plotly_express, start_page
 
 
 st.set_page_config(page_title="Visão Geral", layout="wide")
 st.title("Visão Geral")
+perf_run = start_page("Visão Geral")
 
-with get_session() as session:
-    assets = session.query(Asset).all()
-    transactions = session.query(Transaction).all()
-    dividends = session.query(Dividend).all()
-    prices = latest_prices(session)
+ledger = load_ledger()
+assets = ledger.assets
+transactions = ledger.transactions
+dividends = ledger.dividends
 
-if not assets:
+if assets.empty:
     st.info("Nenhum dado encontrado. Importe a planilha na página de Transações.")
     st.stop()
 
-positions = compute_positions(transactions)
+tipo_upper = transactions["tipo"].astype(str).str.upper()
+investido_total = transactions["valor_total"].where(tipo_upper == "BUY", -transactions["valor_total"]).sum()
+dividendos_total = dividends["valor"].sum()
+ganhos_vendas = transactions.loc[tipo_upper == "SELL", "ganhos"].fillna(0).sum()
+taxas_pagadas = transactions["taxas"].sum()
 
-investido_total = sum(
-    tx.valor_total if tx.tipo.upper() == "BUY" else -tx.valor_total for tx in transactions
-)
-dividendos_total = sum(div.valor for div in dividends)
-ganhos_vendas = sum(tx.ganhos or 0 for tx in transactions if tx.tipo.upper() == "SELL")
-taxas_pagadas = sum(tx.taxas for tx in transactions)
-
-valor_atual = 0.0
-rows = []
-for asset in assets:
-    position = positions.get(asset.id)
-    if not position:
-        continue
-    price = prices.get(asset.id)
-    if price is None:
-        last_tx = max(
-            (tx for tx in transactions if tx.asset_id == asset.id), key=lambda t: t.data, default=None
-        )
-        price = last_tx.preco_unit if last_tx else 0.0
-    valor_atual += position.quantidade * price
-    rows.append(
-        {
-            "Categoria": asset.categoria or "Sem categoria",
-            "Nome": asset.nome,
-            "Valor": position.quantidade * price,
-        }
-    )
+snapshot = load_snapshot(ledger)
+valor_atual = snapshot["valor_atual"].sum()
 
 rentabilidade_total = (
     (valor_atual + dividendos_total + ganhos_vendas - investido_total) / investido_total
@@ -75,19 +53,26 @@ col5, col6 = st.columns(2)
 col5.metric("Rentabilidade total", f"{rentabilidade_total:.2%}")
 col6.metric("Taxas pagas", f"R$ {taxas_pagadas:,.2f}")
 
-st.subheader("Curva do patrimônio (baseada em preços de transações)")
-timeseries = portfolio_timeseries(transactions)
+st.subheader("Curva do patrimônio (marcação a mercado diária)")
+today = date.today()
+timeseries = load_equity_curve(ledger, today)
 if not timeseries.empty:
+    px = plotly_express()
     fig = px.line(timeseries, x="data", y="patrimonio", labels={"patrimonio": "Patrimônio"})
-    st.plotly_chart(fig, use_container_width=True)
+    with span("plotly"):
+        st.plotly_chart(fig, use_container_width=True)
 else:
     st.warning("Sem dados suficientes para curva do patrimônio.")
 
 st.subheader("Resumo por categoria")
-df = pd.DataFrame(rows)
+df = pd.DataFrame(
+    {"Categoria": snapshot["categoria"].fillna("Sem categoria"), "Valor": snapshot["valor_atual"]}
+)
 if not df.empty:
     summary = df.groupby("Categoria", as_index=False)["Valor"].sum()
     summary["Participação"] = summary["Valor"] / summary["Valor"].sum()
     st.dataframe(summary, use_container_width=True)
 else:
     st.info("Sem posições atuais para exibir.")
+
+perf_panel(perf_run)
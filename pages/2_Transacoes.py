@@ -5,53 +5,57 @@ from pathlib import Path
 
 import pandas as pd
 import streamlit as st
+from sqlalchemy.exc import IntegrityError
 
 ROOT = Path(__file__).resolve().parents[1]
-sys.path.append(str(ROOT))
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
 
-from src.importer import import_excel
 from src.models import Asset, Transaction
-from src.ui_helpers import get_session
+from src.queries import LIST_PAGE_SIZE, count_transactions, transactions_page
+from src.services.positions import record_transactions
+from src.ui_helpers import (
+    export_button,
+    get_read_session,
+    get_session,
+    load_assets,
+    page_cursor,
+    pager,
+    perf_panel,
+    start_page,
+)
 
 
 st.set_page_config(page_title="Transações", layout="wide")
 st.title("Transações")
+perf_run = start_page("Transações")
 
-with get_session() as session:
-    assets = session.query(Asset).order_by(Asset.nome).all()
-    transactions = (
-        session.query(Transaction)
-        .join(Asset, Transaction.asset_id == Asset.id)
-        .order_by(Transaction.data.desc())
-        .all()
-    )
-    transaction_rows = [
-        {
-            "Data": tx.data,
-            "Ativo": tx.asset.nome,
-            "Tipo": tx.tipo,
-            "Preço": tx.preco_unit,
-            "Quantidade": tx.quantidade,
-            "Taxas": tx.taxas,
-            "Valor total": tx.valor_total,
-            "Resultado": tx.resultado,
-            "Ganhos": tx.ganhos,
-        }
-        for tx in transactions
-    ]
+assets = load_assets()
+asset_names = assets["nome"].tolist()
+asset_ids = dict(zip(assets["nome"], assets["id"].tolist()))
 
 st.subheader("Importar Excel")
 uploaded_file = st.file_uploader("Selecione Investimentos.xlsx", type=["xlsx"])
 if uploaded_file:
+    # openpyxl is only needed here, so the page does not import it on every visit.
+    from src.importer import ImportProgress, import_excel_streaming
+
     temp_path = Path("data") / uploaded_file.name
     temp_path.write_bytes(uploaded_file.getbuffer())
+    progress_bar = st.progress(0.0, text="Importando...")
+
+    def show_progress(progress: ImportProgress) -> None:
+        fraction = min(progress.rows_done / progress.rows_total, 1.0) if progress.rows_total else 0.0
+        progress_bar.progress(fraction, text=f"{progress.sheet}: {progress.rows_done} linhas")
+
     with get_session() as session:
-        result = import_excel(temp_path, session)
+        result = import_excel_streaming(temp_path, session, progress=show_progress)
+    progress_bar.empty()
     st.success(f"Importação concluída: {result}")
 
 st.subheader("Adicionar transação")
 with st.form("add_transaction"):
-    asset_nome = st.selectbox("Ativo", options=[a.nome for a in assets] + ["NOVO ATIVO"])
+    asset_nome = st.selectbox("Ativo", options=asset_names + ["NOVO ATIVO"])
     new_asset_nome = st.text_input("Nome do novo ativo", disabled=asset_nome != "NOVO ATIVO")
     categoria = st.text_input("Categoria", disabled=asset_nome != "NOVO ATIVO")
     tipo = st.text_input("Tipo", disabled=asset_nome != "NOVO ATIVO")
@@ -91,13 +95,52 @@ with st.form("add_transaction"):
                 ganhos=ganhos if tipo_tx == "SELL" else None,
             )
             session.add(tx)
-            session.commit()
-        st.success("Transação adicionada.")
+            try:
+                session.flush()
+            except IntegrityError:
+                # Same fingerprint as a stored transaction.
+                session.rollback()
+                st.warning("Transação já cadastrada.")
+            else:
+                record_transactions(session, [tx])
+                session.commit()
+                st.success("Transação adicionada.")
 
 st.subheader("Lista de transações")
-if transaction_rows:
-    df = pd.DataFrame(transaction_rows)
-    st.dataframe(df, use_container_width=True)
-    st.download_button("Exportar CSV", data=df.to_csv(index=False), file_name="transacoes.csv")
+filtro_ativos, filtro_tipo, filtro_periodo = st.columns([3, 1, 2])
+nomes = filtro_ativos.multiselect("Ativos", options=asset_names, key="filtro_ativos")
+tipo_filtro = filtro_tipo.selectbox("Tipo", ["Todos", "BUY", "SELL"], key="filtro_tipo")
+periodo = filtro_periodo.date_input("Período", value=(), key="filtro_periodo")
+filters = {
+    "asset_ids": [asset_ids[nome] for nome in nomes] or None,
+    "tipo": None if tipo_filtro == "Todos" else tipo_filtro,
+    "start": periodo[0] if len(periodo) > 0 else None,
+    "end": periodo[1] if len(periodo) > 1 else None,
+}
+cursors = page_cursor("transacoes", repr(filters))
+with get_read_session() as session:
+    total = count_transactions(session, **filters)
+    page = transactions_page(session, **filters, after=cursors[-1] if cursors else None)
+
+if total:
+    rows = page.rows
+    transaction_rows = pd.DataFrame(
+        {
+            "Data": rows["data"].dt.date,
+            "Ativo": rows["nome"],
+            "Tipo": rows["tipo"],
+            "Preço": rows["preco_unit"],
+            "Quantidade": rows["quantidade"],
+            "Taxas": rows["taxas"],
+            "Valor total": rows["valor_total"],
+            "Resultado": rows["resultado"],
+            "Ganhos": rows["ganhos"],
+        }
+    )
+    st.dataframe(transaction_rows, use_container_width=True, hide_index=True)
+    pager("transacoes", cursors, page.next_key, total, LIST_PAGE_SIZE)
+    export_button("transacoes", "transacoes")
 else:
     st.info("Nenhuma transação encontrada.")
+
+perf_panel(perf_run)
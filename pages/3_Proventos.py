@@ -1,47 +1,107 @@
 from __future__ import annotations
 
 import sys
+from datetime import date
 from pathlib import Path
 
 import pandas as pd
 import streamlit as st
 
 ROOT = Path(__file__).resolve().parents[1]
-sys.path.append(str(ROOT))
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
 
 from src.models import Asset, Dividend
-from src.ui_helpers import get_session
+from src.perf import span
+from src.queries import LIST_PAGE_SIZE, count_dividends, dividends_page
+from src.services.dividends import monthly_income, record_dividends, yield_on_cost
+from src.ui_helpers import (
+    export_button,
+    get_read_session,
+    get_session,
+    load_assets,
+    load_dividend_months,
+    page_cursor,
+    pager,
+    perf_panel,
+    plotly_express,
+    start_page,
+)
 
 
 st.set_page_config(page_title="Proventos", layout="wide")
 st.title("Proventos")
+perf_run = start_page("Proventos")
 
-with get_session() as session:
-    assets = session.query(Asset).order_by(Asset.nome).all()
-    dividends = (
-        session.query(Dividend)
-        .join(Asset, Dividend.asset_id == Asset.id)
-        .order_by(Dividend.data.desc())
-        .all()
-    )
-    dividend_rows = [{"Data": div.data, "Ativo": div.asset.nome, "Valor": div.valor} for div in dividends]
+assets = load_assets()
+asset_names = assets["nome"].tolist()
+asset_ids = dict(zip(assets["nome"], assets["id"].tolist()))
 
 st.subheader("Adicionar provento")
 with st.form("add_dividend"):
-    asset_nome = st.selectbox("Ativo", options=[a.nome for a in assets])
+    asset_nome = st.selectbox("Ativo", options=asset_names)
     data = st.date_input("Data")
     valor = st.number_input("Valor", min_value=0.0, step=0.01)
     submitted = st.form_submit_button("Salvar")
     if submitted:
         with get_session() as session:
             asset = session.query(Asset).filter_by(nome=asset_nome).one()
-            session.add(Dividend(asset_id=asset.id, data=data, valor=valor))
+            dividend = Dividend(asset_id=asset.id, data=data, valor=valor)
+            session.add(dividend)
+            session.flush()
+            record_dividends(session, [dividend])
             session.commit()
         st.success("Provento adicionado.")
 
+st.subheader("Renda de proventos")
+months, positions = load_dividend_months()
+if not months.empty:
+    today = date.today()
+    income = monthly_income(months, end=today)
+    px = plotly_express()
+    fig = px.bar(income, x="mes", y="valor", labels={"mes": "Mês", "valor": "Proventos"})
+    fig.add_scatter(x=income["mes"], y=income["renda_12m"], mode="lines", name="Últimos 12 meses")
+    with span("plotly"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    col1.metric("Renda dos últimos 12 meses", f"R$ {income['renda_12m'].iloc[-1]:,.2f}")
+    col2.metric("Média mensal (12 meses)", f"R$ {income['renda_12m'].iloc[-1] / 12:,.2f}")
+
+    yields = yield_on_cost(months, positions, today)
+    yields.insert(0, "Ativo", yields["asset_id"].map(dict(zip(assets["id"], assets["nome"]))))
+    st.dataframe(
+        yields.drop(columns=["asset_id"]).rename(
+            columns={"custo": "Custo da posição", "renda_12m": "Proventos 12 meses", "yield_on_cost": "Yield on cost"}
+        ),
+        use_container_width=True,
+        hide_index=True,
+        column_config={"Yield on cost": st.column_config.NumberColumn(format="percent")},
+    )
+else:
+    st.info("Nenhum provento cadastrado.")
+
 st.subheader("Lista de proventos")
-if dividend_rows:
-    df = pd.DataFrame(dividend_rows)
-    st.dataframe(df, use_container_width=True)
+filtro_ativos, filtro_periodo = st.columns([3, 2])
+nomes = filtro_ativos.multiselect("Ativos", options=asset_names, key="filtro_ativos")
+periodo = filtro_periodo.date_input("Período", value=(), key="filtro_periodo")
+filters = {
+    "asset_ids": [asset_ids[nome] for nome in nomes] or None,
+    "start": periodo[0] if len(periodo) > 0 else None,
+    "end": periodo[1] if len(periodo) > 1 else None,
+}
+cursors = page_cursor("proventos", repr(filters))
+with get_read_session() as session:
+    total = count_dividends(session, **filters)
+    page = dividends_page(session, **filters, after=cursors[-1] if cursors else None)
+
+if total:
+    rows = page.rows
+    dividend_rows = pd.DataFrame({"Data": rows["data"].dt.date, "Ativo": rows["nome"], "Valor": rows["valor"]})
+    st.dataframe(dividend_rows, use_container_width=True, hide_index=True)
+    pager("proventos", cursors, page.next_key, total, LIST_PAGE_SIZE)
+    export_button("proventos", "proventos")
 else:
     st.info("Nenhum provento encontrado.")
+
+perf_panel(perf_run)
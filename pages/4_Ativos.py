@@ -3,37 +3,27 @@ from __future__ import annotations
 import sys
 from pathlib import Path
 
-import pandas as pd
 import streamlit as st
 
 ROOT = Path(__file__).resolve().parents[1]
-sys.path.append(str(ROOT))
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
 
-from src.models import Asset, Dividend, Price, Transaction
-from src.queries import latest_prices
-from src.services.portfolio import compute_positions
-from src.ui_helpers import get_session
+from src.models import Asset, Price
+from src.ui_helpers import export_button, get_session, load_ledger, load_snapshot, perf_panel, start_page
 
 
 st.set_page_config(page_title="Ativos (Carteira)", layout="wide")
 st.title("Ativos (Carteira)")
+perf_run = start_page("Ativos (Carteira)")
 
-with get_session() as session:
-    assets = session.query(Asset).order_by(Asset.nome).all()
-    transactions = session.query(Transaction).all()
-    dividends = session.query(Dividend).all()
-    prices = latest_prices(session)
-
-positions = compute_positions(transactions)
-dividend_map = {}
-for div in dividends:
-    dividend_map.setdefault(div.asset_id, 0.0)
-    dividend_map[div.asset_id] += div.valor
+ledger = load_ledger()
+assets = ledger.assets
 
 st.subheader("Atualizar metadata e preço")
 with st.form("update_asset"):
-    asset_nome = st.selectbox("Ativo", options=[a.nome for a in assets])
-    selected = next(a for a in assets if a.nome == asset_nome)
+    asset_nome = st.selectbox("Ativo", options=assets["nome"].tolist())
+    selected = next(a for a in assets.itertuples(index=False) if a.nome == asset_nome)
     categoria = st.text_input("Categoria", value=selected.categoria or "")
     tipo = st.text_input("Tipo", value=selected.tipo or "")
     setor = st.text_input("Setor", value=selected.setor or "")
@@ -56,33 +46,57 @@ with st.form("update_asset"):
         st.success("Ativo atualizado.")
 
 st.subheader("Posições atuais")
-rows = []
-for asset in assets:
-    position = positions.get(asset.id)
-    if not position or position.quantidade == 0:
-        continue
-    price = prices.get(asset.id, 0.0)
-    valor_atual = position.quantidade * price
-    rows.append(
-        {
-            "Ativo": asset.nome,
-            "Categoria": asset.categoria,
-            "Tipo": asset.tipo,
-            "Setor": asset.setor,
-            "Quantidade": position.quantidade,
-            "Preço médio": position.preco_medio,
-            "Investido líquido": position.investido_liquido,
-            "Preço atual": price,
-            "Valor atual": valor_atual,
-            "Dividendos": dividend_map.get(asset.id, 0.0),
-            "Participação": 0.0,
-        }
-    )
-
-df = pd.DataFrame(rows)
+df = load_snapshot(ledger).rename(
+    columns={
+        "nome": "Ativo",
+        "categoria": "Categoria",
+        "tipo": "Tipo",
+        "setor": "Setor",
+        "quantidade": "Quantidade",
+        "preco_medio": "Preço médio",
+        "investido_liquido": "Investido líquido",
+        "preco": "Preço atual",
+        "fonte_preco": "Fonte do preço",
+        "valor_atual": "Valor atual",
+        "dividendos": "Dividendos",
+        "participacao": "Participação",
+    }
+)
 if not df.empty:
-    total = df["Valor atual"].sum()
-    df["Participação"] = df["Valor atual"] / total
-    st.dataframe(df, use_container_width=True)
+    st.dataframe(df.drop(columns=["asset_id", "data_preco"]), use_container_width=True)
+    export_button("posicoes", "posicoes")
 else:
     st.info("Sem posições com quantidade positiva.")
+
+st.subheader("Histórico de preços")
+price_file = st.file_uploader("Importar cotações (CSV ou Parquet)", type=["csv", "gz", "parquet"])
+# The file stays in the uploader across reruns, so it is only read when asked for.
+if price_file and st.button("Importar cotações"):
+    from src.price_importer import PriceImportResult, import_prices
+
+    progress_bar = st.progress(0.0, text="Importando cotações...")
+
+    def show_price_progress(progress: PriceImportResult) -> None:
+        progress_bar.progress(
+            min(price_file.tell() / price_file.size, 1.0) if price_file.size else 0.0,
+            text=f"{progress.rows} linhas ({progress.rows_per_second:,.0f} linhas/s)",
+        )
+
+    with get_session() as session:
+        try:
+            result = import_prices(session, price_file, progress=show_price_progress)
+        except ValueError as exc:
+            result = None
+            st.error(str(exc))
+    progress_bar.empty()
+    if result:
+        st.success(
+            f"Importação concluída: {result.rows} linhas em {result.seconds:.1f} s "
+            f"({result.rows_per_second:,.0f} linhas/s), {result.written} gravadas, {result.invalid} inválidas."
+        )
+        if result.unknown:
+            tickers = ", ".join(sorted(result.unknown_tickers)[:20])
+            st.warning(f"{result.unknown} linhas de ativos não cadastrados: {tickers}")
+export_button("precos", "precos")
+
+perf_panel(perf_run)
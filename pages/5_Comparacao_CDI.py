@@ -1,32 +1,45 @@
 from __future__ import annotations
 
 import sys
+from datetime import date
 from pathlib import Path
 
 import pandas as pd
-import plotly.express as px
 import streamlit as st
 
 ROOT = Path(__file__).resolve().parents[1]
-sys.path.append(str(ROOT))
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
 
-from src.models import Transaction
-from src.services.cdi import cdi_accumulated_index, fetch_cdi_series
-from src.services.portfolio import portfolio_timeseries
-from src.ui_helpers import get_session
+from src.perf import span
+from src.services.cdi import CDI_OFFLINE, cached_cdi_series, cdi_accumulated_index
+from src.services.returns import daily_cash_flows, returns_frame, summarize_returns
+from src.ui_helpers import (
+    get_read_session,
+    get_session,
+    load_equity_curve,
+    load_ledger,
+    perf_panel,
+    plotly_express,
+    start_page,
+)
 
 
 st.set_page_config(page_title="Comparação CDI", layout="wide")
 st.title("Comparação com CDI")
+perf_run = start_page("Comparação com CDI")
 
-with get_session() as session:
-    transactions = session.query(Transaction).all()
+ledger = load_ledger()
+transactions = ledger.transactions
 
-if not transactions:
+if transactions.empty:
     st.info("Importe transações para comparar com CDI.")
     st.stop()
 
-ts = portfolio_timeseries(transactions)
+today = date.today()
+# Business days of the stored daily curve; weekend trades show up on the next one.
+ts = load_equity_curve(ledger, today)
+ts = ts[ts["data"].dt.dayofweek < 5].reset_index(drop=True)
 if ts.empty:
     st.info("Sem dados suficientes para curva de patrimônio.")
     st.stop()
@@ -35,34 +48,57 @@ start_date = st.date_input("Data inicial", value=ts["data"].min())
 end_date = st.date_input("Data final", value=ts["data"].max())
 
 filtered = ts[(ts["data"] >= pd.to_datetime(start_date)) & (ts["data"] <= pd.to_datetime(end_date))]
-filtered = filtered.sort_values("data")
-filtered["indice_carteira"] = filtered["patrimonio"] / filtered["patrimonio"].iloc[0] * 100
+filtered = filtered.sort_values("data").reset_index(drop=True)
+if filtered.empty:
+    st.info("Sem dados no período selecionado.")
+    st.stop()
 
-try:
-    cdi_df = fetch_cdi_series(start_date, end_date)
-    cdi_index = cdi_accumulated_index(cdi_df)
-except Exception as exc:  # noqa: BLE001
-    st.warning(f"Não foi possível obter CDI automaticamente: {exc}")
-    cdi_index = pd.DataFrame(columns=["data", "indice"])
+offline = st.checkbox("Modo offline (usar apenas o CDI salvo localmente)", value=CDI_OFFLINE)
+# Read-only unless a range is missing; only then is a write session opened to store it.
+with get_read_session() as session:
+    try:
+        cdi_df = cached_cdi_series(session, start_date, end_date, offline=offline, writer=get_session)
+    except Exception as exc:  # noqa: BLE001
+        st.warning(f"Não foi possível atualizar o CDI automaticamente: {exc}")
+        session.rollback()
+        cdi_df = cached_cdi_series(session, start_date, end_date, offline=True)
+cdi_index = cdi_accumulated_index(cdi_df)
 
 if not cdi_index.empty:
-    merged = pd.merge(
-        filtered[["data", "indice_carteira"]],
-        cdi_index,
-        on="data",
-        how="left",
-    ).sort_values("data")
-    merged["indice"] = merged["indice"].ffill()
+    flows = daily_cash_flows(transactions, ledger.dividends, pd.DatetimeIndex(filtered["data"]))
+    returns = returns_frame(filtered, flows, cdi_index)
+    summary = summarize_returns(returns)
+    px = plotly_express()
     fig = px.line(
-        merged,
+        returns.rename(columns={"indice_carteira": "Carteira (TWR)", "indice_cdi": "CDI"}),
         x="data",
-        y=["indice_carteira", "indice"],
+        y=["Carteira (TWR)", "CDI"],
         labels={"value": "Índice (base 100)", "variable": "Série"},
     )
-    st.plotly_chart(fig, use_container_width=True)
-    retorno_carteira = merged["indice_carteira"].iloc[-1] / merged["indice_carteira"].iloc[0] - 1
-    retorno_cdi = merged["indice"].iloc[-1] / merged["indice"].iloc[0] - 1
-    st.metric("Retorno carteira", f"{retorno_carteira:.2%}")
-    st.metric("Retorno CDI", f"{retorno_cdi:.2%}")
+    with span("plotly"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Retorno carteira (TWR)", f"{summary.twr:.2%}")
+    col2.metric("Retorno CDI", f"{summary.cdi:.2%}")
+    col3.metric("TIR anual", "—" if pd.isna(summary.irr_anual) else f"{summary.irr_anual:.2%}")
+    col4.metric("TIR anual CDI", "—" if pd.isna(summary.cdi_irr_anual) else f"{summary.cdi_irr_anual:.2%}")
+
+    st.subheader("Mesmos aportes aplicados no CDI")
+    fig = px.line(
+        returns.rename(columns={"patrimonio": "Carteira", "patrimonio_cdi": "CDI"}),
+        x="data",
+        y=["Carteira", "CDI"],
+        labels={"value": "Patrimônio (R$)", "variable": "Série"},
+    )
+    with span("plotly"):
+        st.plotly_chart(fig, use_container_width=True)
+    st.metric(
+        "Patrimônio final",
+        f"R$ {summary.patrimonio_final:,.2f}",
+        delta=f"R$ {summary.patrimonio_final - summary.patrimonio_cdi_final:,.2f} vs CDI",
+    )
 else:
     st.info("CDI indisponível. Verifique a conexão com o Banco Central.")
+
+perf_panel(perf_run)
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import sys
+from datetime import date
+from pathlib import Path
+
+import streamlit as st
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))
+
+from src.perf import span
+from src.portfolios import list_portfolios
+from src.ui_helpers import load_consolidation, perf_panel, plotly_express, start_page
+
+
+st.set_page_config(page_title="Consolidado", layout="wide")
+st.title("Visão Consolidada")
+perf_run = start_page("Visão Consolidada")
+
+portfolios = list_portfolios()
+names = [portfolio.nome for portfolio in portfolios]
+chosen = st.multiselect("Carteiras", names, default=names)
+if not chosen:
+    st.info("Selecione ao menos uma carteira.")
+    st.stop()
+
+today = date.today()
+consolidation = load_consolidation([portfolio for portfolio in portfolios if portfolio.nome in chosen], today)
+totals = consolidation.portfolios
+
+col1, col2, col3 = st.columns(3)
+col1.metric("Investido líquido", f"R$ {totals['investido_liquido'].sum():,.2f}")
+col2.metric("Valor atual", f"R$ {totals['valor_atual'].sum():,.2f}")
+col3.metric("Dividendos acumulados", f"R$ {totals['dividendos'].sum():,.2f}")
+
+st.subheader("Curva do patrimônio consolidada")
+curves = consolidation.curves
+if not curves.empty:
+    px = plotly_express()
+    fig = px.area(curves, x="data", y="patrimonio", color="carteira", labels={"patrimonio": "Patrimônio"})
+    with span("plotly"):
+        st.plotly_chart(fig, use_container_width=True)
+else:
+    st.warning("Sem dados suficientes para curva do patrimônio.")
+
+st.subheader("Por carteira")
+st.dataframe(
+    totals.rename(
+        columns={
+            "carteira": "Carteira",
+            "ativos": "Ativos",
+            "investido_liquido": "Investido líquido",
+            "valor_atual": "Valor atual",
+            "dividendos": "Dividendos",
+            "participacao": "Participação",
+        }
+    ),
+    hide_index=True,
+    use_container_width=True,
+    column_config={"Participação": st.column_config.NumberColumn(format="percent")},
+)
+
+st.subheader("Posições consolidadas")
+positions = consolidation.positions
+if not positions.empty:
+    st.dataframe(
+        positions.rename(
+            columns={
+                "nome": "Ativo",
+                "categoria": "Categoria",
+                "tipo": "Tipo",
+                "setor": "Setor",
+                "carteiras": "Carteiras",
+                "quantidade": "Quantidade",
+                "preco_medio": "Preço médio",
+                "investido_liquido": "Investido líquido",
+                "valor_atual": "Valor atual",
+                "dividendos": "Dividendos",
+                "participacao": "Participação",
+            }
+        ),
+        hide_index=True,
+        use_container_width=True,
+        column_config={"Participação": st.column_config.NumberColumn(format="percent")},
+    )
+else:
+    st.info("Sem posições com quantidade positiva.")
+
+perf_panel(perf_run)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import argparse
+from datetime import date
+
+from src.init_db import init_db
+from src.logging_config import setup_logging
+from src.portfolios import add_portfolio_argument, portfolio_from_args
+from src.queries import prices_frame, transactions_frame
+from src.services.equity import check_equity_curve, rebuild_equity_curve
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recalcula a curva do patrimônio armazenada a partir do ledger.")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Apenas compara a curva armazenada com o cálculo completo, sem recalcular.",
+    )
+    add_portfolio_argument(parser)
+    args = parser.parse_args()
+    database = portfolio_from_args(parser, args).database()
+
+    setup_logging()
+    init_db(database)
+    with database.SessionLocal() as session:
+        transactions = transactions_frame(session)
+        prices = prices_frame(session)
+        if not args.check:
+            days = rebuild_equity_curve(session, transactions, prices, end=date.today())
+            session.commit()
+            print(f"Curva recalculada: {days} dias")
+        mismatched = check_equity_curve(session, transactions, prices)
+    if mismatched:
+        print(f"Dias com patrimônio divergente: {len(mismatched)} (primeiro: {mismatched[0]})")
+        raise SystemExit(1)
+    print("Curva consistente com o ledger.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import argparse
+
+from src.init_db import init_db
+from src.logging_config import setup_logging
+from src.portfolios import add_portfolio_argument, portfolio_from_args
+from src.services.positions import check_positions, rebuild_positions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recalcula a tabela de posições a partir das transações.")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Apenas compara a tabela com compute_positions, sem recalcular.",
+    )
+    add_portfolio_argument(parser)
+    args = parser.parse_args()
+    database = portfolio_from_args(parser, args).database()
+
+    setup_logging()
+    init_db(database)
+    with database.SessionLocal() as session:
+        if not args.check:
+            count = rebuild_positions(session)
+            session.commit()
+            print(f"Posições recalculadas: {count}")
+        mismatched = check_positions(session)
+    if mismatched:
+        print(f"Ativos com posição divergente: {mismatched}")
+        raise SystemExit(1)
+    print("Posições consistentes com o ledger.")
+
+
+if __name__ == "__main__":
+    main()
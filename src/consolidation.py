@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from datetime import date
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from src.init_db import init_db
+from src.ledger import SNAPSHOT_ENABLED, ledger_equity_curve, read_ledger, stored_frame
+from src.perf import timed
+from src.portfolios import Portfolio
+from src.processes import spawn_pool
+from src.services.snapshot import portfolio_snapshot
+
+CONSOLIDATION_WORKERS = int(os.getenv("WALLET_CONSOLIDATION_WORKERS", min(4, os.cpu_count() or 1)))
+SUMMED_COLUMNS = ["quantidade", "investido_liquido", "valor_atual", "dividendos"]
+
+
+@dataclass(frozen=True)
+class PortfolioResult:
+    nome: str
+    snapshot: pd.DataFrame
+    curve: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class Consolidation:
+    positions: pd.DataFrame
+    portfolios: pd.DataFrame
+    curves: pd.DataFrame
+
+    @property
+    def curve(self) -> pd.DataFrame:
+        return self.curves.groupby("data", as_index=False)["patrimonio"].sum()
+
+
+def portfolio_result(portfolio: Portfolio, end: date) -> PortfolioResult:
+    # Worker entry point: each portfolio is its own file, so workers never
+    # share a write lock. The snapshot files are the ones the pages use.
+    database = portfolio.database()
+    init_db(database)
+    store = portfolio.snapshots() if SNAPSHOT_ENABLED else None
+    version = database.changes.version()
+    with database.ReadSession() as session:
+        ledger = read_ledger(session, version, store)
+    snapshot = stored_frame(
+        store,
+        ledger.token,
+        "snapshot",
+        lambda: portfolio_snapshot(
+            ledger.assets, ledger.positions, ledger.latest_prices, ledger.trade_prices, ledger.dividends
+        ),
+    )
+    with database.SessionLocal() as session:
+        curve = ledger_equity_curve(session, ledger, end)
+    return PortfolioResult(portfolio.nome, snapshot, curve)
+
+
+@timed
+def consolidate(portfolios: list[Portfolio], end: date, workers: int | None = None) -> Consolidation:
+    workers = min(workers or CONSOLIDATION_WORKERS, len(portfolios))
+    if workers > 1:
+        with spawn_pool(workers) as pool:
+            results = list(pool.map(portfolio_result, portfolios, repeat(end)))
+    else:
+        results = [portfolio_result(portfolio, end) for portfolio in portfolios]
+    return Consolidation(
+        positions=consolidated_positions(results),
+        portfolios=portfolio_totals(results),
+        curves=consolidated_curves(results),
+    )
+
+
+def consolidated_positions(results: list[PortfolioResult]) -> pd.DataFrame:
+    # Assets are matched by name: ids are local to each portfolio file.
+    frame = pd.concat([result.snapshot for result in results], ignore_index=True)
+    frame["custo"] = frame["quantidade"] * frame["preco_medio"]
+    positions = frame.groupby("nome", as_index=False, sort=True).agg(
+        categoria=("categoria", "first"),
+        tipo=("tipo", "first"),
+        setor=("setor", "first"),
+        carteiras=("nome", "size"),
+        custo=("custo", "sum"),
+        **{name: (name, "sum") for name in SUMMED_COLUMNS},
+    )
+    held = positions["quantidade"].where(positions["quantidade"] != 0)
+    positions["preco_medio"] = (positions["custo"] / held).fillna(0.0)
+    total = positions["valor_atual"].sum()
+    positions["participacao"] = positions["valor_atual"] / total if total else 0.0
+    return positions.drop(columns="custo")
+
+
+def portfolio_totals(results: list[PortfolioResult]) -> pd.DataFrame:
+    frame = pd.DataFrame(
+        {
+            "carteira": [result.nome for result in results],
+            "ativos": np.array([len(result.snapshot) for result in results], dtype=np.int64),
+            "investido_liquido": [result.snapshot["investido_liquido"].sum() for result in results],
+            "valor_atual": [result.snapshot["valor_atual"].sum() for result in results],
+            "dividendos": [result.snapshot["dividendos"].sum() for result in results],
+        }
+    )
+    total = frame["valor_atual"].sum()
+    frame["participacao"] = frame["valor_atual"] / total if total else 0.0
+    return frame
+
+
+def consolidated_curves(results: list[PortfolioResult]) -> pd.DataFrame:
+    # One row per day and portfolio over the union of their days; a portfolio
+    # is worth zero before its first trade.
+    curves = [result.curve.assign(carteira=result.nome) for result in results if not result.curve.empty]
+    if not curves:
+        return pd.DataFrame(
+            {"data": pd.Series([], dtype="datetime64[ns]"), "carteira": pd.Series([], dtype=object), "patrimonio": []}
+        )
+    wide = pd.concat(curves).pivot(index="data", columns="carteira", values="patrimonio").fillna(0.0)
+    return wide.stack().rename("patrimonio").reset_index()[["data", "carteira", "patrimonio"]]
@@ -1,13 +1,134 @@
 from __future__ import annotations
 
 import os
+import sqlite3
+import threading
+from dataclasses import dataclass
 from pathlib import Path
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 
+from src.perf import instrument_engine
+
 DB_PATH = Path(os.getenv("WALLET_DB_PATH", Path(__file__).resolve().parents[1] / "data" / "portfolio.db"))
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-engine = create_engine(f"sqlite:///{DB_PATH}", future=True)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+
+@dataclass(frozen=True)
+class EngineSettings:
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    busy_timeout_ms: int = 5000
+    mmap_mb: int = 256
+    cache_mb: int = 64
+    read_pool_size: int = 5
+
+    def __post_init__(self) -> None:
+        if self.journal_mode.upper() not in JOURNAL_MODES:
+            raise ValueError(f"journal_mode inválido: {self.journal_mode}")
+        if self.synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"synchronous inválido: {self.synchronous}")
+
+    @classmethod
+    def from_env(cls) -> EngineSettings:
+        return cls(
+            journal_mode=os.getenv("WALLET_DB_JOURNAL_MODE", cls.journal_mode),
+            synchronous=os.getenv("WALLET_DB_SYNCHRONOUS", cls.synchronous),
+            busy_timeout_ms=int(os.getenv("WALLET_DB_BUSY_TIMEOUT_MS", cls.busy_timeout_ms)),
+            mmap_mb=int(os.getenv("WALLET_DB_MMAP_MB", cls.mmap_mb)),
+            cache_mb=int(os.getenv("WALLET_DB_CACHE_MB", cls.cache_mb)),
+            read_pool_size=int(os.getenv("WALLET_DB_READ_POOL_SIZE", cls.read_pool_size)),
+        )
+
+
+def make_engine(path: Path | str = DB_PATH, settings: EngineSettings | None = None, read_only: bool = False) -> Engine:
+    settings = settings or EngineSettings.from_env()
+    options = {"pool_size": settings.read_pool_size} if read_only else {}
+    engine = create_engine(f"sqlite:///{path}", future=True, connect_args={"check_same_thread": False}, **options)
+
+    @event.listens_for(engine, "connect")
+    def _configure(dbapi_connection, _record) -> None:
+        # Transactions are opened explicitly in _begin instead of by the driver.
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout = {settings.busy_timeout_ms:d}")
+        if not read_only:
+            cursor.execute(f"PRAGMA journal_mode = {settings.journal_mode.upper()}")
+        cursor.execute(f"PRAGMA synchronous = {settings.synchronous.upper()}")
+        cursor.execute(f"PRAGMA mmap_size = {settings.mmap_mb * 1024**2:d}")
+        cursor.execute(f"PRAGMA cache_size = {-settings.cache_mb * 1024:d}")
+        if read_only:
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection) -> None:
+        # Writers take the write lock up front, so a read that later turns into a
+        # write waits on busy_timeout instead of failing with "database is locked".
+        # Readers get one consistent WAL snapshot for the whole session.
+        connection.exec_driver_sql("BEGIN" if read_only else "BEGIN IMMEDIATE")
+
+    return engine
+
+
+class ChangeTracker:
+    # PRAGMA data_version changes whenever another connection commits, so a
+    # dedicated connection that never writes sees every write from the app,
+    # the importer or any other process without touching the tables.
+    def __init__(self, path: Path | str = DB_PATH) -> None:
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def version(self) -> int:
+        with self._lock:
+            if self._connection is None:
+                self._connection = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            return self._connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class Database:
+    # Engines, session factories and change tracker of one SQLite file. Each
+    # portfolio is a file of its own (see src.portfolios).
+    def __init__(self, path: Path | str, settings: EngineSettings | None = None) -> None:
+        self.path = Path(path)
+        self.engine = make_engine(path, settings)
+        self.read_engine = make_engine(path, settings, read_only=True)
+        instrument_engine(self.engine)
+        instrument_engine(self.read_engine)
+        self.SessionLocal = sessionmaker(bind=self.engine, autoflush=False, autocommit=False, future=True)
+        self.ReadSession = sessionmaker(bind=self.read_engine, autoflush=False, autocommit=False, future=True)
+        self.changes = ChangeTracker(path)
+
+
+_databases: dict[Path, Database] = {}
+_databases_lock = threading.Lock()
+
+
+def open_database(path: Path | str, settings: EngineSettings | None = None) -> Database:
+    # One Database per file and process, so its pools are shared by every caller.
+    key = Path(path).resolve()
+    with _databases_lock:
+        if key not in _databases:
+            _databases[key] = Database(path, settings)
+        return _databases[key]
+
+
+SETTINGS = EngineSettings.from_env()
+default_database = open_database(DB_PATH, SETTINGS)
+engine = default_database.engine
+read_engine = default_database.read_engine
+SessionLocal = default_database.SessionLocal
+ReadSession = default_database.ReadSession
+changes = default_database.changes
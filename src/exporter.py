@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import gzip
+import io
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable
+
+import pandas as pd
+from sqlalchemy import Select, String, select, type_coerce
+from sqlalchemy.orm import Session
+
+from src.models import Asset, Dividend, Position, Price, Transaction
+from src.perf import timed
+from src.queries import iter_frames
+
+EXPORT_CHUNK_SIZE = 10_000
+EXPORT_FORMATS = ("csv", "csv.gz", "parquet")
+EXPORT_MIME = {"csv": "text/csv", "csv.gz": "application/gzip", "parquet": "application/vnd.apache.parquet"}
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    stmt: Callable[[], Select]
+    dtypes: dict[str, str]
+
+
+def _transactions_stmt() -> Select:
+    table = Transaction.__table__
+    return (
+        select(
+            type_coerce(table.c.data, String).label("data"),
+            Asset.__table__.c.nome.label("ativo"),
+            table.c.tipo,
+            table.c.preco_unit,
+            table.c.quantidade,
+            table.c.taxas,
+            table.c.valor_total,
+            table.c.resultado,
+            table.c.ganhos,
+        )
+        .join(Asset.__table__, Asset.__table__.c.id == table.c.asset_id)
+        .order_by(table.c.data, table.c.id)
+    )
+
+
+def _dividends_stmt() -> Select:
+    table = Dividend.__table__
+    return (
+        select(type_coerce(table.c.data, String).label("data"), Asset.__table__.c.nome.label("ativo"), table.c.valor)
+        .join(Asset.__table__, Asset.__table__.c.id == table.c.asset_id)
+        .order_by(table.c.data, table.c.id)
+    )
+
+
+def _prices_stmt() -> Select:
+    table = Price.__table__
+    return (
+        select(
+            Asset.__table__.c.nome.label("ativo"),
+            type_coerce(table.c.data, String).label("data"),
+            table.c.preco,
+            table.c.fonte,
+        )
+        .join(Asset.__table__, Asset.__table__.c.id == table.c.asset_id)
+        .order_by(table.c.asset_id, table.c.data, table.c.fonte)
+    )
+
+
+def _positions_stmt() -> Select:
+    table = Position.__table__
+    return (
+        select(
+            Asset.__table__.c.nome.label("ativo"),
+            table.c.quantidade,
+            table.c.preco_medio,
+            table.c.investido_liquido,
+            type_coerce(table.c.ultima_data, String).label("ultima_data"),
+        )
+        .join(Asset.__table__, Asset.__table__.c.id == table.c.asset_id)
+        .order_by(Asset.__table__.c.nome)
+    )
+
+
+EXPORT_TABLES = {
+    "transacoes": ExportTable(
+        _transactions_stmt,
+        {
+            "data": "datetime64[ns]",
+            "ativo": "object",
+            "tipo": "object",
+            "preco_unit": "float64",
+            "quantidade": "float64",
+            "taxas": "float64",
+            "valor_total": "float64",
+            "resultado": "float64",
+            "ganhos": "float64",
+        },
+    ),
+    "proventos": ExportTable(_dividends_stmt, {"data": "datetime64[ns]", "ativo": "object", "valor": "float64"}),
+    "precos": ExportTable(
+        _prices_stmt, {"ativo": "object", "data": "datetime64[ns]", "preco": "float64", "fonte": "object"}
+    ),
+    "posicoes": ExportTable(
+        _positions_stmt,
+        {
+            "ativo": "object",
+            "quantidade": "float64",
+            "preco_medio": "float64",
+            "investido_liquido": "float64",
+            "ultima_data": "datetime64[ns]",
+        },
+    ),
+}
+
+
+@timed
+def export_table(
+    session: Session,
+    name: str,
+    destination: Path | BinaryIO,
+    fmt: str = "csv",
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> int:
+    # Rows go from the cursor to the file one chunk at a time, so peak memory
+    # is a single chunk whatever the table size.
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação desconhecido: {fmt}")
+    if isinstance(destination, Path):
+        with destination.open("wb") as handle:
+            return export_table(session, name, handle, fmt, chunk_size)
+
+    spec = EXPORT_TABLES[name]
+    chunks = iter_frames(session, spec.stmt(), spec.dtypes, chunk_size)
+    if fmt == "parquet":
+        return _write_parquet(chunks, destination, spec.dtypes)
+    return _write_csv(chunks, destination, spec.dtypes, compress=fmt == "csv.gz")
+
+
+def export_bytes(session: Session, name: str, fmt: str = "csv") -> bytes:
+    buffer = io.BytesIO()
+    export_table(session, name, buffer, fmt)
+    return buffer.getvalue()
+
+
+def _write_csv(chunks: Iterator[pd.DataFrame], handle: BinaryIO, dtypes: dict[str, str], compress: bool) -> int:
+    raw = gzip.GzipFile(fileobj=handle, mode="wb") if compress else handle
+    text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    rows = 0
+    try:
+        for chunk in chunks:
+            chunk.to_csv(text, index=False, header=rows == 0, date_format="%Y-%m-%d")
+            rows += len(chunk)
+        if rows == 0:
+            _empty(dtypes).to_csv(text, index=False)
+    finally:
+        # Detach so closing the wrapper never closes the caller's handle.
+        text.flush()
+        text.detach()
+        if compress:
+            raw.close()
+    return rows
+
+
+def _write_parquet(chunks: Iterator[pd.DataFrame], handle: BinaryIO, dtypes: dict[str, str]) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Dates are stored as date32, the same calendar days the ledger holds.
+    types = {"datetime64[ns]": pa.date32(), "float64": pa.float64(), "int64": pa.int64(), "object": pa.string()}
+    schema = pa.schema([(name, types[dtype]) for name, dtype in dtypes.items()])
+    rows = 0
+    with pq.ParquetWriter(handle, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+    return rows
+
+
+def _empty(dtypes: dict[str, str]) -> pd.DataFrame:
+    return pd.DataFrame({name: pd.Series([], dtype=dtype) for name, dtype in dtypes.items()})
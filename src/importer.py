@@ -1,13 +1,63 @@
 from __future__ import annotations
 
+import hashlib
+import os
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future
+from dataclasses import dataclass
 from datetime import datetime
+from itertools import groupby, islice
+from multiprocessing import get_context
 from pathlib import Path
+from queue import Empty
 
+import numpy as np
 import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from src.models import Asset, Dividend, Transaction
+from src.models import FINGERPRINT_SCALE, TRANSACTION_KEY, Asset, Dividend, ImportCheckpoint, Transaction
+from src.perf import timed
+from src.processes import spawn_pool
+from src.services.dividends import record_dividends
+from src.services.portfolio import POSITION_COLUMNS
+from src.services.positions import rebuild_positions, rebuild_stale_positions, record_transactions, stale_assets
+
+IMPORT_SHEETS = ["Ativos", "Entradas", "Saidas", "Dividendos"]
+STREAM_CHUNK_SIZE = 5_000
+IMPORT_WORKERS = min(4, os.cpu_count() or 1)
+# Normalized chunks a worker may queue ahead of the writer.
+PARSE_QUEUE_CHUNKS = 2
+# Below this total size, starting worker processes costs more than it saves.
+PARALLEL_MIN_BYTES = 1024 * 1024
+TRANSACTION_SHEETS = {"Entradas": "BUY", "Saidas": "SELL"}
+DIVIDEND_KEY = ["asset_id", "data", "valor"]
+# Same bytes as models.FINGERPRINT_LAYOUT, one record per row.
+FINGERPRINT_DTYPE = np.dtype(
+    [("asset_id", "<i8"), ("dia", "<i4"), ("tipo", "S8"), ("valores", "<i8", (6,)), ("faltando", "u1")]
+)
+# date(1970, 1, 1).toordinal()
+EPOCH_ORDINAL = 719_163
+
+
+@dataclass
+class ImportProgress:
+    sheet: str
+    rows_done: int
+    rows_total: int | None
+
+
+@dataclass
+class ParsedSheet:
+    sheet: str
+    rows_total: int | None
+    skipped: int
+    # Normalized chunks of at most chunk_size rows, produced as they are read.
+    chunks: Iterator[pd.DataFrame]
 
 
 def _parse_date(value: str | datetime) -> datetime.date:
@@ -90,16 +140,20 @@ def import_excel(path: Path, session: Session) -> dict[str, int]:
                 resultado=float(row.get("Resultado", 0) or 0) if tipo_tx == "SELL" else None,
                 ganhos=float(row.get("Ganhos", 0) or 0) if tipo_tx == "SELL" else None,
             )
-            session.add(tx)
+            # A savepoint per row: a repeated row is dropped alone, and the rows
+            # flushed before it stay, along with their counts.
             try:
-                session.flush()
-                imported["transactions"] += 1
+                with session.begin_nested():
+                    session.add(tx)
             except IntegrityError:
-                session.rollback()
-                session.begin()
+                continue
+            imported["transactions"] += 1
+            touched_assets.add(asset.id)
 
+    touched_assets: set[int] = set()
     handle_transactions("Entradas", "BUY")
     handle_transactions("Saidas", "SELL")
+    rebuild_positions(session, touched_assets)
 
     if "Dividendos" in xls.sheet_names:
         df = pd.read_excel(xls, "Dividendos")
@@ -113,13 +167,443 @@ def import_excel(path: Path, session: Session) -> dict[str, int]:
                 data=_parse_date(row.get("Data")),
                 valor=float(row.get("Valor", 0) or 0),
             )
-            session.add(dividend)
             try:
-                session.flush()
-                imported["dividends"] += 1
+                with session.begin_nested():
+                    session.add(dividend)
             except IntegrityError:
-                session.rollback()
-                session.begin()
+                continue
+            record_dividends(session, [dividend])
+            imported["dividends"] += 1
+
+    session.commit()
+    return imported
 
+
+@timed
+def import_excel_bulk(path: Path, session: Session) -> dict[str, int]:
+    xls = pd.ExcelFile(path)
+    imported = _empty_result()
+    asset_ids = load_asset_ids(session)
+    for sheet in IMPORT_SHEETS:
+        if sheet in xls.sheet_names:
+            import_sheet(session, sheet, pd.read_excel(xls, sheet), asset_ids, imported)
     session.commit()
     return imported
+
+
+@timed
+def import_excel_streaming(
+    path: Path,
+    session: Session,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    progress: Callable[[ImportProgress], None] | None = None,
+    workers: int | None = None,
+) -> dict[str, int]:
+    return import_workbooks([path], session, chunk_size, progress, workers)[0]
+
+
+@timed
+def import_workbooks(
+    paths: list[Path],
+    session: Session,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    progress: Callable[[ImportProgress], None] | None = None,
+    workers: int | None = None,
+) -> list[dict[str, int]]:
+    # Sheets are parsed in worker processes, several at once, while this
+    # process is the only writer: it takes the normalized chunks in file and
+    # sheet order and commits each one together with a checkpoint, so a crashed
+    # import resumes after the last committed chunk. Parsing never runs more
+    # than a few chunks ahead of the writer, so memory stays flat whatever the
+    # size of the files.
+    sources = [file_digest(path) for path in paths]
+    jobs = []
+    for path, source in zip(paths, sources):
+        checkpoints = dict(
+            session.execute(
+                select(ImportCheckpoint.planilha, ImportCheckpoint.linhas).where(ImportCheckpoint.arquivo == source)
+            ).all()
+        )
+        jobs.extend((path, sheet, checkpoints.get(sheet, 0), chunk_size) for sheet in IMPORT_SHEETS)
+
+    if workers is None:
+        workers = IMPORT_WORKERS if sum(path.stat().st_size for path in paths) >= PARALLEL_MIN_BYTES else 1
+    workers = min(workers, len(jobs))
+    parsed = _parse_parallel(jobs, workers) if workers > 1 else _parse_serial(jobs)
+    try:
+        asset_ids = load_asset_ids(session)
+        # Back-dated chunks leave their assets without a position until the
+        # end, instead of recomputing each asset's whole ledger per chunk. An
+        # import that stopped halfway left some behind: they are picked up here.
+        stale = stale_assets(session)
+        results = []
+        for source in sources:
+            imported = _empty_result()
+            for parsed_sheet in islice(parsed, len(IMPORT_SHEETS)):
+                if parsed_sheet is not None:
+                    _write_parsed(session, source, parsed_sheet, asset_ids, imported, progress, stale)
+            session.execute(delete(ImportCheckpoint).where(ImportCheckpoint.arquivo == source))
+            session.commit()
+            results.append(imported)
+        rebuild_stale_positions(session, stale)
+        session.commit()
+    finally:
+        parsed.close()
+    return results
+
+
+def parse_sheet(slot: int, path: Path, sheet: str, skip: int = 0, chunk_size: int = STREAM_CHUNK_SIZE) -> None:
+    # Worker entry point: one sheet per task. The sheet goes through the
+    # worker's queue as a ParsedSheet header (None if the workbook lacks the
+    # sheet), its normalized chunks and a closing None; the queue is bounded,
+    # so a worker ahead of the writer waits instead of piling chunks up.
+    queue = _worker_queues[slot]
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        parsed = _parse_sheet(workbook, sheet, skip, chunk_size)
+        if parsed is None:
+            queue.put(None)
+            return
+        queue.put(ParsedSheet(parsed.sheet, parsed.rows_total, parsed.skipped, iter(())))
+        for chunk in parsed.chunks:
+            if _worker_stop.is_set():
+                return
+            queue.put(chunk)
+        queue.put(None)
+    finally:
+        workbook.close()
+
+
+def _init_worker(queues: list, stop) -> None:
+    global _worker_queues, _worker_stop
+    _worker_queues, _worker_stop = queues, stop
+
+
+_worker_queues: list = []
+_worker_stop = None
+
+
+def _parse_parallel(jobs: list[tuple], workers: int) -> Iterator[ParsedSheet | None]:
+    # At most one sheet per worker is in flight, each with its own queue slot;
+    # the next sheet is only submitted once the writer is done with one.
+    context = get_context("spawn")
+    queues = [context.Queue(PARSE_QUEUE_CHUNKS) for _ in range(workers)]
+    stop = context.Event()
+    pool = spawn_pool(workers, initializer=_init_worker, initargs=(queues, stop))
+    futures: dict[int, Future] = {}
+    try:
+        for index, job in enumerate(jobs):
+            for ahead in range(len(futures), min(index + workers, len(jobs))):
+                futures[ahead] = pool.submit(parse_sheet, ahead % workers, *jobs[ahead])
+            yield _queued_sheet(queues[index % workers], futures[index])
+    finally:
+        stop.set()
+        # Workers blocked on a full queue are released by draining it.
+        while not all(future.done() for future in futures.values()):
+            for queue in queues:
+                while not queue.empty():
+                    queue.get_nowait()
+            time.sleep(0.01)
+        pool.shutdown(cancel_futures=True)
+
+
+def _queued_sheet(queue, future: Future) -> ParsedSheet | None:
+    header = _queued(queue, future)
+    if header is None:
+        return None
+    return ParsedSheet(header.sheet, header.rows_total, header.skipped, _queued_chunks(queue, future))
+
+
+def _queued_chunks(queue, future: Future) -> Iterator[pd.DataFrame]:
+    while (chunk := _queued(queue, future)) is not None:
+        yield chunk
+
+
+def _queued(queue, future: Future):
+    # A worker that failed never sends the rest of its sheet: its error is
+    # raised here instead of waiting forever.
+    while True:
+        try:
+            return queue.get(timeout=0.1)
+        except Empty:
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+
+
+def _parse_serial(jobs: list[tuple]) -> Iterator[ParsedSheet | None]:
+    # Without workers each workbook is opened once for all of its sheets, and
+    # each chunk is only parsed after the previous one has been written.
+    for path, group in groupby(jobs, key=lambda job: job[0]):
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for _, sheet, skip, chunk_size in group:
+                yield _parse_sheet(workbook, sheet, skip, chunk_size)
+        finally:
+            workbook.close()
+
+
+def _parse_sheet(workbook, sheet: str, skip: int, chunk_size: int) -> ParsedSheet | None:
+    # Rows are read lazily and normalized chunk by chunk as the chunks are
+    # asked for, so only one chunk of the sheet is alive at a time.
+    if sheet not in workbook.sheetnames:
+        return None
+    worksheet = workbook[sheet]
+    rows = worksheet.iter_rows(values_only=True)
+    header = [str(value).strip() if value is not None else "" for value in next(rows, ())]
+    rows_total = worksheet.max_row - 1 if worksheet.max_row else None
+    chunks = (
+        normalize_sheet(sheet, pd.DataFrame([_pad(row, len(header)) for row in chunk], columns=header))
+        for chunk in _chunks(islice(rows, skip, None), chunk_size)
+    )
+    return ParsedSheet(sheet=sheet, rows_total=rows_total, skipped=skip, chunks=chunks)
+
+
+def _write_parsed(
+    session: Session,
+    source: str,
+    parsed: ParsedSheet,
+    asset_ids: dict[str, int],
+    imported: dict[str, int],
+    progress: Callable[[ImportProgress], None] | None,
+    stale: set[int],
+) -> None:
+    rows_done = parsed.skipped
+    for chunk in parsed.chunks:
+        write_rows(session, parsed.sheet, chunk, asset_ids, imported, stale)
+        rows_done += len(chunk)
+        _save_checkpoint(session, source, parsed.sheet, rows_done)
+        session.commit()
+        if progress:
+            progress(ImportProgress(sheet=parsed.sheet, rows_done=rows_done, rows_total=parsed.rows_total))
+
+
+@timed
+def import_sheet(
+    session: Session, sheet: str, df: pd.DataFrame, asset_ids: dict[str, int], imported: dict[str, int]
+) -> None:
+    write_rows(session, sheet, normalize_sheet(sheet, df), asset_ids, imported)
+
+
+def normalize_sheet(sheet: str, df: pd.DataFrame) -> pd.DataFrame:
+    # Everything that needs no database: names, text, numbers and dates. Rows
+    # without a name stay in, blank, so positions still match the sheet rows.
+    nome = df["Nome"].where(df["Nome"].notna(), "").astype(str).str.strip() if "Nome" in df else ""
+    columns = {
+        "nome": pd.Series(nome, index=df.index).replace("nan", ""),
+        "categoria": _text(df, "Categoria"),
+    }
+    if sheet == "Ativos":
+        columns.update(tipo=_text(df, "Tipo"), setor=_text(df, "Setor"))
+        return pd.DataFrame(columns, index=df.index)
+
+    columns["data"] = _parse_dates(df["Data"].where(columns["nome"] != ""))
+    if sheet in TRANSACTION_SHEETS:
+        preco_unit = _number(df, "Valor un")
+        quantidade = _number(df, "Quantidade")
+        valor_total = preco_unit * quantidade
+        if "Custo Total" in df:
+            valor_total = pd.to_numeric(df["Custo Total"], errors="coerce").fillna(valor_total)
+        is_sell = TRANSACTION_SHEETS[sheet] == "SELL"
+        columns.update(
+            tipo=TRANSACTION_SHEETS[sheet],
+            preco_unit=preco_unit,
+            quantidade=quantidade,
+            taxas=_number(df, "Taxas"),
+            valor_total=valor_total,
+            resultado=_number(df, "Resultado") if is_sell else None,
+            ganhos=_number(df, "Ganhos") if is_sell else None,
+        )
+    else:
+        columns["valor"] = _number(df, "Valor")
+    return pd.DataFrame(columns, index=df.index)
+
+
+@timed
+def write_rows(
+    session: Session,
+    sheet: str,
+    rows: pd.DataFrame,
+    asset_ids: dict[str, int],
+    imported: dict[str, int],
+    stale: set[int] | None = None,
+) -> None:
+    rows = rows[rows["nome"] != ""]
+    if sheet == "Ativos":
+        imported["assets"] += upsert_assets(session, rows, asset_ids)
+        return
+
+    imported["assets"] += resolve_assets(session, rows, asset_ids)
+    frame = rows.assign(asset_id=rows["nome"].map(asset_ids), data=rows["data"].dt.date)
+    if sheet in TRANSACTION_SHEETS:
+        frame = frame.assign(fingerprint=transaction_fingerprints(frame))
+        records = _records(frame, [*TRANSACTION_KEY, "fingerprint"])
+        inserted_rows = insert_transactions(session, records)
+        record_transactions(session, inserted_rows, stale)
+        inserted = len(inserted_rows)
+        imported["transactions"] += inserted
+    else:
+        records = _records(frame, DIVIDEND_KEY)
+        inserted_rows = insert_dividends(session, records)
+        record_dividends(session, inserted_rows)
+        inserted = len(inserted_rows)
+        imported["dividends"] += inserted
+    imported[f"{sheet.lower()}_inserted"] += inserted
+    imported[f"{sheet.lower()}_skipped"] += len(records) - inserted
+
+
+def transaction_fingerprints(frame: pd.DataFrame) -> list[bytes]:
+    # models.transaction_fingerprint for a whole chunk: the keys are packed
+    # into one buffer with numpy and only the hashing runs per row.
+    keys = np.zeros(len(frame), FINGERPRINT_DTYPE)
+    keys["asset_id"] = frame["asset_id"].to_numpy(dtype=np.int64)
+    days = pd.to_datetime(frame["data"]).to_numpy(dtype="datetime64[D]").astype(np.int64)
+    keys["dia"] = days + EPOCH_ORDINAL
+    keys["tipo"] = frame["tipo"].astype(str).str.strip().str.upper().to_numpy(dtype="S8")
+    values = frame[TRANSACTION_KEY[3:]].astype(np.float64).fillna({"taxas": 0.0}).to_numpy()
+    missing = np.isnan(values)
+    keys["valores"] = np.where(missing, 0.0, np.rint(values * FINGERPRINT_SCALE)).astype(np.int64)
+    keys["faltando"] = (missing << np.arange(values.shape[1])).sum(axis=1)
+    buffer, size = keys.tobytes(), FINGERPRINT_DTYPE.itemsize
+    return [hashlib.blake2b(buffer[i : i + size], digest_size=16).digest() for i in range(0, len(buffer), size)]
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_asset_ids(session: Session) -> dict[str, int]:
+    return dict(session.execute(select(Asset.nome, Asset.id)).all())
+
+
+def upsert_assets(session: Session, rows: pd.DataFrame, asset_ids: dict[str, int]) -> int:
+    records = rows[["nome", "categoria", "tipo", "setor"]].to_dict("records")
+    existing = [{f"b_{key}": value for key, value in row.items()} for row in records if row["nome"] in asset_ids]
+    if existing:
+        table = Asset.__table__
+        session.execute(
+            update(table)
+            .where(table.c.nome == bindparam("b_nome"))
+            .values(
+                categoria=func.coalesce(bindparam("b_categoria"), table.c.categoria),
+                tipo=func.coalesce(bindparam("b_tipo"), table.c.tipo),
+                setor=func.coalesce(bindparam("b_setor"), table.c.setor),
+            ),
+            existing,
+        )
+    return _insert_assets(session, [row for row in records if row["nome"] not in asset_ids], asset_ids)
+
+
+def resolve_assets(session: Session, rows: pd.DataFrame, asset_ids: dict[str, int]) -> int:
+    categorias = dict(zip(rows["nome"], rows["categoria"]))
+    table = Asset.__table__
+    missing_categoria = [
+        {"b_nome": nome, "b_categoria": categoria}
+        for nome, categoria in categorias.items()
+        if nome in asset_ids and categoria is not None
+    ]
+    if missing_categoria:
+        session.execute(
+            update(table)
+            .where((table.c.nome == bindparam("b_nome")) & table.c.categoria.is_(None))
+            .values(categoria=bindparam("b_categoria")),
+            missing_categoria,
+        )
+    new_rows = [
+        {"nome": nome, "categoria": categoria, "tipo": None, "setor": None}
+        for nome, categoria in categorias.items()
+        if nome not in asset_ids
+    ]
+    return _insert_assets(session, new_rows, asset_ids)
+
+
+def insert_transactions(session: Session, records: list[dict]) -> list:
+    if not records:
+        return []
+    table = Transaction.__table__
+    stmt = (
+        sqlite_insert(table)
+        .on_conflict_do_nothing(index_elements=["fingerprint"])
+        .returning(*(table.c[name] for name in POSITION_COLUMNS))
+    )
+    return session.execute(stmt, records).all()
+
+
+def insert_dividends(session: Session, records: list[dict]) -> list:
+    if not records:
+        return []
+    table = Dividend.__table__
+    stmt = (
+        sqlite_insert(table)
+        .on_conflict_do_nothing(index_elements=DIVIDEND_KEY)
+        .returning(*(table.c[name] for name in DIVIDEND_KEY))
+    )
+    return session.execute(stmt, records).all()
+
+
+def _insert_assets(session: Session, rows: list[dict], asset_ids: dict[str, int]) -> int:
+    if not rows:
+        return 0
+    stmt = sqlite_insert(Asset.__table__).on_conflict_do_nothing(index_elements=["nome"])
+    inserted = session.execute(stmt, rows).rowcount
+    asset_ids.update(load_asset_ids(session))
+    return inserted
+
+
+def _empty_result() -> dict[str, int]:
+    imported = {"assets": 0, "transactions": 0, "dividends": 0}
+    for sheet in IMPORT_SHEETS[1:]:
+        imported[f"{sheet.lower()}_inserted"] = 0
+        imported[f"{sheet.lower()}_skipped"] = 0
+    return imported
+
+
+def _save_checkpoint(session: Session, source: str, sheet: str, rows_done: int) -> None:
+    stmt = sqlite_insert(ImportCheckpoint.__table__).values(arquivo=source, planilha=sheet, linhas=rows_done)
+    session.execute(
+        stmt.on_conflict_do_update(index_elements=["arquivo", "planilha"], set_={"linhas": stmt.excluded.linhas})
+    )
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _pad(row: tuple, width: int) -> tuple:
+    return row[:width] + (None,) * (width - len(row))
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    # Cells typed as dates by openpyxl pass straight through and text is read as
+    # dd/mm/yyyy, then as ISO, in vectorized passes. Only what both miss is
+    # parsed value by value, once per distinct string.
+    dates = pd.to_datetime(values, format="%d/%m/%Y", errors="coerce")
+    missed = dates.isna() & values.notna()
+    if missed.any():
+        dates[missed] = pd.to_datetime(values[missed], format="ISO8601", errors="coerce")
+        missed = dates.isna() & values.notna()
+    if missed.any():
+        parsed = {value: pd.to_datetime(value, dayfirst=True) for value in values[missed].unique()}
+        dates[missed] = values[missed].map(parsed)
+    return dates.astype("datetime64[ns]")
+
+
+def _text(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df:
+        return pd.Series(None, index=df.index, dtype=object)
+    return pd.Series([value if isinstance(value, str) and value else None for value in df[column]], df.index, object)
+
+
+def _number(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df:
+        return pd.Series(0.0, index=df.index)
+    return pd.to_numeric(df[column], errors="coerce").fillna(0.0)
+
+
+def _records(frame: pd.DataFrame, columns: list[str]) -> list[dict]:
+    values = [frame[column].astype(object).where(frame[column].notna(), None).tolist() for column in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
@@ -1,12 +1,32 @@
 from __future__ import annotations
 
-from src.db import engine
-from src.models import Base
+import argparse
 
+from src.db import Database, default_database
+from src.migrations import migrate
 
-def init_db() -> None:
-    Base.metadata.create_all(engine)
+
+def init_db(database: Database = default_database) -> int:
+    return migrate(database.engine, database.read_engine)
+
+
+def main() -> None:
+    from src.portfolios import add_portfolio_argument, create_portfolio, get_portfolio
+
+    parser = argparse.ArgumentParser(description="Cria o banco ou aplica as migrações pendentes.")
+    add_portfolio_argument(parser)
+    args = parser.parse_args()
+    try:
+        portfolio = get_portfolio(args.carteira)
+    except ValueError:
+        try:
+            create_portfolio(args.carteira)
+        except ValueError as exc:
+            parser.error(str(exc))
+        print(f"Carteira criada: {args.carteira}")
+        return
+    init_db(portfolio.database())
 
 
 if __name__ == "__main__":
-    init_db()
+    main()
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import os
+import shutil
+from dataclasses import dataclass, fields
+from datetime import date
+from pathlib import Path
+from typing import Hashable
+
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.db import DB_PATH
+from src.models import LedgerVersion
+from src.perf import span, timed
+from src.queries import (
+    assets_frame,
+    dividends_frame,
+    last_trade_prices_frame,
+    latest_prices_frame,
+    prices_frame,
+    transactions_frame,
+)
+from src.services.equity import update_equity_curve
+from src.services.portfolio import PositionSnapshot, equity_curve
+from src.services.positions import load_positions
+
+SNAPSHOT_DIR = Path(os.getenv("WALLET_SNAPSHOT_DIR", DB_PATH.parent / "snapshots"))
+SNAPSHOT_ENABLED = os.getenv("WALLET_SNAPSHOT", "1") == "1"
+# Bumped whenever the layout of the snapshot files changes, so old ones are ignored.
+SNAPSHOT_FORMAT = 1
+
+POSITION_FIELDS = [f.name for f in fields(PositionSnapshot)]
+
+
+@dataclass(frozen=True)
+class Ledger:
+    # Whatever the caches keyed the ledger on; derived results are cached under it too.
+    version: Hashable
+    token: str | None
+    assets: pd.DataFrame
+    transactions: pd.DataFrame
+    dividends: pd.DataFrame
+    latest_prices: pd.DataFrame
+    trade_prices: pd.DataFrame
+    price_history: pd.DataFrame
+    positions: dict[int, PositionSnapshot]
+
+
+LEDGER_FRAMES = ("assets", "transactions", "dividends", "latest_prices", "trade_prices", "price_history", "positions")
+
+
+class SnapshotStore:
+    # One directory of Arrow IPC files per ledger token. The files are
+    # uncompressed so they can be memory-mapped back without decoding.
+    def __init__(self, root: Path = SNAPSHOT_DIR) -> None:
+        self.root = Path(root)
+
+    def path(self, token: str, name: str) -> Path:
+        return self.root / f"v{SNAPSHOT_FORMAT}-{token}" / f"{name}.arrow"
+
+    def read(self, token: str, name: str) -> pd.DataFrame | None:
+        import pyarrow as pa
+
+        path = self.path(token, name)
+        try:
+            with pa.memory_map(str(path)) as source:
+                table = pa.ipc.open_file(source).read_all()
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+        # One block per column, so numbers and timestamps without nulls stay
+        # views of the mapped file, and strings stay in their Arrow buffers
+        # (pandas' str dtype); nothing is copied into consolidated blocks.
+        return table.to_pandas(split_blocks=True)
+
+    def write(self, token: str, name: str, frame: pd.DataFrame) -> None:
+        import pyarrow as pa
+
+        path = self.path(token, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        # Written aside and renamed, so a reader never maps a half-written file.
+        partial = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with pa.OSFile(str(partial), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(partial, path)
+
+    def prune(self, token: str) -> None:
+        keep = self.path(token, "").parent
+        for directory in self.root.glob("v*-*"):
+            if directory != keep:
+                shutil.rmtree(directory, ignore_errors=True)
+
+
+def ledger_token(session: Session) -> str | None:
+    row = session.execute(select(LedgerVersion.instancia, LedgerVersion.versao).where(LedgerVersion.id == 1)).first()
+    return f"{row.instancia}-{row.versao}" if row else None
+
+
+@timed
+def read_ledger(session: Session, version: Hashable, store: SnapshotStore | None = None) -> Ledger:
+    # The token is read in the same transaction as the tables, so files
+    # written under it always match what SQLite held at that point.
+    token = ledger_token(session)
+    frames = _read_snapshot(store, token) if store and token else None
+    if frames is None:
+        frames = _read_tables(session)
+        if store and token:
+            _write_snapshot(store, token, frames)
+    positions = {
+        int(row.asset_id): PositionSnapshot(int(row.asset_id), *map(float, row[1:]))
+        for row in frames.pop("positions").itertuples(index=False)
+    }
+    return Ledger(version=version, token=token, positions=positions, **frames)
+
+
+def _read_tables(session: Session) -> dict[str, pd.DataFrame]:
+    positions = load_positions(session)
+    return {
+        "assets": assets_frame(session),
+        "transactions": transactions_frame(session),
+        "dividends": dividends_frame(session),
+        "latest_prices": latest_prices_frame(session),
+        "trade_prices": last_trade_prices_frame(session),
+        "price_history": prices_frame(session),
+        "positions": pd.DataFrame(
+            [[getattr(p, name) for name in POSITION_FIELDS] for p in positions.values()], columns=POSITION_FIELDS
+        ).astype({"asset_id": "int64"}),
+    }
+
+
+def _read_snapshot(store: SnapshotStore, token: str) -> dict[str, pd.DataFrame] | None:
+    with span("ledger.snapshot_read"):
+        frames = {}
+        for name in LEDGER_FRAMES:
+            frame = store.read(token, name)
+            if frame is None:
+                return None
+            frames[name] = frame
+        return frames
+
+
+def _write_snapshot(store: SnapshotStore, token: str, frames: dict[str, pd.DataFrame]) -> None:
+    with span("ledger.snapshot_write"):
+        try:
+            for name, frame in frames.items():
+                store.write(token, name, frame)
+            store.prune(token)
+        except OSError:
+            # A read-only or full disk only costs the next cold start.
+            pass
+
+
+def stored_frame(store: SnapshotStore | None, token: str | None, name: str, compute) -> pd.DataFrame:
+    # Derived frames live next to the ledger files under the same token.
+    if store is None or token is None:
+        return compute()
+    frame = store.read(token, name)
+    if frame is None:
+        frame = compute()
+        try:
+            store.write(token, name, frame)
+        except OSError:
+            pass
+    return frame
+
+
+def ledger_equity_curve(session: Session, ledger: Ledger, end: date) -> pd.DataFrame:
+    # The daily curve lives in SQLite and only the days after the earliest
+    # change are recomputed. A ledger older than the file (another process
+    # wrote since it was read) gets a curve computed in memory instead, so
+    # stale frames never overwrite stored days.
+    if ledger_token(session) != ledger.token:
+        return equity_curve(ledger.transactions, ledger.price_history, end=end)
+    curve = update_equity_curve(session, ledger.transactions, ledger.price_history, end)
+    session.commit()
+    return curve
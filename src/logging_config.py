@@ -1,6 +1,17 @@
 from __future__ import annotations
 
+import json
 import logging
+from datetime import datetime
+
+PERF_LOGGER = "wallet.perf"
+
+
+class JsonPerfFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {"ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds")}
+        payload.update(getattr(record, "perf", {}))
+        return json.dumps(payload, ensure_ascii=False)
 
 
 def setup_logging() -> None:
@@ -8,3 +19,11 @@ def setup_logging() -> None:
         level=logging.INFO,
         format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
     )
+    # Timing spans go out as one JSON object per line, apart from the regular log.
+    perf_logger = logging.getLogger(PERF_LOGGER)
+    if not perf_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonPerfFormatter())
+        perf_logger.addHandler(handler)
+        perf_logger.setLevel(logging.INFO)
+        perf_logger.propagate = False
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import func, insert, inspect, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from src.models import (
+    SUSPENDABLE_TABLES,
+    TRANSACTION_KEY,
+    Base,
+    DividendMonth,
+    EquityCurvePoint,
+    EquityCurveState,
+    EquityHolding,
+    SchemaVersion,
+    Transaction,
+    create_version_triggers,
+    drop_version_triggers,
+    transaction_fingerprint,
+)
+from src.perf import timed
+
+LEGACY_TRANSACTIONS = "transactions_sem_fingerprint"
+
+
+@dataclass(frozen=True)
+class Migration:
+    versao: int
+    nome: str
+    apply: Callable[[Connection], None]
+
+
+def schema_version(connection: Connection) -> int:
+    try:
+        return connection.execute(select(func.max(SchemaVersion.versao))).scalar() or 0
+    except OperationalError:
+        # No schema_version table: a new file, or one made before migrations.
+        return 0
+
+
+@timed
+def migrate(engine: Engine, reader: Engine | None = None) -> int:
+    # A process that finds the file current pays for one query. Otherwise the
+    # pending steps run in a single write transaction, and the version is read
+    # again under the write lock so concurrent processes apply each step once.
+    with (reader or engine).connect() as connection:
+        current = schema_version(connection)
+    if current >= MIGRATIONS[-1].versao:
+        return current
+    with engine.begin() as connection:
+        current = schema_version(connection)
+        for migration in MIGRATIONS:
+            if migration.versao > current:
+                migration.apply(connection)
+                connection.execute(
+                    insert(SchemaVersion).values(
+                        versao=migration.versao, nome=migration.nome, aplicada_em=datetime.now()
+                    )
+                )
+                current = migration.versao
+    return current
+
+
+def _create_schema(connection: Connection) -> None:
+    # Creates whatever is missing, so files made before versioning are adopted
+    # as they are. Later steps must therefore tolerate a schema that is
+    # already current, as it is on a new file.
+    Base.metadata.create_all(connection)
+    # create_all skips indexes of tables that already exist.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _fill_positions(connection: Connection) -> None:
+    from src.services.positions import ensure_positions
+
+    with Session(bind=connection) as session:
+        ensure_positions(session)
+
+
+def _fingerprint_transactions(connection: Connection) -> None:
+    touched = add_transaction_fingerprints(connection)
+    if touched:
+        from src.services.positions import rebuild_positions
+
+        with Session(bind=connection) as session:
+            rebuild_positions(session, touched)
+            session.commit()
+
+
+def _fill_dividend_months(connection: Connection) -> None:
+    from src.services.dividends import rebuild_dividend_months
+
+    DividendMonth.__table__.create(connection, checkfirst=True)
+    create_version_triggers(connection)
+    with Session(bind=connection) as session:
+        rebuild_dividend_months(session)
+        session.commit()
+
+
+def _create_equity_curve(connection: Connection) -> None:
+    # The curve itself is computed on first read, with every day dirty.
+    for model in (EquityCurvePoint, EquityHolding, EquityCurveState):
+        model.__table__.create(connection, checkfirst=True)
+    create_version_triggers(connection)
+
+
+def _suspendable_triggers(connection: Connection) -> None:
+    # The triggers of a suspendable table are recreated with the WHEN that
+    # reads ledger_version.suspenso, which create_version_triggers adds.
+    for table in SUSPENDABLE_TABLES:
+        drop_version_triggers(connection, table)
+    create_version_triggers(connection)
+
+
+@timed
+def add_transaction_fingerprints(connection: Connection) -> list[int] | None:
+    # Older files dedup transactions on a nine-column UNIQUE constraint that is
+    # part of CREATE TABLE, so the only way to drop it is to rebuild the table.
+    # Rows are copied in id order with their ids, and a repeated fingerprint
+    # keeps the first copy. Returns the assets that lost duplicates, whose
+    # positions must be rebuilt, or None when the table is already current.
+    inspector = inspect(connection)
+    if not inspector.has_table("transactions"):
+        return None
+    if "fingerprint" in {column["name"] for column in inspector.get_columns("transactions")}:
+        return None
+
+    connection.exec_driver_sql(f"ALTER TABLE transactions RENAME TO {LEGACY_TRANSACTIONS}")
+    for index in Transaction.__table__.indexes:
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {index.name}")
+    Transaction.__table__.create(connection)
+
+    # Hashing runs inside SQLite, so the copy is a single INSERT ... SELECT.
+    connection.connection.driver_connection.create_function(
+        "transaction_fingerprint",
+        len(TRANSACTION_KEY),
+        lambda *values: transaction_fingerprint(dict(zip(TRANSACTION_KEY, values))),
+        deterministic=True,
+    )
+    names = ", ".join(TRANSACTION_KEY)
+    connection.exec_driver_sql(
+        f"INSERT INTO transactions (id, {names}, fingerprint) "
+        f"SELECT id, {names}, transaction_fingerprint({names}) FROM {LEGACY_TRANSACTIONS} WHERE true ORDER BY id "
+        "ON CONFLICT (fingerprint) DO NOTHING"
+    )
+    touched = connection.exec_driver_sql(
+        f"SELECT DISTINCT asset_id FROM {LEGACY_TRANSACTIONS} "
+        "WHERE id NOT IN (SELECT id FROM transactions) ORDER BY asset_id"
+    ).scalars().all()
+    # The version triggers moved with the renamed table and are dropped with it.
+    connection.exec_driver_sql(f"DROP TABLE {LEGACY_TRANSACTIONS}")
+    create_version_triggers(connection)
+    connection.exec_driver_sql("UPDATE ledger_version SET versao = versao + 1 WHERE id = 1")
+    return list(touched)
+
+
+MIGRATIONS = [
+    Migration(1, "esquema_inicial", _create_schema),
+    Migration(2, "posicoes_materializadas", _fill_positions),
+    Migration(3, "fingerprint_transacoes", _fingerprint_transactions),
+    Migration(4, "proventos_mensais", _fill_dividend_months),
+    Migration(5, "curva_patrimonio", _create_equity_curve),
+    Migration(6, "gatilhos_suspensiveis", _suspendable_triggers),
+]
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
-from datetime import date
+import hashlib
+import struct
+from collections.abc import Mapping
+from datetime import date, datetime
 
-from sqlalchemy import Date, Float, ForeignKey, Integer, String, UniqueConstraint
+from sqlalchemy import Date, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String, UniqueConstraint, event
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -26,21 +29,60 @@ class Asset(Base):
     prices: Mapped[list["Price"]] = relationship(back_populates="asset", cascade="all, delete-orphan")
 
 
+TRANSACTION_KEY = [
+    "asset_id",
+    "data",
+    "tipo",
+    "preco_unit",
+    "quantidade",
+    "taxas",
+    "valor_total",
+    "resultado",
+    "ganhos",
+]
+FINGERPRINT_SCALE = 1_000_000
+# asset_id, day ordinal, tipo, the six numbers in millionths, bitmask of the missing ones.
+FINGERPRINT_LAYOUT = struct.Struct("<qi8s6qB")
+
+
+def transaction_fingerprint(values: Mapping) -> bytes:
+    # 16-byte hash of the natural key. Numbers are rounded to millionths so
+    # float noise from the spreadsheet does not make two copies of a row look
+    # different, and a missing resultado/ganhos hashes like any other value (a
+    # NULL in a unique index never matches, so BUY rows slipped past the old
+    # nine-column constraint). importer.transaction_fingerprints packs the
+    # same layout for whole chunks.
+    numbers, missing = [], 0
+    for bit, name in enumerate(TRANSACTION_KEY[3:]):
+        value = values.get(name)
+        if name == "taxas" and value is None:
+            value = 0.0
+        if value is None or value != value:
+            numbers.append(0)
+            missing |= 1 << bit
+        else:
+            numbers.append(round(float(value) * FINGERPRINT_SCALE))
+    key = FINGERPRINT_LAYOUT.pack(
+        int(values["asset_id"]),
+        date.fromisoformat(str(values["data"])[:10]).toordinal(),
+        str(values["tipo"]).strip().upper().encode(),
+        *numbers,
+        missing,
+    )
+    return hashlib.blake2b(key, digest_size=16).digest()
+
+
+def _fingerprint_default(context) -> bytes:
+    return transaction_fingerprint(context.get_current_parameters())
+
+
 class Transaction(Base):
     __tablename__ = "transactions"
     __table_args__ = (
-        UniqueConstraint(
-            "asset_id",
-            "data",
-            "tipo",
-            "preco_unit",
-            "quantidade",
-            "taxas",
-            "valor_total",
-            "resultado",
-            "ganhos",
-            name="uq_transactions_natural",
-        ),
+        UniqueConstraint("fingerprint", name="uq_transactions_fingerprint"),
+        Index("ix_transactions_asset_data", "asset_id", "data"),
+        # Newest-first keyset pagination over the whole ledger.
+        Index("ix_transactions_data", "data"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -53,13 +95,17 @@ class Transaction(Base):
     valor_total: Mapped[float] = mapped_column(Float, nullable=False)
     resultado: Mapped[float | None] = mapped_column(Float, nullable=True)
     ganhos: Mapped[float | None] = mapped_column(Float, nullable=True)
+    fingerprint: Mapped[bytes] = mapped_column(LargeBinary(16), nullable=False, default=_fingerprint_default)
 
     asset: Mapped["Asset"] = relationship(back_populates="transactions")
 
 
 class Dividend(Base):
     __tablename__ = "dividends"
-    __table_args__ = (UniqueConstraint("asset_id", "data", "valor", name="uq_dividends_natural"),)
+    __table_args__ = (
+        UniqueConstraint("asset_id", "data", "valor", name="uq_dividends_natural"),
+        Index("ix_dividends_data", "data"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     asset_id: Mapped[int] = mapped_column(ForeignKey("assets.id"), nullable=False)
@@ -80,3 +126,166 @@ class Price(Base):
     fonte: Mapped[str] = mapped_column(String, nullable=False, default="manual")
 
     asset: Mapped["Asset"] = relationship(back_populates="prices")
+
+
+class ImportCheckpoint(Base):
+    __tablename__ = "import_checkpoints"
+    __table_args__ = (UniqueConstraint("arquivo", "planilha", name="uq_import_checkpoints"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    arquivo: Mapped[str] = mapped_column(String, nullable=False)
+    planilha: Mapped[str] = mapped_column(String, nullable=False)
+    linhas: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class Position(Base):
+    __tablename__ = "positions"
+
+    asset_id: Mapped[int] = mapped_column(ForeignKey("assets.id"), primary_key=True)
+    quantidade: Mapped[float] = mapped_column(Float, nullable=False)
+    preco_medio: Mapped[float] = mapped_column(Float, nullable=False)
+    investido_liquido: Mapped[float] = mapped_column(Float, nullable=False)
+    ultima_data: Mapped[date] = mapped_column(Date, nullable=False)
+
+
+class DividendMonth(Base):
+    # Dividends summed per asset and calendar month (mes is the first day),
+    # kept up to date by services.dividends.record_dividends.
+    __tablename__ = "dividend_months"
+
+    asset_id: Mapped[int] = mapped_column(ForeignKey("assets.id"), primary_key=True)
+    mes: Mapped[date] = mapped_column(Date, primary_key=True)
+    valor: Mapped[float] = mapped_column(Float, nullable=False)
+    quantidade: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class EquityCurvePoint(Base):
+    # Daily equity curve, maintained by services.equity.update_equity_curve.
+    __tablename__ = "equity_curve"
+
+    data: Mapped[date] = mapped_column(Date, primary_key=True)
+    patrimonio: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+class EquityHolding(Base):
+    # Quantity and carried price of each held asset at every month end of the
+    # curve and at its last day, so the curve can be resumed from there.
+    __tablename__ = "equity_holdings"
+
+    data: Mapped[date] = mapped_column(Date, primary_key=True)
+    asset_id: Mapped[int] = mapped_column(ForeignKey("assets.id"), primary_key=True)
+    quantidade: Mapped[float] = mapped_column(Float, nullable=False)
+    preco: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+class EquityCurveState(Base):
+    # Single row. desde is the earliest date touched by a write to
+    # transactions or prices since the curve was last brought up to date;
+    # triggers move it back, and NULL means the stored curve is current.
+    __tablename__ = "equity_curve_state"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    desde: Mapped[date | None] = mapped_column(Date, nullable=True)
+
+
+class CdiRate(Base):
+    __tablename__ = "cdi_rates"
+
+    data: Mapped[date] = mapped_column(Date, primary_key=True)
+    valor: Mapped[float] = mapped_column(Float, nullable=False)
+    indice: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+class CdiCoverage(Base):
+    __tablename__ = "cdi_coverage"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    inicio: Mapped[date] = mapped_column(Date, nullable=False)
+    fim: Mapped[date] = mapped_column(Date, nullable=False)
+    verificado_em: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+class LedgerVersion(Base):
+    # Single row bumped by triggers on every ledger write. Unlike PRAGMA
+    # data_version it is stored in the file, so it still identifies the data
+    # after a restart and can tag snapshots written to disk. The random
+    # instance id tells apart databases that happen to share a counter value.
+    __tablename__ = "ledger_version"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    instancia: Mapped[str] = mapped_column(String, nullable=False)
+    versao: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Set by a bulk write for the length of its transaction; the triggers of
+    # SUSPENDABLE_TABLES skip their rows and the writer does their work once.
+    suspenso: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+
+class SchemaVersion(Base):
+    # One row per migration applied by src.migrations.migrate.
+    __tablename__ = "schema_version"
+
+    versao: Mapped[int] = mapped_column(Integer, primary_key=True)
+    nome: Mapped[str] = mapped_column(String, nullable=False)
+    aplicada_em: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+
+VERSIONED_TABLES = ("assets", "transactions", "dividends", "prices", "positions", "dividend_months")
+# Tables the equity curve is computed from, with the dates each write touches.
+CURVE_TABLES = ("transactions", "prices")
+CURVE_TRIGGER_DATES = {
+    "INSERT": "NEW.data",
+    "UPDATE": "min(OLD.data, NEW.data)",
+    "DELETE": "OLD.data",
+}
+# Tables written in bulk, whose triggers a transaction can switch off with
+# ledger_version.suspenso instead of dropping them, which would change the
+# schema under every open connection.
+SUSPENDABLE_TABLES = ("prices",)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_version_triggers(target, connection, **kw) -> None:
+    create_version_triggers(connection)
+
+
+def create_version_triggers(connection) -> None:
+    # Migrations call this too, before later steps have created their tables,
+    # so tables not in the file yet are skipped.
+    existing = set(connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").scalars())
+    connection.exec_driver_sql(
+        "INSERT OR IGNORE INTO ledger_version (id, instancia, versao) VALUES (1, lower(hex(randomblob(8))), 0)"
+    )
+    # The suspendable triggers read this column, and SQLite checks trigger
+    # bodies on every later ALTER TABLE, so it must exist before they do.
+    if "suspenso" not in {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(ledger_version)")}:
+        connection.exec_driver_sql("ALTER TABLE ledger_version ADD COLUMN suspenso INTEGER NOT NULL DEFAULT 0")
+    for table in existing.intersection(VERSIONED_TABLES):
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            connection.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_versao "
+                f"AFTER {operation} ON {table} {_trigger_when(table)}"
+                "BEGIN UPDATE ledger_version SET versao = versao + 1 WHERE id = 1; END"
+            )
+    if "equity_curve_state" not in existing:
+        return
+    connection.exec_driver_sql("INSERT OR IGNORE INTO equity_curve_state (id, desde) VALUES (1, NULL)")
+    for table in CURVE_TABLES:
+        for operation, changed in CURVE_TRIGGER_DATES.items():
+            connection.exec_driver_sql(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_curva "
+                f"AFTER {operation} ON {table} {_trigger_when(table)}"
+                f"BEGIN UPDATE equity_curve_state SET desde = min(coalesce(desde, {changed}), {changed}) "
+                "WHERE id = 1; END"
+            )
+
+
+def drop_version_triggers(connection, table: str) -> None:
+    for operation in ("insert", "update", "delete"):
+        for kind in ("versao", "curva"):
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS trg_{table}_{operation}_{kind}")
+
+
+def _trigger_when(table: str) -> str:
+    if table not in SUSPENDABLE_TABLES:
+        return ""
+    return "WHEN (SELECT suspenso FROM ledger_version WHERE id = 1) = 0 "
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.logging_config import PERF_LOGGER
+
+PERF_ENABLED = os.getenv("WALLET_PERF", "0") == "1"
+
+F = TypeVar("F", bound=Callable)
+
+logger = logging.getLogger(PERF_LOGGER)
+
+
+@dataclass
+class Span:
+    name: str
+    depth: int
+    seconds: float = 0.0
+    sql_count: int = 0
+    sql_seconds: float = 0.0
+
+
+@dataclass
+class PerfRun:
+    label: str
+    spans: list[Span] = field(default_factory=list)
+    sql_count: int = 0
+    sql_seconds: float = 0.0
+    started: float = field(default_factory=time.perf_counter)
+    stack: list[Span] = field(default_factory=list)
+
+    @property
+    def seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+
+_current_run: ContextVar[PerfRun | None] = ContextVar("perf_run", default=None)
+
+
+def start_run(label: str) -> PerfRun:
+    run = PerfRun(label)
+    _current_run.set(run)
+    return run
+
+
+def current_run() -> PerfRun | None:
+    return _current_run.get()
+
+
+class _SpanTimer:
+    __slots__ = ("name", "run", "span", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> Span:
+        self.run = _current_run.get()
+        depth = len(self.run.stack) if self.run else 0
+        self.span = Span(self.name, depth)
+        if self.run:
+            self.run.spans.append(self.span)
+            self.run.stack.append(self.span)
+        self.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, *exc) -> None:
+        self.span.seconds = time.perf_counter() - self.start
+        if self.run:
+            self.run.stack.pop()
+        logger.info(
+            "span",
+            extra={
+                "perf": {
+                    "run": self.run.label if self.run else None,
+                    "span": self.name,
+                    "ms": round(self.span.seconds * 1000, 3),
+                    "sql": self.span.sql_count,
+                    "sql_ms": round(self.span.sql_seconds * 1000, 3),
+                }
+            },
+        )
+
+
+def span(name: str):
+    # Disabled spans cost one call and a shared no-op context manager.
+    return _SpanTimer(name) if PERF_ENABLED else nullcontext()
+
+
+def timed(func: F) -> F:
+    if not PERF_ENABLED:
+        return func
+    name = f"{func.__module__.removeprefix('src.')}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _SpanTimer(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def instrument_engine(engine: Engine) -> None:
+    if not PERF_ENABLED:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info.setdefault("perf_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        elapsed = time.perf_counter() - conn.info["perf_started"].pop()
+        run = _current_run.get()
+        if run is None:
+            return
+        run.sql_count += 1
+        run.sql_seconds += elapsed
+        # SQL time is charged to every open span, so nested totals stay inclusive.
+        # It covers cursor.execute only; fetching rows counts toward the span itself.
+        for open_span in run.stack:
+            open_span.sql_count += 1
+            open_span.sql_seconds += elapsed
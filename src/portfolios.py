@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import argparse
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from src.db import DB_PATH, Database, open_database
+from src.ledger import SNAPSHOT_DIR, SnapshotStore
+
+# Each portfolio is a SQLite file of its own: the main one stays at
+# WALLET_DB_PATH and the others live in PORTFOLIOS_DIR, named after them.
+PORTFOLIOS_DIR = Path(os.getenv("WALLET_PORTFOLIOS_DIR", DB_PATH.parent / "carteiras"))
+DEFAULT_PORTFOLIO = "principal"
+PORTFOLIO_NAME = re.compile(r"^\w[\w -]*$")
+
+
+@dataclass(frozen=True)
+class Portfolio:
+    nome: str
+    path: Path
+
+    @property
+    def snapshot_dir(self) -> Path:
+        if self.nome == DEFAULT_PORTFOLIO:
+            return SNAPSHOT_DIR
+        return self.path.parent / "snapshots" / self.path.stem
+
+    def database(self) -> Database:
+        return open_database(self.path)
+
+    def snapshots(self) -> SnapshotStore:
+        return SnapshotStore(self.snapshot_dir)
+
+
+def list_portfolios() -> list[Portfolio]:
+    others = sorted(PORTFOLIOS_DIR.glob("*.db")) if PORTFOLIOS_DIR.is_dir() else []
+    return [Portfolio(DEFAULT_PORTFOLIO, DB_PATH), *(Portfolio(path.stem, path) for path in others)]
+
+
+def get_portfolio(nome: str | None) -> Portfolio:
+    if not nome or nome == DEFAULT_PORTFOLIO:
+        return Portfolio(DEFAULT_PORTFOLIO, DB_PATH)
+    path = PORTFOLIOS_DIR / f"{nome}.db"
+    if not path.exists():
+        raise ValueError(f"Carteira não encontrada: {nome}")
+    return Portfolio(nome, path)
+
+
+def create_portfolio(nome: str) -> Portfolio:
+    from src.init_db import init_db
+
+    nome = nome.strip()
+    if not PORTFOLIO_NAME.match(nome):
+        raise ValueError("Nome de carteira inválido: use letras, números, espaço, hífen ou sublinhado.")
+    if nome == DEFAULT_PORTFOLIO or (PORTFOLIOS_DIR / f"{nome}.db").exists():
+        raise ValueError(f"Carteira já existe: {nome}")
+    PORTFOLIOS_DIR.mkdir(parents=True, exist_ok=True)
+    portfolio = Portfolio(nome, PORTFOLIOS_DIR / f"{nome}.db")
+    init_db(portfolio.database())
+    return portfolio
+
+
+def add_portfolio_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--carteira",
+        default=DEFAULT_PORTFOLIO,
+        help=f"Carteira a usar (padrão: {DEFAULT_PORTFOLIO}, o arquivo em WALLET_DB_PATH).",
+    )
+
+
+def portfolio_from_args(parser: argparse.ArgumentParser, args: argparse.Namespace) -> Portfolio:
+    try:
+        return get_portfolio(args.carteira)
+    except ValueError as exc:
+        parser.error(str(exc))
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import gzip
+import time
+import unicodedata
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from src.models import Asset
+from src.perf import timed
+
+PRICE_BATCH_SIZE = 100_000
+PRICE_FILE_TYPES = ("csv", "gz", "parquet")
+DEFAULT_PRICE_SOURCE = "importacao"
+# Header spellings accepted for each column, after lower-casing and dropping accents.
+PRICE_COLUMN_ALIASES = {
+    "ticker": "ticker",
+    "ticker_mercado": "ticker",
+    "ativo": "ticker",
+    "nome": "ticker",
+    "data": "data",
+    "date": "data",
+    "preco": "preco",
+    "price": "preco",
+    "fechamento": "preco",
+    "close": "preco",
+    "fonte": "fonte",
+    "source": "fonte",
+}
+# Rows go to sqlite3's executemany as plain tuples: at millions of rows,
+# SQLAlchemy's per-row parameter handling costs more than the insert itself.
+# They are staged in a temporary table (private to the connection, so the
+# file's schema never changes), which tells which prices are new or changed
+# before they are upserted. An unchanged price is left alone, so re-loading a
+# file rewrites nothing and does not bump the ledger version.
+PRICE_STAGE = (
+    "CREATE TEMP TABLE IF NOT EXISTS lote_precos (asset_id INTEGER, data DATE, preco FLOAT, fonte VARCHAR)"
+)
+PRICE_CHANGED_SINCE = (
+    "SELECT min(lote.data) FROM lote_precos AS lote LEFT JOIN prices "
+    "ON prices.asset_id = lote.asset_id AND prices.data = lote.data AND prices.fonte = lote.fonte "
+    "WHERE prices.preco IS NOT lote.preco"
+)
+PRICE_UPSERT = (
+    "INSERT INTO prices (asset_id, data, preco, fonte) SELECT asset_id, data, preco, fonte FROM lote_precos "
+    "WHERE true ON CONFLICT (asset_id, data, fonte) DO UPDATE SET preco = excluded.preco "
+    "WHERE preco IS NOT excluded.preco"
+)
+
+
+@dataclass
+class PriceImportResult:
+    rows: int = 0
+    written: int = 0
+    unknown: int = 0
+    invalid: int = 0
+    seconds: float = 0.0
+    unknown_tickers: set[str] = field(default_factory=set)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def price_ticker_lookup(session: Session) -> dict[str, int]:
+    # Built once per import; ticker_mercado wins over an asset named the same.
+    rows = session.execute(select(Asset.id, Asset.nome, Asset.ticker_mercado)).all()
+    lookup = {_ticker(nome): asset_id for asset_id, nome, _ in rows}
+    lookup.update({_ticker(ticker): asset_id for asset_id, _, ticker in rows if ticker})
+    return lookup
+
+
+@timed
+def import_prices(
+    session: Session,
+    source: Path | BinaryIO,
+    file_type: str | None = None,
+    fonte: str = DEFAULT_PRICE_SOURCE,
+    batch_size: int = PRICE_BATCH_SIZE,
+    progress: Callable[[PriceImportResult], None] | None = None,
+) -> PriceImportResult:
+    # Each batch is committed on its own. The upsert is idempotent, so an
+    # interrupted load is finished by running it again.
+    started = time.perf_counter()
+    result = PriceImportResult()
+    lookup = price_ticker_lookup(session)
+    for batch in read_price_batches(source, file_type, batch_size):
+        result.rows += len(batch)
+        frame = _prepare(batch, lookup, fonte, result)
+        result.written += write_prices(session, frame)
+        session.commit()
+        result.seconds = time.perf_counter() - started
+        if progress:
+            progress(result)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def read_price_batches(
+    source: Path | BinaryIO, file_type: str | None = None, batch_size: int = PRICE_BATCH_SIZE
+) -> Iterator[pd.DataFrame]:
+    file_type = file_type or _file_type(source)
+    if file_type not in PRICE_FILE_TYPES:
+        raise ValueError(f"Formato de cotações desconhecido: {file_type}")
+    if file_type == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(source)
+        names = {name: _column(name) for name in parquet.schema_arrow.names}
+        columns = [name for name, column in names.items() if column in PRICE_COLUMN_ALIASES]
+        for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+            yield _rename(batch.to_pandas(date_as_object=False))
+        return
+    compression = "gzip" if file_type == "gz" else None
+    reader = pd.read_csv(
+        source,
+        chunksize=batch_size,
+        sep=_separator(source, compression),
+        compression=compression,
+        usecols=lambda name: _column(name) in PRICE_COLUMN_ALIASES,
+    )
+    with reader:
+        for chunk in reader:
+            yield _rename(chunk)
+
+
+def write_prices(session: Session, frame: pd.DataFrame) -> int:
+    if frame.empty:
+        return 0
+    # Sorted by the unique index, so each batch walks its B-tree in order.
+    order = np.lexsort((frame["data"].to_numpy(), frame["asset_id"].to_numpy()))
+    frame = frame.iloc[order]
+    days = np.datetime_as_string(frame["data"].to_numpy(dtype="datetime64[D]"), unit="D")
+    rows = list(
+        zip(
+            frame["asset_id"].tolist(),
+            days.tolist(),
+            frame["preco"].tolist(),
+            frame["fonte"].tolist(),
+        )
+    )
+    connection = session.connection()
+    connection.exec_driver_sql(PRICE_STAGE)
+    connection.exec_driver_sql("DELETE FROM lote_precos")
+    connection.exec_driver_sql("INSERT INTO lote_precos VALUES (?, ?, ?, ?)", rows)
+    first = connection.exec_driver_sql(PRICE_CHANGED_SINCE).scalar()
+    if first is None:
+        return 0
+    # One version bump and one equity-curve mark per batch instead of one per
+    # row: the prices triggers are suspended for the upsert, and the curve is
+    # marked from the earliest price that actually changed.
+    connection.exec_driver_sql("UPDATE ledger_version SET suspenso = 1 WHERE id = 1")
+    written = connection.exec_driver_sql(PRICE_UPSERT).rowcount
+    connection.exec_driver_sql("UPDATE ledger_version SET suspenso = 0, versao = versao + 1 WHERE id = 1")
+    connection.exec_driver_sql(
+        "UPDATE equity_curve_state SET desde = min(coalesce(desde, ?), ?) WHERE id = 1", (first, first)
+    )
+    return written
+
+
+def _prepare(batch: pd.DataFrame, lookup: dict[str, int], fonte: str, result: PriceImportResult) -> pd.DataFrame:
+    missing = {"ticker", "data", "preco"} - set(batch.columns)
+    if missing:
+        raise ValueError(f"Colunas ausentes no arquivo de cotações: {', '.join(sorted(missing))}")
+    tickers = batch["ticker"].astype(str).str.strip().str.upper()
+    asset_ids = tickers.map(lookup)
+    known = asset_ids.notna().to_numpy()
+    result.unknown += int((~known).sum())
+    result.unknown_tickers.update(tickers[~known].unique().tolist())
+
+    fontes = batch["fonte"].fillna(fonte).astype(str) if "fonte" in batch else pd.Series(fonte, index=batch.index)
+    frame = pd.DataFrame(
+        {
+            "asset_id": asset_ids,
+            "data": _dates(batch["data"]),
+            "preco": _prices(batch["preco"]),
+            "fonte": fontes.str.strip().replace("", fonte),
+        }
+    )[known]
+    valid = frame["data"].notna() & frame["preco"].notna() & (frame["preco"] > 0)
+    result.invalid += int((~valid).sum())
+    return frame[valid].astype({"asset_id": "int64"})
+
+
+def _dates(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    text = values.astype(str).str.strip()
+    parsed = pd.to_datetime(text, format="ISO8601", errors="coerce")
+    missing = parsed.isna()
+    if missing.any():
+        parsed[missing] = pd.to_datetime(text[missing], format="%d/%m/%Y", errors="coerce")
+    return parsed
+
+
+def _prices(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype("float64")
+    # Decimal comma, as spreadsheets export in pt-BR: "1.234,56".
+    text = values.astype(str).str.strip()
+    comma = text.str.contains(",", regex=False)
+    text[comma] = text[comma].str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    return pd.to_numeric(text, errors="coerce")
+
+
+def _rename(frame: pd.DataFrame) -> pd.DataFrame:
+    frame = frame.rename(columns=lambda name: PRICE_COLUMN_ALIASES[_column(name)])
+    # With both "ticker" and "nome" in the header, the first one wins.
+    return frame.loc[:, ~frame.columns.duplicated()]
+
+
+def _separator(source: Path | BinaryIO, compression: str | None) -> str:
+    # pt-BR spreadsheets export with ";", since "," is the decimal mark.
+    if isinstance(source, Path):
+        opener = gzip.open if compression else open
+        with opener(source, "rb") as handle:
+            header = handle.readline()
+    else:
+        position = source.tell()
+        raw = gzip.GzipFile(fileobj=source) if compression else source
+        header = raw.readline()
+        source.seek(position)
+    return ";" if header.count(b";") > header.count(b",") else ","
+
+
+def _column(name: str) -> str:
+    text = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode()
+    return text.strip().lower().replace(" ", "_")
+
+
+def _ticker(value: str) -> str:
+    return str(value).strip().upper()
+
+
+def _file_type(source: Path | BinaryIO) -> str:
+    name = str(source) if isinstance(source, Path) else getattr(source, "name", "")
+    return name.rsplit(".", 1)[-1].lower() if "." in name else "csv"
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context, spawn
+
+_launching = threading.local()
+_preparation_data = spawn.get_preparation_data
+
+
+def _worker_preparation_data(name: str) -> dict:
+    # A spawned worker first runs the parent's __main__ again. Under Streamlit
+    # that is the page being rendered (the script runner installs it as
+    # __main__ and leaves it there), so every worker would render the page,
+    # and a page that starts a pool would start another one from inside it.
+    # Workers of a SpawnPool get no main module at all: what they run lives in
+    # src, and sys.modules["__main__"], which other sessions' script runners
+    # keep replacing, is left alone.
+    data = _preparation_data(name)
+    if getattr(_launching, "pool", False):
+        data.pop("init_main_from_name", None)
+        data.pop("init_main_from_path", None)
+    return data
+
+
+# popen_spawn_posix looks the function up on the module at every launch; only
+# launches made from SpawnPool.submit, in that thread, are affected.
+spawn.get_preparation_data = _worker_preparation_data
+
+
+class SpawnPool(ProcessPoolExecutor):
+    # Workers start lazily, from the thread that submits.
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        _launching.pool = True
+        try:
+            return super().submit(fn, *args, **kwargs)
+        finally:
+            _launching.pool = False
+
+
+def spawn_pool(workers: int, **kwargs) -> SpawnPool:
+    # spawn rather than fork: the Streamlit server that starts these is multithreaded.
+    return SpawnPool(workers, mp_context=get_context("spawn"), **kwargs)
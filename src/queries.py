@@ -1,9 +1,87 @@
 from __future__ import annotations
 
-from sqlalchemy import func
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import String, case, func, select, tuple_, type_coerce
 from sqlalchemy.orm import Session
 
-from src.models import Asset, Dividend, Price, Transaction
+from src.models import Asset, Dividend, DividendMonth, EquityCurvePoint, Price, Transaction
+from src.perf import timed
+
+FRAME_CHUNK_SIZE = 50_000
+LIST_PAGE_SIZE = 50
+PRICE_SOURCE_PRECEDENCE = ["manual"]
+
+ASSET_DTYPES = {
+    "id": "int64",
+    "nome": "object",
+    "categoria": "object",
+    "tipo": "object",
+    "setor": "object",
+    "ticker_mercado": "object",
+    "observacoes": "object",
+}
+TRANSACTION_DTYPES = {
+    "id": "int64",
+    "asset_id": "int64",
+    "nome": "category",
+    "data": "datetime64[ns]",
+    "tipo": "category",
+    "preco_unit": "float64",
+    "quantidade": "float64",
+    "taxas": "float64",
+    "valor_total": "float64",
+    "resultado": "float64",
+    "ganhos": "float64",
+}
+DIVIDEND_DTYPES = {
+    "id": "int64",
+    "asset_id": "int64",
+    "nome": "category",
+    "data": "datetime64[ns]",
+    "valor": "float64",
+}
+DIVIDEND_MONTH_DTYPES = {
+    "asset_id": "int64",
+    "nome": "category",
+    "mes": "datetime64[ns]",
+    "valor": "float64",
+    "quantidade": "int64",
+}
+EQUITY_CURVE_DTYPES = {"data": "datetime64[ns]", "patrimonio": "float64"}
+PRICE_DTYPES = {
+    "id": "int64",
+    "asset_id": "int64",
+    "nome": "category",
+    "data": "datetime64[ns]",
+    "preco": "float64",
+    "fonte": "category",
+}
+
+TRANSACTION_LIST_DTYPES = {
+    "id": "int64",
+    "data": "datetime64[ns]",
+    "nome": "object",
+    "tipo": "object",
+    "preco_unit": "float64",
+    "quantidade": "float64",
+    "taxas": "float64",
+    "valor_total": "float64",
+    "resultado": "float64",
+    "ganhos": "float64",
+}
+DIVIDEND_LIST_DTYPES = {"id": "int64", "data": "datetime64[ns]", "nome": "object", "valor": "float64"}
+
+
+@dataclass
+class ListPage:
+    rows: pd.DataFrame
+    # (data, id) of the last row, to pass as `after` for the next page; None on the last page.
+    next_key: tuple[date, int] | None
 
 
 def list_assets(session: Session) -> list[Asset]:
@@ -18,15 +96,312 @@ def list_dividends(session: Session) -> list[Dividend]:
     return session.query(Dividend).order_by(Dividend.data).all()
 
 
+@timed
 def latest_prices(session: Session) -> dict[int, float]:
-    sub = (
-        session.query(Price.asset_id, func.max(Price.data).label("max_date"))
-        .group_by(Price.asset_id)
-        .subquery()
+    return {row.asset_id: row.preco for row in session.execute(latest_prices_stmt()).all()}
+
+
+@timed
+def latest_prices_frame(session: Session) -> pd.DataFrame:
+    rows = session.execute(latest_prices_stmt()).all()
+    df = _latest_frame(rows)
+    df["fonte"] = pd.Series([row.fonte for row in rows], dtype="str")
+    return df
+
+
+@timed
+def last_trade_prices_frame(session: Session) -> pd.DataFrame:
+    return _latest_frame(session.execute(last_trade_prices_stmt()).all())
+
+
+def latest_prices_stmt():
+    # One index-only seek per asset on uq_prices_natural (asset_id, data, fonte),
+    # then a rowid lookup. Several sources on the same day are resolved by
+    # PRICE_SOURCE_PRECEDENCE, then by source name and newest id.
+    latest = Price.__table__.alias("latest")
+    precedence = case(
+        {fonte: rank for rank, fonte in enumerate(PRICE_SOURCE_PRECEDENCE)},
+        value=latest.c.fonte,
+        else_=len(PRICE_SOURCE_PRECEDENCE),
+    )
+    latest_id = (
+        select(latest.c.id)
+        .where(latest.c.asset_id == Asset.__table__.c.id)
+        .order_by(latest.c.data.desc(), precedence, latest.c.fonte, latest.c.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    table = Price.__table__
+    return select(table.c.asset_id, table.c.data, table.c.preco, table.c.fonte).join_from(
+        Asset.__table__, table, table.c.id == latest_id
+    )
+
+
+def last_trade_prices_stmt():
+    # Same shape as latest_prices_stmt: one seek per asset on the (asset_id, data)
+    # prefix, taking the last trade of the latest day.
+    latest = Transaction.__table__.alias("latest")
+    latest_id = (
+        select(latest.c.id)
+        .where(latest.c.asset_id == Asset.__table__.c.id)
+        .order_by(latest.c.data.desc(), latest.c.id.desc())
+        .limit(1)
+        .scalar_subquery()
     )
-    rows = (
-        session.query(Price.asset_id, Price.preco)
-        .join(sub, (Price.asset_id == sub.c.asset_id) & (Price.data == sub.c.max_date))
-        .all()
+    table = Transaction.__table__
+    return select(table.c.asset_id, table.c.data, table.c.preco_unit.label("preco")).join_from(
+        Asset.__table__, table, table.c.id == latest_id
+    )
+
+
+@timed
+def assets_frame(session: Session) -> pd.DataFrame:
+    table = Asset.__table__
+    stmt = select(*(table.c[name] for name in ASSET_DTYPES)).order_by(table.c.nome)
+    return _read_frame(session, stmt, ASSET_DTYPES)
+
+
+@timed
+def transactions_frame(session: Session) -> pd.DataFrame:
+    table = Transaction.__table__
+    stmt = (
+        select(
+            table.c.id,
+            table.c.asset_id,
+            Asset.__table__.c.nome,
+            type_coerce(table.c.data, String).label("data"),
+            table.c.tipo,
+            table.c.preco_unit,
+            table.c.quantidade,
+            table.c.taxas,
+            table.c.valor_total,
+            table.c.resultado,
+            table.c.ganhos,
+        )
+        .join(Asset.__table__, Asset.__table__.c.id == table.c.asset_id)
     )
-    return {asset_id: preco for asset_id, preco in rows}
+    return _read_frame(session, stmt, TRANSACTION_DTYPES, sort_by=["data", "id"])
+
+
+@timed
+def dividends_frame(session: Session) -> pd.DataFrame:
+    table = Dividend.__table__
+    stmt = (
+        select(
+            table.c.id,
+            table.c.asset_id,
+            Asset.__table__.c.nome,
+            type_coerce(table.c.data, String).label("data"),
+            table.c.valor,
+        )
+        .join(Asset.__table__, Asset.__table__.c.id == table.c.asset_id)
+    )
+    return _read_frame(session, stmt, DIVIDEND_DTYPES, sort_by=["data", "id"])
+
+
+@timed
+def dividend_months_frame(session: Session) -> pd.DataFrame:
+    table = DividendMonth.__table__
+    stmt = (
+        select(
+            table.c.asset_id,
+            Asset.__table__.c.nome,
+            type_coerce(table.c.mes, String).label("mes"),
+            table.c.valor,
+            table.c.quantidade,
+        )
+        .join(Asset.__table__, Asset.__table__.c.id == table.c.asset_id)
+    )
+    return _read_frame(session, stmt, DIVIDEND_MONTH_DTYPES, sort_by=["mes", "asset_id"])
+
+
+@timed
+def equity_curve_frame(session: Session, end: date | None = None) -> pd.DataFrame:
+    table = EquityCurvePoint.__table__
+    stmt = select(type_coerce(table.c.data, String).label("data"), table.c.patrimonio).order_by(table.c.data)
+    if end is not None:
+        stmt = stmt.where(table.c.data <= end)
+    return _read_frame(session, stmt, EQUITY_CURVE_DTYPES)
+
+
+@timed
+def prices_frame(session: Session) -> pd.DataFrame:
+    table = Price.__table__
+    stmt = (
+        select(
+            table.c.id,
+            table.c.asset_id,
+            Asset.__table__.c.nome,
+            type_coerce(table.c.data, String).label("data"),
+            table.c.preco,
+            table.c.fonte,
+        )
+        .join(Asset.__table__, Asset.__table__.c.id == table.c.asset_id)
+    )
+    return _read_frame(session, stmt, PRICE_DTYPES, sort_by=["asset_id", "data", "id"])
+
+
+@timed
+def transactions_page(
+    session: Session,
+    asset_ids: list[int] | None = None,
+    tipo: str | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    after: tuple[date, int] | None = None,
+    limit: int = LIST_PAGE_SIZE,
+) -> ListPage:
+    table = Transaction.__table__
+    stmt = select(*_list_columns(table, TRANSACTION_LIST_DTYPES))
+    stmt = stmt.join(Asset.__table__, Asset.__table__.c.id == table.c.asset_id)
+    stmt = stmt.where(*_transaction_filters(asset_ids, tipo, start, end))
+    return _keyset_page(session, stmt, table, TRANSACTION_LIST_DTYPES, after, limit)
+
+
+@timed
+def count_transactions(
+    session: Session,
+    asset_ids: list[int] | None = None,
+    tipo: str | None = None,
+    start: date | None = None,
+    end: date | None = None,
+) -> int:
+    stmt = select(func.count()).select_from(Transaction.__table__)
+    return session.execute(stmt.where(*_transaction_filters(asset_ids, tipo, start, end))).scalar_one()
+
+
+@timed
+def dividends_page(
+    session: Session,
+    asset_ids: list[int] | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    after: tuple[date, int] | None = None,
+    limit: int = LIST_PAGE_SIZE,
+) -> ListPage:
+    table = Dividend.__table__
+    stmt = select(*_list_columns(table, DIVIDEND_LIST_DTYPES))
+    stmt = stmt.join(Asset.__table__, Asset.__table__.c.id == table.c.asset_id)
+    stmt = stmt.where(*_date_filters(table, asset_ids, start, end))
+    return _keyset_page(session, stmt, table, DIVIDEND_LIST_DTYPES, after, limit)
+
+
+@timed
+def count_dividends(
+    session: Session,
+    asset_ids: list[int] | None = None,
+    start: date | None = None,
+    end: date | None = None,
+) -> int:
+    table = Dividend.__table__
+    stmt = select(func.count()).select_from(table).where(*_date_filters(table, asset_ids, start, end))
+    return session.execute(stmt).scalar_one()
+
+
+def _transaction_filters(asset_ids, tipo, start, end) -> list:
+    table = Transaction.__table__
+    filters = _date_filters(table, asset_ids, start, end)
+    if tipo:
+        filters.append(table.c.tipo == tipo)
+    return filters
+
+
+def _date_filters(table, asset_ids: list[int] | None, start: date | None, end: date | None) -> list:
+    filters = []
+    if asset_ids:
+        filters.append(table.c.asset_id.in_(asset_ids))
+    if start:
+        filters.append(table.c.data >= start)
+    if end:
+        filters.append(table.c.data <= end)
+    return filters
+
+
+def _keyset_page(session: Session, stmt, table, dtypes, after, limit: int) -> ListPage:
+    # Newest first. Seeking past the last (data, id) seen keeps every page an
+    # index range read, where OFFSET would rescan all the skipped rows.
+    if after is not None:
+        stmt = stmt.where(tuple_(table.c.data, table.c.id) < tuple_(*after))
+    stmt = stmt.order_by(table.c.data.desc(), table.c.id.desc()).limit(limit + 1)
+    rows = _read_frame(session, stmt, dtypes)
+    if len(rows) <= limit:
+        return ListPage(rows=rows, next_key=None)
+    rows = rows.iloc[:limit]
+    last = rows.iloc[-1]
+    return ListPage(rows=rows, next_key=(last["data"].date(), int(last["id"])))
+
+
+def _list_columns(table, dtypes: dict[str, str]) -> list:
+    columns = []
+    for name in dtypes:
+        if name == "nome":
+            columns.append(Asset.__table__.c.nome)
+        elif name == "data":
+            columns.append(type_coerce(table.c.data, String).label("data"))
+        else:
+            columns.append(table.c[name])
+    return columns
+
+
+def _read_frame(
+    session: Session,
+    stmt,
+    dtypes: dict[str, str],
+    sort_by: list[str] | None = None,
+    chunk_size: int = FRAME_CHUNK_SIZE,
+) -> pd.DataFrame:
+    # Rows are fetched in partitions and converted column-wise, so no ORM
+    # instances are built and at most one partition of Row tuples is alive.
+    # Sorting happens in pandas. These reads take whole tables, and an ORDER BY
+    # walks ix_transactions_data / ix_dividends_data with one table lookup per
+    # row (prices also need a temp B-tree, uq_prices_natural has fonte before
+    # id), which is slower than a plain scan followed by an in-memory sort.
+    result = session.execute(stmt)
+    chunks: dict[str, list[np.ndarray]] = {name: [] for name in dtypes}
+    for partition in result.partitions(chunk_size):
+        for name, values in zip(dtypes, zip(*partition)):
+            chunks[name].append(_to_array(values, dtypes[name]))
+
+    columns = {}
+    for name, dtype in dtypes.items():
+        if not chunks[name]:
+            columns[name] = pd.Series([], dtype=dtype)
+        elif dtype == "category":
+            columns[name] = pd.Categorical(np.concatenate(chunks[name]))
+        else:
+            columns[name] = np.concatenate(chunks[name])
+    df = pd.DataFrame(columns, columns=list(dtypes))
+    if sort_by:
+        df = df.sort_values(sort_by, kind="stable", ignore_index=True)
+    return df
+
+
+def iter_frames(
+    session: Session, stmt, dtypes: dict[str, str], chunk_size: int = FRAME_CHUNK_SIZE
+) -> Iterator[pd.DataFrame]:
+    # Same conversion as _read_frame, but each partition is handed over as its
+    # own frame instead of being concatenated.
+    result = session.execute(stmt.execution_options(yield_per=chunk_size))
+    for partition in result.partitions(chunk_size):
+        columns = {name: _to_array(values, dtypes[name]) for name, values in zip(dtypes, zip(*partition))}
+        yield pd.DataFrame(columns, columns=list(dtypes))
+
+
+def _latest_frame(rows: list) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "asset_id": np.array([row.asset_id for row in rows], dtype=np.int64),
+            "data": pd.to_datetime([row.data for row in rows]),
+            "preco": np.array([row.preco for row in rows], dtype=np.float64),
+        }
+    )
+
+
+def _to_array(values: tuple, dtype: str) -> np.ndarray:
+    if dtype == "datetime64[ns]":
+        return pd.to_datetime(pd.Series(values, dtype="object"), format="%Y-%m-%d").to_numpy(dtype="datetime64[ns]")
+    if dtype == "float64":
+        return np.array(values, dtype=np.float64)
+    if dtype == "int64":
+        return np.fromiter(values, dtype=np.int64, count=len(values))
+    return np.array(values, dtype=object)
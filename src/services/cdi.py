@@ -1,30 +1,233 @@
 from __future__ import annotations
 
-from datetime import date
+import logging
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
 
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from urllib3.util.retry import Retry
+
+from src.models import CdiCoverage, CdiRate
+from src.perf import timed
 
 BCB_ENDPOINT = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.12/dados"
+CDI_OFFLINE = os.getenv("WALLET_CDI_OFFLINE", "0") == "1"
+# Rates are published with a delay; a range ending this close to today is only
+# considered covered up to the last rate actually returned.
+CDI_PUBLICATION_LAG = timedelta(days=7)
+CDI_REFRESH_INTERVAL = timedelta(hours=6)
+# SGS refuses daily-series queries spanning more than 10 years.
+CDI_MAX_WINDOW = timedelta(days=3650)
+CDI_FETCH_WORKERS = 4
+CDI_RETRIES = 3
+CDI_BACKOFF = 0.5
+CDI_TIMEOUT = (5, 30)
+
+logger = logging.getLogger(__name__)
+
+_http: requests.Session | None = None
+_http_lock = threading.Lock()
+
+
+@timed
+def fetch_cdi_series(
+    start_date: date, end_date: date, endpoint: str = BCB_ENDPOINT, http: requests.Session | None = None
+) -> pd.DataFrame:
+    return fetch_cdi_ranges([(start_date, end_date)], endpoint=endpoint, http=http)[0]
+
+
+@timed
+def fetch_cdi_ranges(
+    ranges: list[tuple[date, date]], endpoint: str = BCB_ENDPOINT, http: requests.Session | None = None
+) -> list[pd.DataFrame]:
+    # Every range is cut into windows the API accepts, and all windows of all
+    # ranges are fetched at once over one pooled session.
+    http = http or _shared_session()
+    windows = [(i, window) for i, (start, end) in enumerate(ranges) for window in _windows(start, end)]
+    if len(windows) > 1:
+        with ThreadPoolExecutor(min(CDI_FETCH_WORKERS, len(windows))) as pool:
+            frames = list(pool.map(lambda item: _fetch_window(http, endpoint, *item[1]), windows))
+    else:
+        frames = [_fetch_window(http, endpoint, *window) for _, window in windows]
+
+    parts: list[list[pd.DataFrame]] = [[] for _ in ranges]
+    for (i, _), frame in zip(windows, frames):
+        parts[i].append(frame)
+    return [
+        pd.concat(frames, ignore_index=True).drop_duplicates("data").sort_values("data", ignore_index=True)
+        if frames
+        else _empty_rates()
+        for frames in parts
+    ]
+
+
+def cdi_http_session(retries: int = CDI_RETRIES, backoff: float = CDI_BACKOFF) -> requests.Session:
+    # Connection errors and throttling/5xx answers are retried with exponential
+    # backoff. A 404 is how SGS answers a window without rates, so it is final.
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=CDI_FETCH_WORKERS, max_retries=retry)
+    http = requests.Session()
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+    return http
+
+
+def _shared_session() -> requests.Session:
+    global _http
+    with _http_lock:
+        if _http is None:
+            _http = cdi_http_session()
+        return _http
+
+
+def _windows(start_date: date, end_date: date) -> list[tuple[date, date]]:
+    windows = []
+    while start_date <= end_date:
+        window_end = min(end_date, start_date + CDI_MAX_WINDOW - timedelta(days=1))
+        windows.append((start_date, window_end))
+        start_date = window_end + timedelta(days=1)
+    return windows
 
 
-def fetch_cdi_series(start_date: date, end_date: date) -> pd.DataFrame:
+def _fetch_window(http: requests.Session, endpoint: str, start_date: date, end_date: date) -> pd.DataFrame:
     params = {
         "formato": "json",
         "dataInicial": start_date.strftime("%d/%m/%Y"),
         "dataFinal": end_date.strftime("%d/%m/%Y"),
     }
-    response = requests.get(BCB_ENDPOINT, params=params, timeout=30)
+    response = http.get(endpoint, params=params, timeout=CDI_TIMEOUT)
+    if response.status_code == 404:
+        return _empty_rates()
     response.raise_for_status()
     data = response.json()
-    df = pd.DataFrame(data)
-    df["data"] = pd.to_datetime(df["data"], dayfirst=True)
+    df = pd.DataFrame(data, columns=["data", "valor"])
+    df["data"] = pd.to_datetime(df["data"], format="%d/%m/%Y")
     df["valor"] = df["valor"].astype(float)
     return df.rename(columns={"valor": "cdi_diario"})
 
 
+def _empty_rates() -> pd.DataFrame:
+    return pd.DataFrame({"data": pd.Series(dtype="datetime64[ns]"), "cdi_diario": pd.Series(dtype="float64")})
+
+
+@timed
 def cdi_accumulated_index(cdi_df: pd.DataFrame) -> pd.DataFrame:
     df = cdi_df.copy()
+    if "acumulado" in df and not df.empty:
+        # Precomputed running index: rebasing a sub-range is a single division.
+        base = df["acumulado"].iloc[0] / (1 + df["cdi_diario"].iloc[0] / 100.0)
+        df["indice"] = df["acumulado"] / base * 100.0
+        return df[["data", "indice"]]
     df["fator"] = 1 + df["cdi_diario"] / 100.0
     df["indice"] = df["fator"].cumprod() * 100.0
     return df[["data", "indice"]]
+
+
+@timed
+def cached_cdi_series(
+    session: Session,
+    start_date: date,
+    end_date: date,
+    offline: bool = CDI_OFFLINE,
+    endpoint: str = BCB_ENDPOINT,
+    writer: Callable[[], Session] | None = None,
+) -> pd.DataFrame:
+    # session may be read-only: with a writer, fetched rates are stored through
+    # a session opened only when something is missing, so a covered range
+    # never takes the write lock.
+    missing = [] if offline else _missing_ranges(session, start_date, end_date)
+    if missing:
+        # Don't hold the write lock while waiting on the network.
+        session.commit()
+        fetched = fetch_cdi_ranges(missing, endpoint=endpoint)
+        with writer() if writer else nullcontext(session) as target:
+            for (missing_start, missing_end), rates in zip(missing, fetched):
+                _store_rates(target, rates, missing_start, missing_end)
+            target.commit()
+
+    table = CdiRate.__table__
+    rows = session.execute(
+        select(table.c.data, table.c.valor, table.c.indice)
+        .where(table.c.data.between(start_date, end_date))
+        .order_by(table.c.data)
+    ).all()
+    return pd.DataFrame(
+        {
+            "data": pd.to_datetime([row.data for row in rows]),
+            "cdi_diario": np.array([row.valor for row in rows], dtype=np.float64),
+            "acumulado": np.array([row.indice for row in rows], dtype=np.float64),
+        }
+    )
+
+
+def _missing_ranges(session: Session, start_date: date, end_date: date) -> list[tuple[date, date]]:
+    coverage = session.get(CdiCoverage, 1)
+    if coverage is None:
+        return [(start_date, end_date)]
+
+    # Coverage only ever grows from its edges, so it stays one contiguous span.
+    missing = []
+    if start_date < coverage.inicio:
+        missing.append((start_date, coverage.inicio - timedelta(days=1)))
+    if end_date > coverage.fim:
+        recent = coverage.fim >= date.today() - CDI_PUBLICATION_LAG
+        if not recent or datetime.now() - coverage.verificado_em >= CDI_REFRESH_INTERVAL:
+            missing.append((coverage.fim + timedelta(days=1), end_date))
+    return missing
+
+
+def _store_rates(session: Session, fetched: pd.DataFrame, start_date: date, end_date: date) -> None:
+    if not fetched.empty:
+        rows = [
+            {"data": day.date(), "valor": valor, "indice": 0.0}
+            for day, valor in zip(fetched["data"], fetched["cdi_diario"].tolist())
+        ]
+        session.execute(sqlite_insert(CdiRate.__table__).on_conflict_do_nothing(index_elements=["data"]), rows)
+        _refresh_index(session, min(row["data"] for row in rows))
+
+    covered_until = end_date
+    if end_date >= date.today() - CDI_PUBLICATION_LAG:
+        covered_until = fetched["data"].max().date() if not fetched.empty else start_date - timedelta(days=1)
+    coverage = session.get(CdiCoverage, 1)
+    if coverage is None:
+        session.add(CdiCoverage(id=1, inicio=start_date, fim=covered_until, verificado_em=datetime.now()))
+    else:
+        coverage.inicio = min(coverage.inicio, start_date)
+        coverage.fim = max(coverage.fim, covered_until)
+        coverage.verificado_em = datetime.now()
+    session.flush()
+
+
+def _refresh_index(session: Session, since: date) -> None:
+    # indice compounds from the first stored rate, so rates appended at the end
+    # extend it from the last stored value; only a back-fill in front of stored
+    # rates shifts everything after it.
+    table = CdiRate.__table__
+    base = session.execute(
+        select(table.c.indice).where(table.c.data < since).order_by(table.c.data.desc()).limit(1)
+    ).scalar()
+    rows = session.execute(
+        select(table.c.data, table.c.valor).where(table.c.data >= since).order_by(table.c.data)
+    ).all()
+    rates = np.array([row.valor for row in rows], dtype=np.float64)
+    indice = np.cumprod(1 + rates / 100.0) * (100.0 if base is None else base)
+    session.execute(
+        update(table).where(table.c.data == bindparam("b_data")).values(indice=bindparam("b_indice")),
+        [{"b_data": row.data, "b_indice": value} for row, value in zip(rows, indice.tolist())],
+    )
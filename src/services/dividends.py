@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.models import Dividend, DividendMonth
+from src.perf import timed
+from src.services.portfolio import PositionSnapshot
+
+DIVIDEND_COLUMNS = ["asset_id", "data", "valor"]
+TRAILING_MONTHS = 12
+
+
+@timed
+def record_dividends(session: Session, dividends: Iterable[Dividend | Mapping]) -> None:
+    # A sum needs no history: the new rows are grouped by month and added on
+    # top of whatever is stored.
+    frame = _frame(dividends)
+    if frame.empty:
+        return
+    frame["mes"] = pd.to_datetime(frame["data"]).to_numpy(dtype="datetime64[M]")
+    months = frame.groupby(["asset_id", "mes"], as_index=False).agg(
+        valor=("valor", "sum"), quantidade=("valor", "size")
+    )
+    rows = [
+        {"asset_id": int(asset_id), "mes": mes.date(), "valor": float(valor), "quantidade": int(quantidade)}
+        for asset_id, mes, valor, quantidade in months.itertuples(index=False)
+    ]
+    table = DividendMonth.__table__
+    stmt = sqlite_insert(table)
+    totals = {name: table.c[name] + stmt.excluded[name] for name in ("valor", "quantidade")}
+    session.execute(stmt.on_conflict_do_update(index_elements=["asset_id", "mes"], set_=totals), rows)
+
+
+@timed
+def rebuild_dividend_months(session: Session, asset_ids: Iterable[int] | None = None) -> int:
+    table = Dividend.__table__
+    stmt = select(
+        table.c.asset_id, func.strftime("%Y-%m-01", table.c.data), func.sum(table.c.valor), func.count()
+    ).group_by(table.c.asset_id, func.strftime("%Y-%m", table.c.data))
+    if asset_ids is not None:
+        asset_ids = list(asset_ids)
+        if not asset_ids:
+            return 0
+        session.execute(delete(DividendMonth).where(DividendMonth.asset_id.in_(asset_ids)))
+        stmt = stmt.where(table.c.asset_id.in_(asset_ids))
+    else:
+        session.execute(delete(DividendMonth))
+    columns = ["asset_id", "mes", "valor", "quantidade"]
+    return session.execute(insert(DividendMonth).from_select(columns, stmt)).rowcount
+
+
+def monthly_income(months: pd.DataFrame, end: date | None = None) -> pd.DataFrame:
+    # One row per calendar month from the first dividend to end, months
+    # without income included, with the trailing twelve-month sum.
+    if months.empty:
+        return pd.DataFrame({"mes": pd.Series([], dtype="datetime64[ns]"), "valor": [], "renda_12m": []})
+    totals = months.groupby("mes")["valor"].sum()
+    last = max(totals.index.max(), pd.Timestamp(end or totals.index.max()).to_period("M").start_time)
+    index = pd.date_range(totals.index.min(), last, freq="MS")
+    valor = totals.reindex(index, fill_value=0.0).to_numpy()
+    cumulative = np.concatenate([[0.0], np.cumsum(valor)])
+    start = np.maximum(np.arange(1, len(valor) + 1) - TRAILING_MONTHS, 0)
+    return pd.DataFrame({"mes": index, "valor": valor, "renda_12m": cumulative[1:] - cumulative[start]})
+
+
+def yield_on_cost(months: pd.DataFrame, positions: dict[int, PositionSnapshot], end: date) -> pd.DataFrame:
+    # Income of the last twelve months, up to end's month, over what the
+    # shares held today cost.
+    first = pd.Timestamp(end).to_period("M").start_time - pd.DateOffset(months=TRAILING_MONTHS - 1)
+    recent = months[(months["mes"] >= first) & (months["mes"] <= pd.Timestamp(end))]
+    income = recent.groupby("asset_id", observed=True)["valor"].sum()
+    held = [position for position in positions.values() if position.quantidade > 0]
+    frame = pd.DataFrame(
+        {
+            "asset_id": np.array([position.asset_id for position in held], dtype=np.int64),
+            "custo": np.array([position.quantidade * position.preco_medio for position in held], dtype=np.float64),
+        }
+    )
+    frame["renda_12m"] = frame["asset_id"].map(income).fillna(0.0).to_numpy()
+    frame["yield_on_cost"] = frame["renda_12m"] / frame["custo"].where(frame["custo"] > 0)
+    return frame.sort_values("yield_on_cost", ascending=False, ignore_index=True)
+
+
+def _frame(dividends: Iterable[Dividend | Mapping]) -> pd.DataFrame:
+    rows = [
+        (
+            [row[name] for name in DIVIDEND_COLUMNS]
+            if isinstance(row, Mapping)
+            else [getattr(row, name) for name in DIVIDEND_COLUMNS]
+        )
+        for row in dividends
+    ]
+    return pd.DataFrame(rows, columns=DIVIDEND_COLUMNS)
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import math
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from src.models import EquityCurvePoint, EquityCurveState, EquityHolding
+from src.perf import timed
+from src.queries import equity_curve_frame
+from src.services.portfolio import POSITION_COLUMNS, CurveMatrices, curve_matrices, equity_curve
+
+
+@timed
+def update_equity_curve(
+    session: Session, transactions: pd.DataFrame, prices: pd.DataFrame | None, end: date
+) -> pd.DataFrame:
+    # Brings the stored daily curve up to end and returns it. Days before the
+    # earliest change recorded by the triggers are kept; the rest is
+    # recomputed starting from the holdings stored at the last checkpoint
+    # before that change. The frames must hold the ledger as this session
+    # sees it, or the recomputed days would be stored from stale data.
+    last = session.scalar(select(func.max(EquityCurvePoint.data)))
+    start = last + timedelta(days=1) if last else None
+    desde = session.scalar(select(EquityCurveState.desde).where(EquityCurveState.id == 1))
+    if start and desde:
+        start = min(start, desde)
+    if start and start > end:
+        return equity_curve_frame(session, end)
+
+    checkpoint = None
+    if start:
+        checkpoint = session.scalar(select(func.max(EquityHolding.data)).where(EquityHolding.data < start))
+    if checkpoint is None:
+        rebuild_equity_curve(session, transactions, prices, end)
+    else:
+        _resume(session, checkpoint, transactions, prices, end)
+    return equity_curve_frame(session, end)
+
+
+@timed
+def rebuild_equity_curve(
+    session: Session, transactions: pd.DataFrame, prices: pd.DataFrame | None, end: date | None = None
+) -> int:
+    session.execute(delete(EquityCurvePoint))
+    session.execute(delete(EquityHolding))
+    matrices = curve_matrices(transactions, prices, end=end)
+    _mark_current(session)
+    if matrices is None:
+        return 0
+    _store(session, matrices)
+    return len(matrices.dates)
+
+
+@timed
+def check_equity_curve(
+    session: Session, transactions: pd.DataFrame, prices: pd.DataFrame | None, tolerance: float = 1e-6
+) -> list[date]:
+    stored = equity_curve_frame(session)
+    if stored.empty:
+        return []
+    expected = equity_curve(transactions, prices, end=stored["data"].iloc[-1]).set_index("data")["patrimonio"]
+    stored = stored.set_index("data")["patrimonio"]
+    return [
+        day.date()
+        for day in expected.index.union(stored.index)
+        if day not in expected.index
+        or day not in stored.index
+        or not math.isclose(expected[day], stored[day], rel_tol=tolerance, abs_tol=tolerance)
+    ]
+
+
+def _resume(
+    session: Session, checkpoint: date, transactions: pd.DataFrame, prices: pd.DataFrame | None, end: date
+) -> None:
+    # The holdings at the checkpoint enter as opening BUYs at their carried
+    # price, followed by everything dated after it.
+    held = EquityHolding.__table__
+    opening = pd.DataFrame(
+        session.execute(
+            select(held.c.asset_id, held.c.quantidade, held.c.preco).where(held.c.data == checkpoint)
+        ).all(),
+        columns=["asset_id", "quantidade", "preco_unit"],
+    ).assign(data=pd.Timestamp(checkpoint), tipo="BUY", taxas=0.0)
+    after = np.datetime64(checkpoint, "ns")
+    later = transactions[transactions["data"].to_numpy(dtype="datetime64[ns]") > after]
+    window = pd.concat([opening[POSITION_COLUMNS], later[POSITION_COLUMNS]], ignore_index=True)
+    if prices is not None and not prices.empty:
+        prices = prices[prices["data"].to_numpy(dtype="datetime64[ns]") > after]
+
+    session.execute(delete(EquityCurvePoint).where(EquityCurvePoint.data > checkpoint))
+    session.execute(delete(EquityHolding).where(EquityHolding.data > checkpoint))
+    matrices = curve_matrices(window, prices, end=end)
+    _mark_current(session)
+    if matrices is not None:
+        _store(session, matrices, skip=1)
+
+
+def _store(session: Session, matrices: CurveMatrices, skip: int = 0) -> None:
+    dates = matrices.dates[skip:]
+    if dates.empty:
+        return
+    # Plain tuples through the driver, as in price_importer.write_prices: a
+    # full rebuild writes tens of thousands of checkpoint rows.
+    connection = session.connection()
+    days = np.datetime_as_string(matrices.dates.to_numpy(dtype="datetime64[D]"), unit="D")
+    connection.exec_driver_sql(
+        "INSERT INTO equity_curve (data, patrimonio) VALUES (?, ?)",
+        list(zip(days[skip:].tolist(), matrices.patrimonio[skip:].tolist())),
+    )
+    # Checkpoints at each month end and at the last day, with the assets held then.
+    checkpoints = skip + np.flatnonzero(dates.is_month_end | (np.arange(len(dates)) == len(dates) - 1))
+    rows, cols = np.nonzero(matrices.holdings[checkpoints])
+    if not len(rows):
+        return
+    rows = checkpoints[rows]
+    connection.exec_driver_sql(
+        "INSERT INTO equity_holdings (data, asset_id, quantidade, preco) VALUES (?, ?, ?, ?)",
+        list(
+            zip(
+                days[rows].tolist(),
+                matrices.asset_ids[cols].tolist(),
+                matrices.holdings[rows, cols].tolist(),
+                matrices.prices[rows, cols].tolist(),
+            )
+        ),
+    )
+
+
+def _mark_current(session: Session) -> None:
+    session.execute(update(EquityCurveState).where(EquityCurveState.id == 1).values(desde=None))
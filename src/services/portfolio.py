@@ -4,9 +4,19 @@ from collections import defaultdict
 from dataclasses import dataclass
 from datetime import date
 
+import numpy as np
 import pandas as pd
 
 from src.models import Transaction
+from src.perf import timed
+
+POSITION_COLUMNS = ["asset_id", "data", "tipo", "preco_unit", "quantidade", "taxas"]
+
+
+def buy_mask(tipo: pd.Series) -> np.ndarray:
+    # Compares each distinct tipo once instead of every row.
+    codes, uniques = pd.factorize(tipo, use_na_sentinel=False)
+    return np.array([str(value).upper() == "BUY" for value in uniques], dtype=bool)[codes]
 
 
 @dataclass
@@ -17,7 +27,11 @@ class PositionSnapshot:
     investido_liquido: float
 
 
-def compute_positions(transactions: list[Transaction]) -> dict[int, PositionSnapshot]:
+@timed
+def compute_positions(transactions: list[Transaction] | pd.DataFrame) -> dict[int, PositionSnapshot]:
+    if isinstance(transactions, pd.DataFrame):
+        return compute_positions_frame(transactions)
+
     state: dict[int, dict[str, float]] = defaultdict(lambda: {"qty": 0.0, "cost": 0.0})
 
     for tx in sorted(transactions, key=lambda t: t.data):
@@ -45,7 +59,83 @@ def compute_positions(transactions: list[Transaction]) -> dict[int, PositionSnap
     return positions
 
 
-def portfolio_timeseries(transactions: list[Transaction]) -> pd.DataFrame:
+def transactions_to_frame(transactions: list[Transaction]) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "asset_id": [tx.asset_id for tx in transactions],
+            "data": [tx.data for tx in transactions],
+            "tipo": [tx.tipo for tx in transactions],
+            "preco_unit": [tx.preco_unit for tx in transactions],
+            "quantidade": [tx.quantidade for tx in transactions],
+            "taxas": [tx.taxas for tx in transactions],
+        },
+        columns=POSITION_COLUMNS,
+    )
+
+
+def compute_positions_frame(df: pd.DataFrame) -> dict[int, PositionSnapshot]:
+    # A SELL reduces cost by the average price, i.e. it scales the running cost by
+    # (qty_before - quantidade) / qty_before. Cost is then the linear recurrence
+    # cost = cost * fator + compra, solved per asset with cumulative sums in log
+    # space; a full sell (fator == 0) zeroes the cost and starts a new segment.
+    if df.empty:
+        return {}
+
+    asset_ids = df["asset_id"].to_numpy(dtype=np.int64)
+    dates = np.asarray(pd.to_datetime(df["data"]), dtype="datetime64[ns]")
+    order = np.lexsort((dates, asset_ids))
+    asset_ids = asset_ids[order]
+    quantidade = df["quantidade"].to_numpy(dtype=np.float64)[order]
+    preco_unit = df["preco_unit"].to_numpy(dtype=np.float64)[order]
+    taxas = df["taxas"].to_numpy(dtype=np.float64)[order]
+    is_buy = buy_mask(df["tipo"])[order]
+
+    asset_start = np.r_[True, asset_ids[1:] != asset_ids[:-1]]
+    qty_after = pd.Series(np.where(is_buy, quantidade, -quantidade)).groupby(np.cumsum(asset_start)).cumsum()
+    qty_after = qty_after.to_numpy()
+    qty_before = np.where(asset_start, 0.0, np.r_[0.0, qty_after[:-1]])
+
+    sell_applies = ~is_buy & (qty_before != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fator = np.where(sell_applies, (qty_before - quantidade) / qty_before, 1.0)
+    compra = np.where(is_buy, preco_unit * quantidade + taxas, 0.0)
+
+    reset = fator == 0.0
+    fator[reset] = 1.0
+    segment_start = asset_start | reset
+    segment_id = np.cumsum(segment_start) - 1
+    segment_last = np.r_[np.flatnonzero(segment_start)[1:] - 1, len(segment_id) - 1][segment_id]
+
+    log_fator = _segment_cumsum(np.log(np.abs(fator)), segment_start)
+    negatives = _segment_cumsum((fator < 0).astype(np.int64), segment_start)
+    decay = np.exp(log_fator[segment_last] - log_fator)
+    sign = np.where((negatives[segment_last] - negatives) % 2 == 1, -1.0, 1.0)
+    segment_cost = np.bincount(segment_id, weights=compra * decay * sign)
+
+    asset_last = np.r_[np.flatnonzero(asset_start)[1:] - 1, len(asset_ids) - 1]
+    positions: dict[int, PositionSnapshot] = {}
+    for asset_id, qty, cost in zip(
+        asset_ids[asset_last].tolist(), qty_after[asset_last].tolist(), segment_cost[segment_id[asset_last]].tolist()
+    ):
+        positions[asset_id] = PositionSnapshot(
+            asset_id=asset_id,
+            quantidade=qty,
+            preco_medio=cost / qty if qty else 0.0,
+            investido_liquido=cost,
+        )
+    return positions
+
+
+def _segment_cumsum(values: np.ndarray, segment_start: np.ndarray) -> np.ndarray:
+    total = np.cumsum(values)
+    offset = (total - values)[segment_start]
+    return total - np.repeat(offset, np.diff(np.r_[np.flatnonzero(segment_start), len(values)]))
+
+
+@timed
+def portfolio_timeseries(transactions: list[Transaction] | pd.DataFrame) -> pd.DataFrame:
+    if isinstance(transactions, pd.DataFrame):
+        return portfolio_timeseries_frame(transactions)
     if not transactions:
         return pd.DataFrame(columns=["data", "patrimonio"])
 
@@ -71,3 +161,116 @@ def portfolio_timeseries(transactions: list[Transaction]) -> pd.DataFrame:
 
     df = pd.DataFrame(rows).sort_values("data")
     return df
+
+
+def portfolio_timeseries_frame(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return pd.DataFrame(columns=["data", "patrimonio"])
+
+    df = df.sort_values("data", kind="stable")
+    asset_ids = df["asset_id"].to_numpy(dtype=np.int64)
+    quantidade = df["quantidade"].to_numpy(dtype=np.float64)
+    signed = np.where(buy_mask(df["tipo"]), quantidade, -quantidade)
+    qty_after = pd.Series(signed).groupby(asset_ids).cumsum().to_numpy()
+    # Each row changes its asset's value from qty_before * old price to
+    # qty_after * new price; the portfolio value is the running sum of those deltas.
+    value = pd.Series(qty_after * df["preco_unit"].to_numpy(dtype=np.float64))
+    delta = value - value.groupby(asset_ids).shift(fill_value=0.0)
+    patrimonio = pd.Series(delta.cumsum().to_numpy(), index=df["data"].to_numpy())
+    patrimonio = patrimonio.groupby(level=0, sort=True).last()
+    return pd.DataFrame({"data": patrimonio.index, "patrimonio": patrimonio.to_numpy()})
+
+
+@timed
+def equity_curve(
+    transactions: pd.DataFrame,
+    prices: pd.DataFrame | None = None,
+    freq: str = "D",
+    end: date | None = None,
+) -> pd.DataFrame:
+    matrices = curve_matrices(transactions, prices, freq, end)
+    if matrices is None:
+        return pd.DataFrame(columns=["data", "patrimonio"])
+    return pd.DataFrame({"data": matrices.dates, "patrimonio": matrices.patrimonio})
+
+
+@dataclass
+class CurveMatrices:
+    dates: pd.DatetimeIndex
+    asset_ids: np.ndarray
+    holdings: np.ndarray
+    prices: np.ndarray
+
+    @property
+    def patrimonio(self) -> np.ndarray:
+        return (self.holdings * self.prices).sum(axis=1)
+
+
+def curve_matrices(
+    transactions: pd.DataFrame,
+    prices: pd.DataFrame | None = None,
+    freq: str = "D",
+    end: date | None = None,
+) -> CurveMatrices | None:
+    # Dense date x asset matrices: quantities are the cumulative sum of the daily
+    # deltas and prices are the last observation at or before each date, taken
+    # from the prices table and, where it has none that day, the transaction price.
+    if transactions.empty:
+        return None
+
+    tx_dates = pd.to_datetime(transactions["data"])
+    last = tx_dates.max()
+    if prices is not None and not prices.empty:
+        last = max(last, pd.to_datetime(prices["data"]).max())
+    if end is not None:
+        last = pd.Timestamp(end)
+    dates = pd.date_range(tx_dates.min().normalize(), last, freq=freq)
+    if dates.empty:
+        return None
+
+    asset_index = pd.Index(np.unique(transactions["asset_id"].to_numpy(dtype=np.int64)))
+    shape = (len(dates), len(asset_index))
+
+    rows, cols, valid = _grid_positions(dates, asset_index, tx_dates, transactions["asset_id"])
+    quantidade = transactions["quantidade"].to_numpy(dtype=np.float64)
+    signed = np.where(buy_mask(transactions["tipo"]), quantidade, -quantidade)
+    deltas = np.zeros(shape)
+    np.add.at(deltas, (rows[valid], cols[valid]), signed[valid])
+    holdings = np.cumsum(deltas, axis=0)
+
+    observed = np.full(shape, np.nan)
+    _set_last(observed, rows[valid], cols[valid], transactions["preco_unit"].to_numpy(dtype=np.float64)[valid])
+    if prices is not None and not prices.empty:
+        price_rows, price_cols, price_valid = _grid_positions(
+            dates, asset_index, pd.to_datetime(prices["data"]), prices["asset_id"]
+        )
+        _set_last(
+            observed,
+            price_rows[price_valid],
+            price_cols[price_valid],
+            prices["preco"].to_numpy(dtype=np.float64)[price_valid],
+        )
+
+    filled = np.where(np.isnan(observed), 0, np.arange(len(dates))[:, None])
+    np.maximum.accumulate(filled, axis=0, out=filled)
+    price_matrix = np.nan_to_num(observed[filled, np.arange(len(asset_index))])
+    return CurveMatrices(dates, asset_index.to_numpy(), holdings, price_matrix)
+
+
+def _grid_positions(
+    dates: pd.DatetimeIndex, asset_index: pd.Index, when: pd.Series, asset_ids: pd.Series
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # An observation dated d is visible from the first grid date >= d onwards.
+    rows = dates.searchsorted(when.to_numpy(dtype="datetime64[ns]"), side="left")
+    cols = asset_index.get_indexer(asset_ids.to_numpy(dtype=np.int64))
+    return rows, cols, (rows < len(dates)) & (cols >= 0)
+
+
+def _set_last(matrix: np.ndarray, rows: np.ndarray, cols: np.ndarray, values: np.ndarray) -> None:
+    # Keep the last value given for each cell; np.maximum.at is well defined for
+    # repeated indices, unlike plain fancy assignment.
+    flat = rows * matrix.shape[1] + cols
+    last = np.full(matrix.size, -1, dtype=np.int64)
+    np.maximum.at(last, flat, np.arange(len(flat)))
+    cells = np.flatnonzero(last >= 0)
+    matrix.flat[cells] = values[last[cells]]
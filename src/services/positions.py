@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import math
+from collections.abc import Iterable, Mapping
+
+import pandas as pd
+from sqlalchemy import delete, exists, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.models import Position, Transaction
+from src.perf import timed
+from src.queries import transactions_frame
+from src.services.portfolio import POSITION_COLUMNS, PositionSnapshot, compute_positions, compute_positions_frame
+
+REBUILD_BATCH_ASSETS = 8
+
+
+@timed
+def load_positions(session: Session) -> dict[int, PositionSnapshot]:
+    table = Position.__table__
+    rows = session.execute(
+        select(table.c.asset_id, table.c.quantidade, table.c.preco_medio, table.c.investido_liquido)
+    ).all()
+    return {
+        asset_id: PositionSnapshot(
+            asset_id=asset_id,
+            quantidade=quantidade,
+            preco_medio=preco_medio,
+            investido_liquido=investido_liquido,
+        )
+        for asset_id, quantidade, preco_medio, investido_liquido in rows
+    }
+
+
+@timed
+def record_transactions(
+    session: Session, transactions: Iterable[Transaction | Mapping], stale: set[int] | None = None
+) -> None:
+    # New transactions dated on or after an asset's last stored date are applied
+    # on top of the stored state. Anything back-dated, or an asset without a
+    # stored row, is recomputed from that asset's own ledger; with a stale set
+    # (bulk loads) its row is dropped instead and the asset added to the set, to
+    # be rebuilt once by rebuild_stale_positions.
+    frame = _frame(transactions)
+    if frame.empty:
+        return
+
+    frame["data"] = pd.to_datetime(frame["data"])
+    first_dates = frame.groupby("asset_id")["data"].min()
+    table = Position.__table__
+    stored = {
+        row.asset_id: row
+        for row in session.execute(select(table).where(table.c.asset_id.in_(first_dates.index.tolist()))).all()
+    }
+    forward = [
+        int(asset_id)
+        for asset_id, first in first_dates.items()
+        if asset_id in stored and first.date() >= stored[asset_id].ultima_data
+    ]
+    rebuilt = [int(asset_id) for asset_id in first_dates.index if asset_id not in forward]
+    if stale is None:
+        rebuild_positions(session, rebuilt)
+    elif rebuilt:
+        session.execute(delete(Position).where(Position.asset_id.in_(rebuilt)))
+        stale.update(rebuilt)
+    if not forward:
+        return
+
+    # The stored state enters as an opening BUY whose fee is the whole cost,
+    # which reproduces quantity and cost exactly.
+    opening = pd.DataFrame(
+        {
+            "asset_id": forward,
+            "data": [pd.Timestamp(stored[asset_id].ultima_data) for asset_id in forward],
+            "tipo": "BUY",
+            "preco_unit": 0.0,
+            "quantidade": [stored[asset_id].quantidade for asset_id in forward],
+            "taxas": [stored[asset_id].investido_liquido for asset_id in forward],
+        }
+    )
+    applied = pd.concat([opening, frame[frame["asset_id"].isin(forward)]], ignore_index=True)
+    _store(session, compute_positions_frame(applied), applied.groupby("asset_id")["data"].max())
+
+
+@timed
+def rebuild_positions(session: Session, asset_ids: Iterable[int] | None = None) -> int:
+    if asset_ids is not None:
+        asset_ids = list(asset_ids)
+        if not asset_ids:
+            return 0
+        session.execute(delete(Position).where(Position.asset_id.in_(asset_ids)))
+    else:
+        session.execute(delete(Position))
+
+    frame = pd.DataFrame(session.execute(ledger_stmt(asset_ids)).all(), columns=POSITION_COLUMNS)
+    if frame.empty:
+        return 0
+    frame["data"] = pd.to_datetime(frame["data"])
+    positions = compute_positions_frame(frame)
+    _store(session, positions, frame.groupby("asset_id")["data"].max())
+    return len(positions)
+
+
+def stale_assets(session: Session) -> set[int]:
+    # Assets with transactions but no stored position, left by a bulk load
+    # that stopped before rebuilding them.
+    table = Transaction.__table__
+    stmt = select(table.c.asset_id).distinct().where(~exists().where(Position.asset_id == table.c.asset_id))
+    return set(session.scalars(stmt))
+
+
+@timed
+def rebuild_stale_positions(session: Session, stale: set[int]) -> int:
+    # A few assets at a time, so memory follows the largest asset ledger
+    # rather than the whole load.
+    asset_ids = sorted(stale)
+    rebuilt = sum(
+        rebuild_positions(session, asset_ids[start : start + REBUILD_BATCH_ASSETS])
+        for start in range(0, len(asset_ids), REBUILD_BATCH_ASSETS)
+    )
+    stale.clear()
+    return rebuilt
+
+
+def ledger_stmt(asset_ids: list[int] | None = None):
+    table = Transaction.__table__
+    stmt = select(*(table.c[name] for name in POSITION_COLUMNS))
+    if asset_ids is not None:
+        stmt = stmt.where(table.c.asset_id.in_(asset_ids))
+    return stmt
+
+
+@timed
+def check_positions(session: Session, tolerance: float = 1e-6) -> list[int]:
+    expected = compute_positions(transactions_frame(session))
+    stored = load_positions(session)
+    mismatched = []
+    for asset_id in sorted(expected.keys() | stored.keys()):
+        left, right = expected.get(asset_id), stored.get(asset_id)
+        if (
+            left is None
+            or right is None
+            or not all(
+                math.isclose(getattr(left, field), getattr(right, field), rel_tol=tolerance, abs_tol=tolerance)
+                for field in ("quantidade", "preco_medio", "investido_liquido")
+            )
+        ):
+            mismatched.append(asset_id)
+    return mismatched
+
+
+def ensure_positions(session: Session) -> None:
+    if session.execute(select(Position.asset_id).limit(1)).first() is None:
+        if session.execute(select(Transaction.id).limit(1)).first() is not None:
+            rebuild_positions(session)
+            session.commit()
+
+
+def _store(session: Session, positions: dict[int, PositionSnapshot], last_dates: pd.Series) -> None:
+    if not positions:
+        return
+    rows = [
+        {
+            "asset_id": asset_id,
+            "quantidade": position.quantidade,
+            "preco_medio": position.preco_medio,
+            "investido_liquido": position.investido_liquido,
+            "ultima_data": last_dates[asset_id].date(),
+        }
+        for asset_id, position in positions.items()
+    ]
+    stmt = sqlite_insert(Position.__table__)
+    columns = ("quantidade", "preco_medio", "investido_liquido", "ultima_data")
+    session.execute(
+        stmt.on_conflict_do_update(index_elements=["asset_id"], set_={name: stmt.excluded[name] for name in columns}),
+        rows,
+    )
+
+
+def _frame(transactions: Iterable[Transaction | Mapping]) -> pd.DataFrame:
+    rows = [
+        (
+            [tx[name] for name in POSITION_COLUMNS]
+            if isinstance(tx, Mapping)
+            else [getattr(tx, name) for name in POSITION_COLUMNS]
+        )
+        for tx in transactions
+    ]
+    return pd.DataFrame(rows, columns=POSITION_COLUMNS)
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from src.perf import timed
+from src.services.portfolio import buy_mask
+
+IRR_MAX_ITERATIONS = 100
+IRR_TOLERANCE = 1e-10
+
+RETURN_COLUMNS = ["data", "patrimonio", "fluxo", "retorno", "indice_carteira", "indice_cdi", "patrimonio_cdi"]
+
+
+@dataclass
+class ReturnsSummary:
+    twr: float
+    twr_anual: float
+    irr_anual: float
+    cdi: float
+    cdi_irr_anual: float
+    patrimonio_final: float
+    patrimonio_cdi_final: float
+
+
+@timed
+def daily_cash_flows(transactions: pd.DataFrame, dividends: pd.DataFrame, dates: pd.DatetimeIndex) -> np.ndarray:
+    # Net money put into the portfolio per grid date: buys add, sells and
+    # dividends (paid out, not reinvested) take out. A flow dated between grid
+    # dates lands on the next one, as trades do in equity_curve.
+    flows = np.zeros(len(dates))
+    if not transactions.empty:
+        valor = transactions["valor_total"].to_numpy(dtype=np.float64)
+        _add_flows(flows, dates, transactions["data"], np.where(buy_mask(transactions["tipo"]), valor, -valor))
+    if not dividends.empty:
+        _add_flows(flows, dates, dividends["data"], -dividends["valor"].to_numpy(dtype=np.float64))
+    return flows
+
+
+@timed
+def returns_frame(curve: pd.DataFrame, flows: np.ndarray, cdi_index: pd.DataFrame) -> pd.DataFrame:
+    # The first row opens the period: its value counts as the initial
+    # contribution. From then on a day's return is
+    #   (V_t + withdrawals_t) / (V_{t-1} + contributions_t) - 1,
+    # i.e. money comes in at the start of the day and leaves at the end, which
+    # keeps deposits from showing up as gains (time-weighted, chained daily).
+    dates = pd.DatetimeIndex(curve["data"])
+    value = curve["patrimonio"].to_numpy(dtype=np.float64)
+    flows = flows.astype(np.float64).copy()
+    if len(value):
+        flows[0] = value[0]
+
+    previous = np.r_[0.0, value[:-1]]
+    base = previous + np.maximum(flows, 0.0)
+    ended = value + np.maximum(-flows, 0.0)
+    daily = np.divide(ended, base, out=np.ones_like(value), where=base > 0) - 1.0
+    if len(daily):
+        daily[0] = 0.0
+
+    # The same flows invested at CDI: B_t = I_t * sum(F_s / I_s for s <= t).
+    index = _cdi_on(dates, cdi_index)
+    benchmark = index * np.cumsum(flows / index)
+    return pd.DataFrame(
+        {
+            "data": dates,
+            "patrimonio": value,
+            "fluxo": flows,
+            "retorno": daily,
+            "indice_carteira": np.cumprod(1.0 + daily) * 100.0,
+            "indice_cdi": index / index[0] * 100.0 if len(index) else index,
+            "patrimonio_cdi": benchmark,
+        },
+        columns=RETURN_COLUMNS,
+    )
+
+
+def summarize_returns(frame: pd.DataFrame) -> ReturnsSummary:
+    if frame.empty:
+        nan = float("nan")
+        return ReturnsSummary(nan, nan, nan, nan, nan, 0.0, 0.0)
+    years = max((frame["data"].iloc[-1] - frame["data"].iloc[0]).days / 365.0, 1 / 365.0)
+    twr = frame["indice_carteira"].iloc[-1] / 100.0 - 1.0
+    return ReturnsSummary(
+        twr=twr,
+        twr_anual=(1.0 + twr) ** (1.0 / years) - 1.0,
+        irr_anual=money_weighted_return(frame["data"], frame["fluxo"], frame["patrimonio"].iloc[-1]),
+        cdi=frame["indice_cdi"].iloc[-1] / 100.0 - 1.0,
+        cdi_irr_anual=money_weighted_return(frame["data"], frame["fluxo"], frame["patrimonio_cdi"].iloc[-1]),
+        patrimonio_final=float(frame["patrimonio"].iloc[-1]),
+        patrimonio_cdi_final=float(frame["patrimonio_cdi"].iloc[-1]),
+    )
+
+
+@timed
+def money_weighted_return(dates: pd.Series, flows: pd.Series, final_value: float) -> float:
+    # Annual IRR from the investor's side: contributions are outflows, and
+    # withdrawals plus the final value are inflows. Newton on the whole flow
+    # vector at once, with bisection as the fallback when it does not settle.
+    days = (pd.DatetimeIndex(dates) - pd.Timestamp(dates.iloc[0])).days.to_numpy(dtype=np.float64)
+    cash = -flows.to_numpy(dtype=np.float64)
+    cash[-1] += final_value
+    mask = cash != 0
+    years, cash = days[mask] / 365.0, cash[mask]
+    if not (cash > 0).any() or not (cash < 0).any():
+        return float("nan")
+
+    def npv(rate: float) -> tuple[float, float]:
+        discount = (1.0 + rate) ** -years
+        return float(cash @ discount), float(-(cash * years) @ (discount / (1.0 + rate)))
+
+    rate = 0.1
+    for _ in range(IRR_MAX_ITERATIONS):
+        value, slope = npv(rate)
+        if abs(value) < IRR_TOLERANCE * np.abs(cash).sum():
+            return rate
+        if slope == 0 or not np.isfinite(slope):
+            break
+        rate -= value / slope
+        if not np.isfinite(rate) or rate <= -1.0:
+            break
+    return _bisect_irr(cash, years)
+
+
+def _bisect_irr(cash: np.ndarray, years: np.ndarray) -> float:
+    low, high = -0.9999, 10.0
+
+    def npv(rate: float) -> float:
+        return float(cash @ (1.0 + rate) ** -years)
+
+    if npv(low) * npv(high) > 0:
+        return float("nan")
+    for _ in range(200):
+        middle = (low + high) / 2.0
+        if npv(low) * npv(middle) <= 0:
+            high = middle
+        else:
+            low = middle
+        if high - low < 1e-12:
+            break
+    return (low + high) / 2.0
+
+
+def _add_flows(flows: np.ndarray, dates: pd.DatetimeIndex, when: pd.Series, amounts: np.ndarray) -> None:
+    rows = dates.searchsorted(pd.to_datetime(when).to_numpy(dtype="datetime64[ns]"), side="left")
+    inside = rows < len(dates)
+    np.add.at(flows, rows[inside], amounts[inside])
+
+
+def _cdi_on(dates: pd.DatetimeIndex, cdi_index: pd.DataFrame) -> np.ndarray:
+    # Accumulated CDI on each grid date, carried forward over days without a
+    # published rate; before the first rate the index is flat.
+    if cdi_index.empty:
+        return np.ones(len(dates))
+    series = cdi_index.set_index("data")["indice"].sort_index()
+    series = series[~series.index.duplicated(keep="last")]
+    index = series.reindex(dates.union(series.index)).ffill().reindex(dates)
+    return index.fillna(series.iloc[0]).to_numpy(dtype=np.float64)
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from src.perf import timed
+from src.services.portfolio import PositionSnapshot
+
+TRADE_PRICE_SOURCE = "transação"
+SNAPSHOT_COLUMNS = [
+    "asset_id",
+    "nome",
+    "categoria",
+    "tipo",
+    "setor",
+    "quantidade",
+    "preco_medio",
+    "investido_liquido",
+    "preco",
+    "fonte_preco",
+    "data_preco",
+    "valor_atual",
+    "dividendos",
+    "participacao",
+]
+
+
+@timed
+def portfolio_snapshot(
+    assets: pd.DataFrame,
+    positions: dict[int, PositionSnapshot],
+    latest_prices: pd.DataFrame,
+    trade_prices: pd.DataFrame,
+    dividends: pd.DataFrame,
+) -> pd.DataFrame:
+    held = [position for position in positions.values() if position.quantidade != 0]
+    held_frame = pd.DataFrame(
+        {
+            "asset_id": np.array([p.asset_id for p in held], dtype=np.int64),
+            "quantidade": np.array([p.quantidade for p in held], dtype=np.float64),
+            "preco_medio": np.array([p.preco_medio for p in held], dtype=np.float64),
+            "investido_liquido": np.array([p.investido_liquido for p in held], dtype=np.float64),
+        }
+    )
+    # Merging from the assets side keeps their order (by name).
+    df = assets[["id", "nome", "categoria", "tipo", "setor"]].rename(columns={"id": "asset_id"})
+    df = df.merge(held_frame, on="asset_id", how="inner")
+
+    # Latest quote first, otherwise the price of the last trade.
+    quotes = latest_prices.set_index("asset_id").reindex(df["asset_id"]).set_index(df.index)
+    trades = trade_prices.set_index("asset_id").reindex(df["asset_id"]).set_index(df.index)
+    use_trade = quotes["preco"].isna() & trades["preco"].notna()
+    df["preco"] = quotes["preco"].fillna(trades["preco"]).fillna(0.0)
+    df["fonte_preco"] = quotes["fonte"].mask(use_trade, TRADE_PRICE_SOURCE)
+    df["data_preco"] = quotes["data"].mask(use_trade, trades["data"])
+
+    df["valor_atual"] = df["quantidade"] * df["preco"]
+    df["dividendos"] = df["asset_id"].map(dividends.groupby("asset_id")["valor"].sum()).fillna(0.0)
+    total = df["valor_atual"].sum()
+    df["participacao"] = df["valor_atual"] / total if total else 0.0
+    return df[SNAPSHOT_COLUMNS]
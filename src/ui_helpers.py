@@ -1,16 +1,320 @@
 from __future__ import annotations
 
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, wait
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Hashable, TypeVar
+
+import pandas as pd
 import streamlit as st
 
-from src.db import SessionLocal
+from src.consolidation import Consolidation, consolidate
+from src.db import Database
+from src.exporter import EXPORT_FORMATS, EXPORT_MIME, export_bytes
 from src.init_db import init_db
+from src.ledger import (
+    SNAPSHOT_ENABLED,
+    Ledger,
+    SnapshotStore,
+    ledger_equity_curve,
+    ledger_token,
+    read_ledger,
+    stored_frame,
+)
+from src.logging_config import setup_logging
+from src.perf import PERF_ENABLED, PerfRun, span, start_run, timed
+from src.portfolios import DEFAULT_PORTFOLIO, Portfolio, get_portfolio, list_portfolios
+from src.queries import assets_frame, dividend_months_frame
+from src.services.portfolio import PositionSnapshot
+from src.services.positions import load_positions
+from src.services.snapshot import portfolio_snapshot
 
+CACHE_MAX_ENTRIES = int(os.getenv("WALLET_CACHE_ENTRIES", "16"))
 
-@st.cache_resource
-def init_database() -> None:
-    init_db()
+T = TypeVar("T")
 
 
 def get_session():
-    init_database()
-    return SessionLocal()
+    return portfolio_state().database.SessionLocal()
+
+
+def get_read_session():
+    return portfolio_state().database.ReadSession()
+
+
+class VersionedCache:
+    # One slot per key holding the value computed for a single data version;
+    # least recently used keys are evicted past max_entries.
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[Hashable, object]] = OrderedDict()
+        self._loading: dict[tuple[Hashable, Hashable], Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable, load: Callable[[], T]) -> T:
+        # The lock only guards the entries, never a load: a slow load of one key
+        # leaves hits on the others alone, and sessions asking for a key that is
+        # being loaded wait for that load instead of running it again. A failed
+        # load is cancelled, so they retry it rather than take its exception.
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                loading = self._loading.get((key, version))
+                if loading is None:
+                    loading = self._loading[(key, version)] = Future()
+                    break
+            wait([loading])
+            if not loading.cancelled():
+                with self._lock:
+                    self.hits += 1
+                return loading.result()
+
+        try:
+            value = load()
+        except BaseException:
+            with self._lock:
+                del self._loading[(key, version)]
+            loading.cancel()
+            raise
+        with self._lock:
+            del self._loading[(key, version)]
+            self.misses += 1
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        loading.set_result(value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+@dataclass(frozen=True)
+class PortfolioState:
+    # What the pages keep per portfolio: its migrated database, its cache and
+    # its snapshot directory, so switching portfolios never mixes their data.
+    portfolio: Portfolio
+    database: Database
+    cache: VersionedCache
+    snapshots: SnapshotStore | None
+    tokens: VersionedCache
+
+
+@st.cache_resource
+def init_portfolio(portfolio: Portfolio) -> PortfolioState:
+    database = portfolio.database()
+    init_db(database)
+    snapshots = portfolio.snapshots() if SNAPSHOT_ENABLED else None
+    return PortfolioState(portfolio, database, VersionedCache(), snapshots, VersionedCache(max_entries=1))
+
+
+def current_portfolio() -> Portfolio:
+    # A portfolio whose file is gone falls back to the main one.
+    try:
+        return get_portfolio(st.session_state.get("carteira", DEFAULT_PORTFOLIO))
+    except ValueError:
+        return get_portfolio(DEFAULT_PORTFOLIO)
+
+
+def portfolio_state(portfolio: Portfolio | None = None) -> PortfolioState:
+    return init_portfolio(portfolio or current_portfolio())
+
+
+def clear_caches() -> None:
+    for portfolio in list_portfolios():
+        portfolio_state(portfolio).cache.clear()
+    consolidation_cache.clear()
+
+
+def portfolio_selector() -> Portfolio:
+    # The choice lives under its own key rather than the widget's, which
+    # Streamlit drops when another page is opened.
+    portfolios = list_portfolios()
+    names = [portfolio.nome for portfolio in portfolios]
+    current = current_portfolio().nome
+    nome = st.sidebar.selectbox("Carteira", names, index=names.index(current) if current in names else 0)
+    st.session_state["carteira"] = nome
+    return portfolios[names.index(nome)]
+
+
+def ledger_version(state: PortfolioState) -> Hashable:
+    # PRAGMA data_version also moves when a page stores the equity curve, so
+    # the caches key on the ledger token, which only the ledger tables bump.
+    # The token is only read again after data_version moved.
+    def read() -> Hashable:
+        with state.database.ReadSession() as session:
+            return ledger_token(session) or data_version
+
+    data_version = state.database.changes.version()
+    return state.tokens.get("token", data_version, read)
+
+
+@timed
+def load_ledger() -> Ledger:
+    state = portfolio_state()
+    # The token is read before the snapshot opens, so cached data is never older than its version.
+    version = ledger_version(state)
+    return state.cache.get("ledger", version, lambda: _read_ledger(state, version))
+
+
+@timed
+def load_assets() -> pd.DataFrame:
+    state = portfolio_state()
+    version = ledger_version(state)
+
+    def read() -> pd.DataFrame:
+        with state.database.ReadSession() as session:
+            return assets_frame(session)
+
+    return state.cache.get("assets", version, read)
+
+
+@timed
+def load_dividend_months() -> tuple[pd.DataFrame, dict[int, PositionSnapshot]]:
+    # The monthly rollups and the positions both have one row per asset (and
+    # month), so the Proventos charts never read the dividends themselves.
+    state = portfolio_state()
+    version = ledger_version(state)
+
+    def read() -> tuple[pd.DataFrame, dict[int, PositionSnapshot]]:
+        with state.database.ReadSession() as session:
+            return dividend_months_frame(session), load_positions(session)
+
+    return state.cache.get("dividend_months", version, read)
+
+
+def cached_result(ledger: Ledger, name: str, compute: Callable[[], T], *args: Hashable) -> T:
+    with span(f"cache.{name}"):
+        return portfolio_state().cache.get((name, args), ledger.version, compute)
+
+
+def stored_result(ledger: Ledger, name: str, compute: Callable[[], pd.DataFrame], *args: Hashable) -> pd.DataFrame:
+    # Like cached_result, but the frame is also kept in the on-disk snapshot, so
+    # a restart with unchanged data reads it back instead of recomputing it.
+    file_name = "_".join([name, *map(str, args)])
+    store = portfolio_state().snapshots
+    return cached_result(ledger, name, lambda: stored_frame(store, ledger.token, file_name, compute), *args)
+
+
+def load_equity_curve(ledger: Ledger, end: date) -> pd.DataFrame:
+    def compute() -> pd.DataFrame:
+        with get_session() as session:
+            return ledger_equity_curve(session, ledger, end)
+
+    return cached_result(ledger, "curva_diaria", compute, end)
+
+
+consolidation_cache = VersionedCache()
+
+
+@timed
+def load_consolidation(portfolios: list[Portfolio], end: date) -> Consolidation:
+    # Valid while none of the chosen files changed; the work itself runs in a
+    # process pool, one portfolio per worker.
+    versions = tuple(ledger_version(portfolio_state(portfolio)) for portfolio in portfolios)
+    key = (tuple(portfolio.path for portfolio in portfolios), end)
+    return consolidation_cache.get(key, versions, lambda: consolidate(portfolios, end))
+
+
+def load_snapshot(ledger: Ledger) -> pd.DataFrame:
+    return stored_result(
+        ledger,
+        "snapshot",
+        lambda: portfolio_snapshot(
+            ledger.assets, ledger.positions, ledger.latest_prices, ledger.trade_prices, ledger.dividends
+        ),
+    )
+
+
+def page_cursor(name: str, filters: Hashable) -> list:
+    # Stack of keyset cursors for the pages already visited; a filter change starts over.
+    state = st.session_state.setdefault(name, {"filtros": None, "cursores": []})
+    if state["filtros"] != filters:
+        state["filtros"] = filters
+        state["cursores"] = []
+    return state["cursores"]
+
+
+def pager(name: str, cursors: list, next_key: Hashable | None, total: int, page_size: int) -> None:
+    previous, following, info = st.columns([1, 1, 6])
+    pages = max(1, -(-total // page_size))
+    info.caption(f"Página {len(cursors) + 1} de {pages} · {total} registros")
+    if previous.button("Anterior", key=f"{name}_anterior", disabled=not cursors):
+        cursors.pop()
+        st.rerun()
+    if following.button("Próxima", key=f"{name}_proxima", disabled=next_key is None):
+        cursors.append(next_key)
+        st.rerun()
+
+
+def export_button(name: str, file_stem: str) -> None:
+    # The file is only produced when the button is clicked, never on a rerun.
+    fmt_column, button_column = st.columns([1, 5])
+    fmt = fmt_column.selectbox(
+        "Formato", EXPORT_FORMATS, key=f"{name}_formato_exportacao", label_visibility="collapsed"
+    )
+
+    # Streamlit builds the file on a worker thread without the session state,
+    # so the portfolio is resolved here, while the page runs.
+    database = portfolio_state().database
+
+    def build() -> bytes:
+        with database.ReadSession() as session:
+            return export_bytes(session, name, fmt)
+
+    button_column.download_button(
+        f"Exportar {fmt.upper()}", data=build, file_name=f"{file_stem}.{fmt}", mime=EXPORT_MIME[fmt]
+    )
+
+
+def plotly_express():
+    # plotly.express costs about 0.2 s to import, so only pages that actually
+    # draw a chart pay for it, and only once they get that far.
+    with span("plotly.import"):
+        import plotly.express as px
+    return px
+
+
+def start_page(label: str) -> PerfRun | None:
+    portfolio_selector()
+    if not PERF_ENABLED:
+        return None
+    setup_logging()
+    return start_run(label)
+
+
+def perf_panel(run: PerfRun | None) -> None:
+    if run is None:
+        return
+    total = run.seconds
+    st.sidebar.subheader("Desempenho desta execução")
+    st.sidebar.caption(
+        f"{total * 1000:.0f} ms no total · {run.sql_count} consultas SQL em {run.sql_seconds * 1000:.0f} ms"
+    )
+    st.sidebar.dataframe(
+        pd.DataFrame(
+            {
+                "Etapa": ["· " * s.depth + s.name for s in run.spans],
+                "ms": [round(s.seconds * 1000, 1) for s in run.spans],
+                "SQL": [s.sql_count for s in run.spans],
+                "SQL ms": [round(s.sql_seconds * 1000, 1) for s in run.spans],
+            }
+        ),
+        hide_index=True,
+    )
+
+
+def _read_ledger(state: PortfolioState, version: Hashable) -> Ledger:
+    with state.database.ReadSession() as session:
+        return read_ledger(session, version, state.snapshots)
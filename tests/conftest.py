@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models import Base
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://", future=True)
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine, future=True)() as session:
+        yield session
+    engine.dispose()
+
+
+class _BcbHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        start = datetime.strptime(params["dataInicial"][0], "%d/%m/%Y").date()
+        end = datetime.strptime(params["dataFinal"][0], "%d/%m/%Y").date()
+        server = self.server
+        with server.lock:
+            server.requests.append((start, end))
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            failing = server.failures > 0
+            server.failures -= failing
+        try:
+            time.sleep(server.delay)
+            if failing:
+                self._reply(503, {"erro": "indisponível"})
+            elif server.max_days and (end - start).days + 1 > server.max_days:
+                self._reply(400, {"erro": "período acima do limite"})
+            else:
+                days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+                weekdays = [day for day in days if day.weekday() < 5]
+                body = [{"data": day.strftime("%d/%m/%Y"), "valor": server.rate(day)} for day in weekdays]
+                self._reply(200 if body else 404, body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def bcb_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BcbHandler)
+    server.requests = []
+    server.lock = threading.Lock()
+    server.active = server.peak = server.failures = 0
+    server.delay = 0.0
+    server.max_days = None
+    server.rate = lambda day: f"{0.04 + day.day / 10000:.6f}"
+    server.endpoint = f"http://127.0.0.1:{server.server_port}/dados"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -1,10 +1,17 @@
 from datetime import date
 
 import pandas as pd
+import pytest
 
 from src.models import Transaction
 from src.services.cdi import cdi_accumulated_index
-from src.services.portfolio import compute_positions, portfolio_timeseries
+from src.services.portfolio import (
+    compute_positions,
+    compute_positions_frame,
+    equity_curve,
+    portfolio_timeseries,
+    transactions_to_frame,
+)
 
 
 def test_compute_positions_price_average():
@@ -78,3 +85,57 @@ def test_cdi_accumulated_index():
     )
     idx = cdi_accumulated_index(cdi)
     assert round(idx["indice"].iloc[-1], 4) == round(100 * 1.001 * 1.002, 4)
+
+
+def test_compute_positions_frame_matches_loop():
+    rows = [
+        (1, date(2024, 1, 1), "BUY", 10.0, 10.0, 1.0),
+        (1, date(2024, 2, 1), "buy", 20.0, 5.0, 0.0),
+        (1, date(2024, 3, 1), "SELL", 30.0, 5.0, 0.0),
+        (2, date(2024, 1, 5), "BUY", 5.0, 4.0, 0.5),
+        (2, date(2024, 1, 6), "SELL", 6.0, 4.0, 0.0),
+        (2, date(2024, 1, 7), "BUY", 7.0, 2.0, 0.0),
+        (3, date(2024, 1, 1), "BUY", 8.0, 1.0, 0.0),
+        (3, date(2024, 1, 2), "SELL", 9.0, 3.0, 0.0),
+        (3, date(2024, 1, 3), "SELL", 9.0, 1.0, 0.0),
+        (1, date(2024, 3, 1), "BUY", 25.0, 2.0, 0.0),
+    ]
+    txs = [
+        Transaction(asset_id=a, data=d, tipo=t, preco_unit=p, quantidade=q, taxas=f, valor_total=p * q)
+        for a, d, t, p, q, f in rows
+    ]
+
+    expected = compute_positions(txs)
+    result = compute_positions_frame(transactions_to_frame(txs))
+    assert result.keys() == expected.keys()
+    for asset_id, position in expected.items():
+        assert result[asset_id].quantidade == position.quantidade
+        assert result[asset_id].preco_medio == pytest.approx(position.preco_medio)
+        assert result[asset_id].investido_liquido == pytest.approx(position.investido_liquido)
+
+
+def test_equity_curve_marks_to_market():
+    transactions = pd.DataFrame(
+        {
+            "asset_id": [1, 1, 2, 1],
+            "data": pd.to_datetime(["2024-01-01", "2024-01-03", "2024-01-03", "2024-01-05"]),
+            "tipo": ["BUY", "BUY", "BUY", "SELL"],
+            "preco_unit": [10.0, 12.0, 5.0, 11.0],
+            "quantidade": [10.0, 5.0, 4.0, 3.0],
+        }
+    )
+    prices = pd.DataFrame(
+        {
+            "asset_id": [1, 2, 2],
+            "data": pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-06"]),
+            "preco": [11.0, 6.0, 7.0],
+        }
+    )
+
+    curve = equity_curve(transactions, prices)
+    assert curve["data"].dt.day.tolist() == [1, 2, 3, 4, 5, 6]
+    assert curve["patrimonio"].tolist() == [100.0, 110.0, 15 * 12.0 + 4 * 6.0, 204.0, 12 * 11.0 + 24.0, 132.0 + 28.0]
+
+    business = equity_curve(transactions, prices, freq="B", end=date(2024, 1, 8))
+    assert business["data"].dt.day.tolist() == [1, 2, 3, 4, 5, 8]
+    assert business["patrimonio"].iloc[-1] == 132.0 + 28.0
@@ -0,0 +1,123 @@
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+import requests
+from sqlalchemy import update
+
+from src.db import Database
+from src.models import Base, CdiRate
+from src.services import cdi
+from src.services.cdi import cached_cdi_series, cdi_accumulated_index, cdi_http_session, fetch_cdi_series
+
+
+def test_cached_cdi_series_fetches_only_missing_ranges(session, bcb_server):
+    first = cached_cdi_series(session, date(2020, 3, 2), date(2020, 3, 31), endpoint=bcb_server.endpoint)
+    assert len(first) == 22
+    assert bcb_server.requests == [(date(2020, 3, 2), date(2020, 3, 31))]
+
+    cached_cdi_series(session, date(2020, 3, 10), date(2020, 3, 20), endpoint=bcb_server.endpoint)
+    assert len(bcb_server.requests) == 1
+
+    extended = cached_cdi_series(session, date(2020, 2, 1), date(2020, 4, 15), endpoint=bcb_server.endpoint)
+    # Both gaps are fetched concurrently, so they may arrive in any order.
+    assert sorted(bcb_server.requests[1:]) == [
+        (date(2020, 2, 1), date(2020, 3, 1)),
+        (date(2020, 4, 1), date(2020, 4, 15)),
+    ]
+    assert extended["data"].is_monotonic_increasing
+    assert extended["data"].dt.date.tolist() == [
+        day.date() for day in fetch_cdi_series(date(2020, 2, 1), date(2020, 4, 15), bcb_server.endpoint)["data"]
+    ]
+
+
+def test_cached_index_matches_cumprod(session, bcb_server):
+    cached_cdi_series(session, date(2021, 1, 1), date(2021, 6, 30), endpoint=bcb_server.endpoint)
+    sub_range = cached_cdi_series(session, date(2021, 3, 3), date(2021, 5, 20), offline=True)
+
+    expected = cdi_accumulated_index(fetch_cdi_series(date(2021, 3, 3), date(2021, 5, 20), bcb_server.endpoint))
+    result = cdi_accumulated_index(sub_range)
+    assert result["data"].tolist() == expected["data"].tolist()
+    assert result["indice"].tolist() == pytest.approx(expected["indice"].tolist())
+
+
+def test_index_extends_from_the_last_stored_rate(session, bcb_server):
+    cached_cdi_series(session, date(2021, 3, 1), date(2021, 3, 31), endpoint=bcb_server.endpoint)
+    # Rates appended at the end don't rewrite the stored ones.
+    session.execute(update(CdiRate).where(CdiRate.data == date(2021, 3, 1)).values(indice=-1.0))
+    extended = cached_cdi_series(session, date(2021, 3, 1), date(2021, 4, 30), endpoint=bcb_server.endpoint)
+    assert extended["acumulado"].iloc[0] == -1.0
+    march = extended[extended["data"] < "2021-04-01"]
+    april = extended[extended["data"] >= "2021-04-01"]
+    assert april["acumulado"].tolist() == pytest.approx(
+        (march["acumulado"].iloc[-1] * (1 + april["cdi_diario"] / 100.0).cumprod()).tolist()
+    )
+
+    # A back-fill moves the start of the index, so every later rate is recomputed.
+    backfilled = cached_cdi_series(session, date(2021, 2, 1), date(2021, 4, 30), endpoint=bcb_server.endpoint)
+    expected = (1 + backfilled["cdi_diario"] / 100.0).cumprod() * 100.0
+    assert backfilled["acumulado"].tolist() == pytest.approx(expected.tolist())
+
+
+def test_offline_mode_never_fetches(session, bcb_server):
+    result = cached_cdi_series(session, date(2022, 1, 1), date(2022, 2, 1), offline=True, endpoint=bcb_server.endpoint)
+    assert result.empty
+    assert bcb_server.requests == []
+
+
+def test_read_session_opens_a_writer_only_for_missing_ranges(tmp_path, bcb_server):
+    database = Database(tmp_path / "wallet.db")
+    Base.metadata.create_all(database.engine)
+    writes = []
+
+    def writer():
+        writes.append(1)
+        return database.SessionLocal()
+
+    with database.ReadSession() as session:
+        kwargs = {"endpoint": bcb_server.endpoint, "writer": writer}
+        first = cached_cdi_series(session, date(2020, 3, 2), date(2020, 3, 31), **kwargs)
+        assert len(first) == 22 and len(writes) == 1
+        assert len(cached_cdi_series(session, date(2020, 3, 10), date(2020, 3, 20), **kwargs)) == 9
+        assert cached_cdi_series(session, date(2022, 1, 1), date(2022, 2, 1), offline=True, **kwargs).empty
+    assert len(writes) == 1
+    assert len(bcb_server.requests) == 1
+    database.engine.dispose()
+    database.read_engine.dispose()
+
+
+@pytest.fixture
+def http():
+    return cdi_http_session(retries=3, backoff=0.01)
+
+
+def test_long_range_is_split_into_api_windows(bcb_server, http, monkeypatch):
+    monkeypatch.setattr(cdi, "CDI_MAX_WINDOW", timedelta(days=365))
+    bcb_server.max_days = 365
+    bcb_server.delay = 0.2
+
+    started = time.perf_counter()
+    result = fetch_cdi_series(date(2019, 1, 1), date(2022, 6, 30), bcb_server.endpoint, http=http)
+    elapsed = time.perf_counter() - started
+
+    assert len(bcb_server.requests) == 4
+    assert all((end - start).days < 365 for start, end in bcb_server.requests)
+    assert bcb_server.peak > 1
+    assert elapsed < 4 * bcb_server.delay
+    assert result["data"].is_unique and result["data"].is_monotonic_increasing
+    expected = pd.bdate_range(date(2019, 1, 1), date(2022, 6, 30))
+    assert result["data"].tolist() == expected.tolist()
+
+
+def test_transient_errors_are_retried(bcb_server, http):
+    bcb_server.failures = 2
+    result = fetch_cdi_series(date(2023, 5, 1), date(2023, 5, 31), bcb_server.endpoint, http=http)
+    assert len(bcb_server.requests) == 3
+    assert len(result) == 23
+
+
+def test_errors_beyond_retries_propagate(bcb_server):
+    bcb_server.failures = 5
+    with pytest.raises(requests.HTTPError):
+        fetch_cdi_series(date(2023, 5, 1), date(2023, 5, 31), bcb_server.endpoint, http=cdi_http_session(1, 0.01))
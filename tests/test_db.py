@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import OperationalError
+
+from src.db import EngineSettings, make_engine
+from src.models import Asset, Base
+
+
+@pytest.fixture
+def engines(tmp_path):
+    path = tmp_path / "wallet.db"
+    settings = EngineSettings(busy_timeout_ms=200, mmap_mb=8, cache_mb=4, read_pool_size=2)
+    writer = make_engine(path, settings)
+    reader = make_engine(path, settings, read_only=True)
+    Base.metadata.create_all(writer)
+    yield writer, reader
+    writer.dispose()
+    reader.dispose()
+
+
+def test_pragmas_applied(engines):
+    writer, reader = engines
+    with writer.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 200
+        assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -4096
+    with reader.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA query_only").scalar() == 1
+    assert reader.pool.size() == 2
+
+
+def test_read_engine_rejects_writes(engines):
+    _, reader = engines
+    with reader.begin() as conn, pytest.raises(OperationalError):
+        conn.execute(insert(Asset).values(nome="PETR4"))
+
+
+def test_reader_not_blocked_by_open_write(engines):
+    writer, reader = engines
+    with writer.begin() as conn:
+        conn.execute(insert(Asset).values(nome="PETR4"))
+    with writer.begin() as conn:
+        conn.execute(insert(Asset).values(nome="HGLG11"))
+        # The reader sees the last committed snapshot instead of waiting.
+        with reader.connect() as read_conn:
+            assert read_conn.execute(select(Asset.nome)).scalars().all() == ["PETR4"]
+    with reader.connect() as read_conn:
+        assert len(read_conn.execute(select(Asset.nome)).all()) == 2
+
+
+def test_second_writer_waits_then_fails_on_timeout(engines):
+    writer, _ = engines
+    with writer.begin() as conn:
+        conn.execute(text("SELECT 1"))
+        with writer.connect() as other, pytest.raises(OperationalError, match="locked"):
+            other.execute(insert(Asset).values(nome="ITSA4"))
+
+
+def test_settings_from_env(monkeypatch):
+    monkeypatch.setenv("WALLET_DB_SYNCHRONOUS", "full")
+    monkeypatch.setenv("WALLET_DB_READ_POOL_SIZE", "8")
+    settings = EngineSettings.from_env()
+    assert settings.synchronous == "full"
+    assert settings.read_pool_size == 8
+    monkeypatch.setenv("WALLET_DB_JOURNAL_MODE", "wal; DROP TABLE assets")
+    with pytest.raises(ValueError):
+        EngineSettings.from_env()
@@ -0,0 +1,85 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from src.models import Asset, Dividend
+from src.queries import dividend_months_frame
+from src.services.dividends import monthly_income, rebuild_dividend_months, record_dividends, yield_on_cost
+from src.services.portfolio import PositionSnapshot
+
+
+@pytest.fixture
+def asset_ids(session):
+    assets = [Asset(nome="HGLG11"), Asset(nome="BBAS3")]
+    session.add_all(assets)
+    session.commit()
+    return [asset.id for asset in assets]
+
+
+def _add(session, *dividends):
+    session.add_all(dividends)
+    session.flush()
+    record_dividends(session, dividends)
+    session.commit()
+
+
+def _months(session):
+    return dividend_months_frame(session)[["asset_id", "mes", "valor", "quantidade"]]
+
+
+def test_record_dividends_matches_rebuild(session, asset_ids):
+    hglg, bbas = asset_ids
+    _add(session, Dividend(asset_id=hglg, data=date(2024, 1, 15), valor=1.1))
+    _add(
+        session,
+        Dividend(asset_id=hglg, data=date(2024, 1, 31), valor=0.9),
+        Dividend(asset_id=bbas, data=date(2024, 3, 1), valor=5.0),
+    )
+    # Back-dated rows are just added to their own month.
+    _add(session, Dividend(asset_id=hglg, data=date(2023, 12, 15), valor=1.0))
+
+    months = _months(session)
+    assert list(months.itertuples(index=False, name=None)) == [
+        (hglg, pd.Timestamp("2023-12-01"), 1.0, 1),
+        (hglg, pd.Timestamp("2024-01-01"), 2.0, 2),
+        (bbas, pd.Timestamp("2024-03-01"), 5.0, 1),
+    ]
+    assert rebuild_dividend_months(session) == 3
+    pd.testing.assert_frame_equal(_months(session), months)
+
+
+def test_monthly_income_fills_gaps_and_sums_trailing_year():
+    months = pd.DataFrame(
+        {
+            "asset_id": [1, 2, 1, 1],
+            "mes": pd.to_datetime(["2023-01-01", "2023-01-01", "2023-06-01", "2024-01-01"]),
+            "valor": [1.0, 2.0, 4.0, 8.0],
+        }
+    )
+    income = monthly_income(months, end=date(2024, 3, 10))
+    assert len(income) == 15
+    assert income["mes"].iloc[-1] == pd.Timestamp("2024-03-01")
+    assert income.set_index("mes").loc["2023-06-01", "valor"] == 4.0
+    # January 2023 leaves the window in January 2024.
+    assert income["renda_12m"].tolist()[11:13] == [7.0, 12.0]
+    assert income["renda_12m"].iloc[-1] == 12.0
+
+
+def test_yield_on_cost_uses_the_cost_of_current_positions():
+    months = pd.DataFrame(
+        {
+            "asset_id": [1, 1, 2],
+            "mes": pd.to_datetime(["2023-02-01", "2024-02-01", "2024-01-01"]),
+            "valor": [50.0, 10.0, 3.0],
+        }
+    )
+    positions = {
+        1: PositionSnapshot(1, quantidade=10.0, preco_medio=10.0, investido_liquido=100.0),
+        2: PositionSnapshot(2, quantidade=0.0, preco_medio=0.0, investido_liquido=0.0),
+        3: PositionSnapshot(3, quantidade=5.0, preco_medio=20.0, investido_liquido=100.0),
+    }
+    frame = yield_on_cost(months, positions, date(2024, 2, 20))
+    assert frame["asset_id"].tolist() == [1, 3]
+    assert frame["renda_12m"].tolist() == [10.0, 0.0]
+    assert frame["yield_on_cost"].tolist() == pytest.approx([0.10, 0.0])
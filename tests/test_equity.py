@@ -0,0 +1,119 @@
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+from src.models import Asset, EquityCurveState, Price, Transaction
+from src.queries import prices_frame, transactions_frame
+from src.services import equity
+from src.services.equity import check_equity_curve, update_equity_curve
+from src.services.portfolio import equity_curve
+
+START = date(2023, 1, 1)
+
+
+@pytest.fixture
+def asset_ids(session):
+    assets = [Asset(nome=nome) for nome in ("PETR4", "VALE3", "HGLG11")]
+    session.add_all(assets)
+    session.commit()
+    return [asset.id for asset in assets]
+
+
+def _day(rng):
+    return START + timedelta(days=rng.randrange(400))
+
+
+def _edit(session, rng, asset_ids):
+    transactions = session.scalars(select(Transaction)).all()
+    prices = session.scalars(select(Price)).all()
+    choice = rng.random()
+    if choice < 0.35 or not transactions:
+        quantidade = float(rng.randrange(1, 20))
+        preco = round(rng.uniform(5, 50), 2)
+        session.add(
+            Transaction(
+                asset_id=rng.choice(asset_ids),
+                data=_day(rng),
+                tipo=rng.choice(["BUY", "BUY", "SELL"]),
+                preco_unit=preco,
+                quantidade=quantidade,
+                taxas=0.0,
+                valor_total=preco * quantidade,
+            )
+        )
+    elif choice < 0.65:
+        session.add(
+            Price(asset_id=rng.choice(asset_ids), data=_day(rng), preco=round(rng.uniform(5, 50), 2), fonte="manual")
+        )
+    elif choice < 0.75 and prices:
+        rng.choice(prices).preco = round(rng.uniform(5, 50), 2)
+    elif choice < 0.85:
+        rng.choice(transactions).data = _day(rng)
+    elif choice < 0.95:
+        session.delete(rng.choice(transactions))
+    elif prices:
+        session.delete(rng.choice(prices))
+    try:
+        session.commit()
+    except Exception:
+        # A random price can land on an existing (asset, date, source).
+        session.rollback()
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_incremental_curve_matches_full_recompute(session, asset_ids, monkeypatch, seed):
+    rebuilds = []
+    full_rebuild = equity.rebuild_equity_curve
+    monkeypatch.setattr(
+        equity, "rebuild_equity_curve", lambda *args, **kw: rebuilds.append(1) or full_rebuild(*args, **kw)
+    )
+    rng = random.Random(seed)
+    end = START + timedelta(days=300)
+    for step in range(60):
+        for _ in range(rng.randrange(1, 4)):
+            _edit(session, rng, asset_ids)
+        if rng.random() < 0.3:
+            end += timedelta(days=rng.randrange(1, 20))
+        transactions, prices = transactions_frame(session), prices_frame(session)
+        curve = update_equity_curve(session, transactions, prices, end)
+        session.commit()
+
+        expected = equity_curve(transactions, prices, end=end)
+        assert curve["data"].tolist() == pd.to_datetime(expected["data"]).tolist(), step
+        assert curve["patrimonio"].to_numpy() == pytest.approx(expected["patrimonio"].to_numpy(dtype=float)), step
+        # Only changes dated after end are left for a later update.
+        desde = session.scalar(select(EquityCurveState.desde))
+        assert desde is None or desde > end
+    assert check_equity_curve(session, transactions, prices) == []
+    # Most updates resumed from a checkpoint instead of starting over.
+    assert len(rebuilds) < 30
+
+
+def test_unchanged_ledger_only_reads_the_curve(session, asset_ids, monkeypatch):
+    session.add(
+        Transaction(
+            asset_id=asset_ids[0],
+            data=date(2024, 1, 2),
+            tipo="BUY",
+            preco_unit=10.0,
+            quantidade=3.0,
+            taxas=0.0,
+            valor_total=30.0,
+        )
+    )
+    session.commit()
+    transactions, prices = transactions_frame(session), prices_frame(session)
+    update_equity_curve(session, transactions, prices, date(2024, 1, 10))
+    session.commit()
+
+    monkeypatch.setattr(equity, "curve_matrices", lambda *args, **kw: pytest.fail("curve recomputed"))
+    curve = update_equity_curve(session, transactions, prices, date(2024, 1, 10))
+    assert curve["patrimonio"].tolist() == [30.0] * 9
+
+    # A new price marks its day; the days before it are kept.
+    session.add(Price(asset_id=asset_ids[0], data=date(2024, 1, 8), preco=12.0, fonte="manual"))
+    session.commit()
+    assert session.scalar(select(EquityCurveState.desde)) == date(2024, 1, 8)
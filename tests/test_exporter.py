@@ -0,0 +1,65 @@
+import gzip
+import io
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from src.exporter import export_bytes, export_table
+from src.models import Asset, Dividend, Transaction
+from src.services.positions import rebuild_positions
+
+
+@pytest.fixture
+def ledger(session):
+    asset = Asset(nome="BBAS3")
+    session.add(asset)
+    session.flush()
+    session.add_all(
+        [
+            Transaction(
+                asset_id=asset.id,
+                data=date(2024, 1, 1) + timedelta(days=i),
+                tipo="BUY",
+                preco_unit=20.0 + i,
+                quantidade=1.0,
+                taxas=0.0,
+                valor_total=20.0 + i,
+            )
+            for i in range(7)
+        ]
+    )
+    rebuild_positions(session)
+    session.commit()
+    return asset
+
+
+@pytest.mark.parametrize("fmt", ["csv", "csv.gz", "parquet"])
+def test_export_streams_every_row_in_order(session, ledger, fmt):
+    buffer = io.BytesIO()
+    rows = export_table(session, "transacoes", buffer, fmt, chunk_size=3)
+    assert rows == 7
+    buffer.seek(0)
+    if fmt == "parquet":
+        df = pd.read_parquet(buffer)
+    else:
+        df = pd.read_csv(gzip.GzipFile(fileobj=buffer) if fmt == "csv.gz" else buffer)
+    assert len(df) == 7
+    assert df["preco_unit"].tolist() == [20.0 + i for i in range(7)]
+    assert str(df["data"].iloc[0]) == "2024-01-01"
+    assert set(df["ativo"]) == {"BBAS3"}
+
+
+def test_export_positions_and_empty_tables(session, ledger, tmp_path):
+    positions = pd.read_csv(io.BytesIO(export_bytes(session, "posicoes")))
+    assert positions[["ativo", "quantidade"]].values.tolist() == [["BBAS3", 7.0]]
+
+    assert session.query(Dividend).count() == 0
+    assert export_bytes(session, "proventos").decode() == "data,ativo,valor\n"
+    assert export_table(session, "proventos", tmp_path / "proventos.parquet", "parquet") == 0
+    assert list(pd.read_parquet(tmp_path / "proventos.parquet").columns) == ["data", "ativo", "valor"]
+
+
+def test_export_rejects_unknown_format(session):
+    with pytest.raises(ValueError):
+        export_bytes(session, "precos", "xlsx")
@@ -0,0 +1,230 @@
+import sys
+import types
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+from src import importer
+from src.importer import (
+    ImportProgress,
+    _parse_dates,
+    import_excel,
+    import_excel_bulk,
+    import_excel_streaming,
+    import_workbooks,
+)
+from src.models import Asset, Dividend, DividendMonth, ImportCheckpoint, Transaction
+from src.services import positions
+from src.services.positions import check_positions
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "Investimentos.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame(
+            {
+                "Nome": ["PETR4", "HGLG11"],
+                "Categoria": ["Ações", "FII"],
+                "Tipo": ["Ação", None],
+                "Setor": ["Energia", None],
+            }
+        ).to_excel(writer, sheet_name="Ativos", index=False)
+        pd.DataFrame(
+            {
+                "Nome": ["PETR4", "VALE3", None],
+                "Categoria": ["Ações", "Ações", None],
+                "Data": [datetime(2024, 1, 2), "10/02/2024", None],
+                "Valor un": [30.0, 70.0, None],
+                "Quantidade": [10, 5, None],
+                "Taxas": [1.0, None, None],
+                "Custo Total": [301.0, None, None],
+            }
+        ).to_excel(writer, sheet_name="Entradas", index=False)
+        pd.DataFrame(
+            {
+                "Nome": ["PETR4"],
+                "Data": ["01/02/2024"],
+                "Valor un": [35.0],
+                "Quantidade": [4],
+                "Taxas": [0.0],
+                "Custo Total": [140.0],
+                "Resultado": [20.0],
+                "Ganhos": [20.0],
+            }
+        ).to_excel(writer, sheet_name="Saidas", index=False)
+        pd.DataFrame(
+            {"Nome": ["HGLG11", "HGLG11"], "Data": ["15/02/2024", "15/02/2024"], "Valor": [2.2, 2.2]}
+        ).to_excel(writer, sheet_name="Dividendos", index=False)
+    return path
+
+
+def test_import_excel_bulk_counts(session, workbook):
+    result = import_excel_bulk(workbook, session)
+
+    assert result["assets"] == 3
+    assert result["entradas_inserted"] == 2
+    assert result["saidas_inserted"] == 1
+    assert result["dividendos_inserted"] == 1
+    assert result["dividendos_skipped"] == 1
+
+    vale = session.query(Asset).filter_by(nome="VALE3").one()
+    assert vale.categoria == "Ações"
+    tx = session.query(Transaction).filter_by(asset_id=vale.id).one()
+    assert tx.data == date(2024, 2, 10)
+    assert tx.valor_total == 350.0
+    assert tx.taxas == 0.0
+    assert session.query(Dividend).count() == 1
+    assert check_positions(session) == []
+
+
+def test_import_excel_bulk_reimport_skips_duplicates(session, workbook):
+    import_excel_bulk(workbook, session)
+    result = import_excel_bulk(workbook, session)
+
+    assert result["assets"] == 0
+    assert result["entradas_inserted"] == 0
+    assert result["entradas_skipped"] == 2
+    assert result["saidas_inserted"] == 0
+    assert result["saidas_skipped"] == 1
+    assert result["dividendos_skipped"] == 2
+    assert session.query(Asset).count() == 3
+    # Skipped dividends are not added to the monthly rollup again.
+    month = session.query(DividendMonth).one()
+    assert (month.mes, month.valor, month.quantidade) == (date(2024, 2, 1), 2.2, 1)
+
+
+def test_import_excel_skips_a_repeated_row_alone(session, tmp_path):
+    path = tmp_path / "Investimentos.xlsx"
+    buy = {"Nome": "PETR4", "Data": "02/01/2024", "Valor un": 30.0, "Quantidade": 10, "Taxas": 0.0}
+    other = {"Nome": "VALE3", "Data": "10/02/2024", "Valor un": 70.0, "Quantidade": 5, "Taxas": 0.0}
+    dividend = {"Nome": "HGLG11", "Data": "15/02/2024", "Valor": 2.2}
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame([buy, buy, other]).to_excel(writer, sheet_name="Entradas", index=False)
+        pd.DataFrame([dividend, dividend]).to_excel(writer, sheet_name="Dividendos", index=False)
+
+    # Each repeated row is dropped alone; the rows written before it stay.
+    result = import_excel(path, session)
+    assert result == {"assets": 0, "transactions": 2, "dividends": 1}
+    assert session.query(Asset).count() == 3
+    assert session.query(Transaction).count() == 2
+    assert session.query(DividendMonth).one().valor == 2.2
+    assert check_positions(session) == []
+
+    assert import_excel(path, session) == {"assets": 0, "transactions": 0, "dividends": 0}
+    assert session.query(Transaction).count() == 2
+
+
+def test_import_excel_streaming_matches_bulk(session, workbook):
+    progress = []
+    result = import_excel_streaming(workbook, session, chunk_size=1, progress=progress.append)
+
+    assert result["assets"] == 3
+    assert result["entradas_inserted"] == 2
+    assert result["saidas_inserted"] == 1
+    assert result["dividendos_skipped"] == 1
+    assert progress[-1] == ImportProgress(sheet="Dividendos", rows_done=2, rows_total=2)
+    assert session.query(ImportCheckpoint).count() == 0
+
+
+def test_import_excel_streaming_resumes_after_crash(session, workbook):
+    def crash(progress):
+        if progress.sheet == "Entradas" and progress.rows_done == 2:
+            raise RuntimeError("queda")
+
+    with pytest.raises(RuntimeError):
+        import_excel_streaming(workbook, session, chunk_size=2, progress=crash)
+    checkpoint = session.query(ImportCheckpoint).filter_by(planilha="Entradas").one()
+    assert checkpoint.linhas == 2
+
+    result = import_excel_streaming(workbook, session, chunk_size=2)
+    assert result["entradas_inserted"] == 0
+    assert result["saidas_inserted"] == 1
+    assert session.query(Transaction).count() == 3
+    assert session.query(ImportCheckpoint).count() == 0
+    assert check_positions(session) == []
+
+
+def test_parallel_import_of_several_workbooks(session, workbook, tmp_path):
+    second = tmp_path / "Outra.xlsx"
+    with pd.ExcelWriter(second) as writer:
+        pd.DataFrame({"Nome": ["ITSA4"], "Data": ["05/03/2024"], "Valor un": [10.0], "Quantidade": [100]}).to_excel(
+            writer, sheet_name="Entradas", index=False
+        )
+
+    first_result, second_result = import_workbooks([workbook, second], session, workers=2)
+    assert first_result["entradas_inserted"] == 2
+    assert first_result["dividendos_skipped"] == 1
+    assert second_result["entradas_inserted"] == 1
+    assert second_result["assets"] == 1
+    assert session.query(Transaction).count() == 4
+    assert session.query(ImportCheckpoint).count() == 0
+    assert check_positions(session) == []
+
+
+def test_parallel_import_from_a_streamlit_page(session, workbook, tmp_path, monkeypatch):
+    # Streamlit leaves the page it runs installed as __main__; workers must not run it again.
+    page = tmp_path / "pagina.py"
+    page.write_text("raise SystemExit('página executada no worker')\n")
+    main = types.ModuleType("__main__")
+    main.__file__ = str(page)
+    monkeypatch.setitem(sys.modules, "__main__", main)
+
+    (result,) = import_workbooks([workbook], session, workers=2)
+    assert result["entradas_inserted"] == 2
+    assert sys.modules["__main__"] is main
+
+
+def test_streaming_import_holds_one_chunk_at_a_time(session, tmp_path, monkeypatch):
+    path = tmp_path / "Grande.xlsx"
+    rows = 200
+    pd.DataFrame(
+        {
+            "Nome": [f"ATV{i % 4}" for i in range(rows)],
+            # Every chunk goes back in time, so every chunk is back-dated.
+            "Data": [datetime(2024, 1, 1) - pd.Timedelta(days=i) for i in range(rows)],
+            "Valor un": 10.0,
+            "Quantidade": 1,
+        }
+    ).to_excel(path, sheet_name="Entradas", index=False)
+
+    counts = {"parsed": 0, "written": 0, "held": 0, "rebuilds": 0}
+    normalize, write, rebuild = importer.normalize_sheet, importer.write_rows, positions.rebuild_positions
+
+    def counting_normalize(sheet, df):
+        counts["parsed"] += len(df)
+        return normalize(sheet, df)
+
+    def counting_write(session, sheet, rows, *args):
+        counts["held"] = max(counts["held"], counts["parsed"] - counts["written"])
+        counts["written"] += len(rows)
+        return write(session, sheet, rows, *args)
+
+    def counting_rebuild(*args, **kwargs):
+        counts["rebuilds"] += 1
+        return rebuild(*args, **kwargs)
+
+    monkeypatch.setattr(importer, "normalize_sheet", counting_normalize)
+    monkeypatch.setattr(importer, "write_rows", counting_write)
+    monkeypatch.setattr(positions, "rebuild_positions", counting_rebuild)
+    result = import_excel_streaming(path, session, chunk_size=10, workers=1)
+
+    assert result["entradas_inserted"] == rows
+    assert counts["held"] <= 10
+    # The back-dated assets are rebuilt once at the end, not once per chunk.
+    assert counts["rebuilds"] == 1
+    assert check_positions(session) == []
+
+
+def test_parse_dates_is_day_first_for_mixed_cells():
+    values = pd.Series([datetime(2024, 1, 2), "03/02/2024", "2024-02-05", "7/2/2024", None], dtype=object)
+    assert _parse_dates(values).tolist()[:4] == [
+        pd.Timestamp(2024, 1, 2),
+        pd.Timestamp(2024, 2, 3),
+        pd.Timestamp(2024, 2, 5),
+        pd.Timestamp(2024, 2, 7),
+    ]
+    assert pd.isna(_parse_dates(values).iloc[4])
+    with pytest.raises(ValueError):
+        _parse_dates(pd.Series(["não é data"], dtype=object))
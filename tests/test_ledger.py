@@ -0,0 +1,80 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from src import ledger as ledger_module
+from src.ledger import SnapshotStore, ledger_token, read_ledger, stored_frame
+from src.models import Asset, Price, Transaction
+from src.services.positions import record_transactions
+
+
+@pytest.fixture
+def filled(session):
+    asset = Asset(nome="WEGE3", categoria="Ações")
+    session.add(asset)
+    session.flush()
+    tx = Transaction(
+        asset_id=asset.id,
+        data=date(2024, 3, 1),
+        tipo="BUY",
+        preco_unit=35.0,
+        quantidade=10.0,
+        taxas=1.0,
+        valor_total=351.0,
+    )
+    session.add_all([tx, Price(asset_id=asset.id, data=date(2024, 3, 4), preco=36.5, fonte="manual")])
+    record_transactions(session, [tx])
+    session.commit()
+    return asset
+
+
+def test_token_changes_only_on_writes(session, filled):
+    token = ledger_token(session)
+    session.query(Asset).all()
+    assert ledger_token(session) == token
+    filled.setor = "Industrial"
+    session.commit()
+    assert ledger_token(session) != token
+
+
+def test_snapshot_round_trip_skips_sql(session, filled, tmp_path, monkeypatch):
+    store = SnapshotStore(tmp_path)
+    fresh = read_ledger(session, 1, store)
+    assert store.path(fresh.token, "transactions").exists()
+
+    def no_sql(session):
+        raise AssertionError("ledger read from SQL instead of the snapshot")
+
+    monkeypatch.setattr(ledger_module, "_read_tables", no_sql)
+    mapped = read_ledger(session, 2, store)
+    for name in ["assets", "transactions", "dividends", "latest_prices", "trade_prices", "price_history"]:
+        pd.testing.assert_frame_equal(getattr(mapped, name), getattr(fresh, name))
+    assert mapped.positions == fresh.positions
+    # Numeric columns are views of the mapped file, not copies.
+    assert not mapped.transactions["valor_total"].to_numpy().flags.owndata
+
+
+def test_write_regenerates_and_prunes_snapshot(session, filled, tmp_path):
+    store = SnapshotStore(tmp_path)
+    old = read_ledger(session, 1, store)
+    session.add(Price(asset_id=filled.id, data=date(2024, 3, 5), preco=37.0, fonte="manual"))
+    session.commit()
+    new = read_ledger(session, 2, store)
+    assert new.token != old.token
+    assert new.latest_prices["preco"].tolist() == [37.0]
+    assert not store.path(old.token, "transactions").parent.exists()
+
+
+def test_stored_frame_computes_once_per_token(tmp_path):
+    store = SnapshotStore(tmp_path)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return pd.DataFrame({"data": pd.to_datetime(["2024-01-02"]), "patrimonio": [10.0]})
+
+    first = stored_frame(store, "abc-1", "curva", compute)
+    pd.testing.assert_frame_equal(stored_frame(store, "abc-1", "curva", compute), first)
+    stored_frame(store, "abc-2", "curva", compute)
+    assert len(calls) == 2
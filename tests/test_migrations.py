@@ -0,0 +1,145 @@
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import Session
+
+from src import migrations
+from src.importer import transaction_fingerprints
+from src.migrations import MIGRATIONS, Migration, add_transaction_fingerprints, migrate, schema_version
+from src.models import (
+    Base,
+    EquityCurveState,
+    LedgerVersion,
+    Transaction,
+    drop_version_triggers,
+    transaction_fingerprint,
+)
+
+LEGACY_TRANSACTIONS = """
+CREATE TABLE transactions (
+    id INTEGER PRIMARY KEY,
+    asset_id INTEGER NOT NULL REFERENCES assets (id),
+    data DATE NOT NULL,
+    tipo VARCHAR NOT NULL,
+    preco_unit FLOAT NOT NULL,
+    quantidade FLOAT NOT NULL,
+    taxas FLOAT NOT NULL,
+    valor_total FLOAT NOT NULL,
+    resultado FLOAT,
+    ganhos FLOAT,
+    CONSTRAINT uq_transactions_natural
+        UNIQUE (asset_id, data, tipo, preco_unit, quantidade, taxas, valor_total, resultado, ganhos)
+)
+"""
+INSERT_PRICE = "INSERT INTO prices (asset_id, data, preco, fonte) VALUES (1, ?, 1.0, 'b3')"
+
+
+def test_fingerprint_normalizes_the_natural_key():
+    row = {
+        "asset_id": 1,
+        "data": date(2024, 1, 2),
+        "tipo": "BUY",
+        "preco_unit": 0.1 + 0.2,
+        "quantidade": 10.0,
+        "taxas": None,
+        "valor_total": 3.0,
+        "resultado": None,
+        "ganhos": None,
+    }
+    same = {**row, "data": "2024-01-02", "tipo": " buy", "preco_unit": 0.3, "taxas": 0.0}
+    assert len(transaction_fingerprint(row)) == 16
+    assert transaction_fingerprint(row) == transaction_fingerprint(same)
+    assert transaction_fingerprint(row) != transaction_fingerprint({**row, "quantidade": 10.5})
+    assert transaction_fingerprint(row) != transaction_fingerprint({**row, "resultado": 0.0})
+
+    # The chunked version used by the importer hashes the same bytes.
+    sell = {**row, "tipo": "SELL", "taxas": 0.5, "resultado": -12.25, "ganhos": 0.0}
+    frame = pd.DataFrame([row, same, sell])
+    assert transaction_fingerprints(frame) == [transaction_fingerprint(r) for r in (row, same, sell)]
+
+
+def test_migration_rebuilds_table_and_drops_duplicates(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legado.db'}", future=True)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE assets (id INTEGER PRIMARY KEY, nome VARCHAR NOT NULL UNIQUE)")
+        connection.exec_driver_sql(LEGACY_TRANSACTIONS)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO assets (id, nome) VALUES (1, 'PETR4'), (2, 'VALE3')")
+        # The old constraint let the repeated BUY in, since its NULLs never compare equal.
+        connection.exec_driver_sql(
+            "INSERT INTO transactions (id, asset_id, data, tipo, preco_unit, quantidade, taxas, valor_total) VALUES "
+            "(1, 1, '2024-01-02', 'BUY', 30.0, 10.0, 1.0, 301.0), "
+            "(2, 2, '2024-01-03', 'BUY', 70.0, 5.0, 0.0, 350.0), "
+            "(3, 1, '2024-01-02', 'BUY', 30.0, 10.0, 1.0, 301.0)"
+        )
+
+    with engine.begin() as connection:
+        assert add_transaction_fingerprints(connection) == [1]
+    with engine.begin() as connection:
+        assert add_transaction_fingerprints(connection) is None
+        names = connection.execute(text("SELECT name FROM sqlite_master WHERE tbl_name = 'transactions'")).scalars()
+        assert "sqlite_autoindex_transactions_1" in set(names)
+
+    with Session(engine) as session:
+        assert session.scalars(select(Transaction.id).order_by(Transaction.id)).all() == [1, 2]
+        version = session.scalar(select(LedgerVersion.versao))
+        session.add(
+            Transaction(
+                asset_id=2, data=date(2024, 2, 1), tipo="SELL", preco_unit=80.0, quantidade=5.0, valor_total=400.0
+            )
+        )
+        session.commit()
+        # The version triggers were recreated on the new table.
+        assert session.scalar(select(LedgerVersion.versao)) == version + 1
+    engine.dispose()
+
+
+def test_migration_makes_price_triggers_suspendable(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legado.db'}", future=True)
+    migrate(engine)
+    # A file from before the flag: no column, and triggers without a WHEN.
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM schema_version WHERE versao = 6")
+        drop_version_triggers(connection, "prices")
+        connection.exec_driver_sql("ALTER TABLE ledger_version DROP COLUMN suspenso")
+        connection.exec_driver_sql(
+            "CREATE TRIGGER trg_prices_insert_versao AFTER INSERT ON prices "
+            "BEGIN UPDATE ledger_version SET versao = versao + 1 WHERE id = 1; END"
+        )
+
+    assert migrate(engine) == 6
+    with engine.begin() as connection:
+        version = connection.execute(select(LedgerVersion.versao)).scalar()
+        connection.exec_driver_sql("INSERT INTO assets (id, nome) VALUES (1, 'PETR4')")
+        connection.exec_driver_sql("UPDATE ledger_version SET suspenso = 1")
+        connection.exec_driver_sql(INSERT_PRICE, ("2024-01-02",))
+        assert connection.execute(select(LedgerVersion.versao)).scalar() == version + 1
+        connection.exec_driver_sql("UPDATE ledger_version SET suspenso = 0")
+        connection.exec_driver_sql(INSERT_PRICE, ("2024-01-03",))
+        assert connection.execute(select(LedgerVersion.versao)).scalar() == version + 2
+        assert connection.execute(select(EquityCurveState.desde)).scalar() == date(2024, 1, 3)
+    engine.dispose()
+
+
+def test_migrate_applies_each_step_once(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'novo.db'}", future=True)
+    assert migrate(engine) == MIGRATIONS[-1].versao
+    with engine.connect() as connection:
+        assert schema_version(connection) == MIGRATIONS[-1].versao
+        tables = set(connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+    assert set(Base.metadata.tables) <= tables
+
+    # A current file only reads the version.
+    applied = []
+    steps = [Migration(m.versao, m.nome, lambda connection, m=m: applied.append(m.versao)) for m in MIGRATIONS]
+    monkeypatch.setattr(migrations, "MIGRATIONS", steps)
+    migrate(engine)
+    assert applied == []
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", [*steps, Migration(99, "nova", lambda c: applied.append(99))])
+    assert migrate(engine) == 99
+    assert migrate(engine) == 99
+    assert applied == [99]
+    engine.dispose()
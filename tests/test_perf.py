@@ -0,0 +1,51 @@
+import json
+import logging
+
+from sqlalchemy import create_engine, text
+
+from src import perf
+from src.logging_config import JsonPerfFormatter
+
+
+def test_disabled_instrumentation_is_a_no_op(monkeypatch):
+    monkeypatch.setattr(perf, "PERF_ENABLED", False)
+
+    def work():
+        return 1
+
+    assert perf.timed(work) is work
+    run = perf.start_run("página")
+    with perf.span("etapa"):
+        pass
+    assert run.spans == []
+
+
+def test_spans_nest_and_collect_sql(monkeypatch):
+    monkeypatch.setattr(perf, "PERF_ENABLED", True)
+    engine = create_engine("sqlite://", future=True)
+    perf.instrument_engine(engine)
+
+    @perf.timed
+    def query(conn):
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+
+    run = perf.start_run("página")
+    with engine.connect() as conn:
+        with perf.span("carga"):
+            query(conn)
+        conn.execute(text("SELECT 3"))
+
+    names = [(s.name, s.depth, s.sql_count) for s in run.spans]
+    assert names == [("carga", 0, 2), ("test_perf.test_spans_nest_and_collect_sql.<locals>.query", 1, 2)]
+    assert run.sql_count == 3
+    assert all(s.seconds >= s.sql_seconds for s in run.spans)
+
+
+def test_perf_log_lines_are_json():
+    record = logging.LogRecord("wallet.perf", logging.INFO, __file__, 1, "span", None, None)
+    record.perf = {"span": "queries.transactions_frame", "ms": 1.5, "sql": 1}
+    payload = json.loads(JsonPerfFormatter().format(record))
+    assert payload["span"] == "queries.transactions_frame"
+    assert payload["sql"] == 1
+    assert "ts" in payload
@@ -0,0 +1,96 @@
+import sys
+import types
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from src import portfolios
+from src.consolidation import consolidate
+from src.models import Asset, Price, Transaction
+from src.portfolios import create_portfolio, get_portfolio, list_portfolios
+from src.services.positions import record_transactions
+
+END = date(2024, 1, 10)
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(portfolios, "PORTFOLIOS_DIR", tmp_path / "carteiras")
+    return tmp_path / "carteiras"
+
+
+def _buy(portfolio, nome, day, quantidade, preco, cotacao):
+    with portfolio.database().SessionLocal() as session:
+        asset = session.scalar(select(Asset).where(Asset.nome == nome))
+        if asset is None:
+            asset = Asset(nome=nome)
+            session.add(asset)
+            session.flush()
+        tx = Transaction(
+            asset_id=asset.id,
+            data=day,
+            tipo="BUY",
+            preco_unit=preco,
+            quantidade=quantidade,
+            taxas=0.0,
+            valor_total=preco * quantidade,
+        )
+        session.add_all([tx, Price(asset_id=asset.id, data=END, preco=cotacao, fonte="manual")])
+        session.flush()
+        record_transactions(session, [tx])
+        session.commit()
+
+
+def test_portfolios_are_separate_files(registry):
+    renda = create_portfolio("renda")
+    acoes = create_portfolio("ações longo prazo")
+    assert [p.nome for p in list_portfolios()[1:]] == ["ações longo prazo", "renda"]
+    assert get_portfolio("renda") == renda
+    with pytest.raises(ValueError):
+        create_portfolio("renda")
+    with pytest.raises(ValueError):
+        create_portfolio("../fora")
+    with pytest.raises(ValueError):
+        get_portfolio("inexistente")
+
+    _buy(renda, "HGLG11", date(2024, 1, 2), 10.0, 150.0, 160.0)
+    with acoes.database().ReadSession() as session:
+        assert session.scalars(select(Asset)).all() == []
+    assert renda.snapshot_dir != acoes.snapshot_dir
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_consolidate_sums_positions_and_curves(registry, workers):
+    renda = create_portfolio("renda")
+    acoes = create_portfolio("acoes")
+    _buy(renda, "HGLG11", date(2024, 1, 2), 10.0, 150.0, 160.0)
+    _buy(acoes, "HGLG11", date(2024, 1, 5), 10.0, 170.0, 160.0)
+    _buy(acoes, "WEGE3", date(2024, 1, 5), 5.0, 40.0, 42.0)
+
+    result = consolidate([renda, acoes], END, workers=workers)
+    positions = result.positions.set_index("nome")
+    assert positions.loc["HGLG11", "quantidade"] == 20.0
+    assert positions.loc["HGLG11", "preco_medio"] == pytest.approx(160.0)
+    assert positions.loc["HGLG11", "carteiras"] == 2
+    assert positions.loc["WEGE3", "valor_atual"] == pytest.approx(210.0)
+    assert result.portfolios["valor_atual"].tolist() == pytest.approx([1600.0, 1810.0])
+
+    curve = result.curve.set_index("data")["patrimonio"]
+    # Only the first portfolio holds anything before January 5.
+    assert curve[date(2024, 1, 3).isoformat()] == pytest.approx(1500.0)
+    assert curve[END.isoformat()] == pytest.approx(3410.0)
+
+
+def test_consolidate_from_a_streamlit_page(registry, tmp_path, monkeypatch):
+    # The Consolidado page runs as __main__; the workers must not render it again.
+    page = tmp_path / "7_Consolidado.py"
+    page.write_text("raise SystemExit('página executada no worker')\n")
+    main = types.ModuleType("__main__")
+    main.__file__ = str(page)
+    monkeypatch.setitem(sys.modules, "__main__", main)
+
+    renda, acoes = create_portfolio("renda"), create_portfolio("acoes")
+    _buy(renda, "HGLG11", date(2024, 1, 2), 10.0, 150.0, 160.0)
+    result = consolidate([renda, acoes], END, workers=2)
+    assert result.portfolios["valor_atual"].tolist() == pytest.approx([1600.0, 0.0])
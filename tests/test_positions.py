@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+
+from src.models import Asset, Position, Transaction
+from src.services.positions import check_positions, load_positions, rebuild_positions, record_transactions
+
+
+def _tx(asset_id, day, tipo, preco, quantidade, taxas=0.0):
+    return Transaction(
+        asset_id=asset_id,
+        data=day,
+        tipo=tipo,
+        preco_unit=preco,
+        quantidade=quantidade,
+        taxas=taxas,
+        valor_total=preco * quantidade,
+    )
+
+
+def _add(session, *transactions):
+    session.add_all(transactions)
+    session.flush()
+    record_transactions(session, transactions)
+    session.commit()
+
+
+@pytest.fixture
+def asset_id(session):
+    asset = Asset(nome="PETR4")
+    session.add(asset)
+    session.commit()
+    return asset.id
+
+
+def test_record_transactions_incremental(session, asset_id):
+    _add(session, _tx(asset_id, date(2024, 1, 1), "BUY", 10.0, 10.0, 1.0))
+    _add(session, _tx(asset_id, date(2024, 2, 1), "BUY", 20.0, 5.0))
+    _add(session, _tx(asset_id, date(2024, 3, 1), "SELL", 30.0, 5.0))
+
+    position = load_positions(session)[asset_id]
+    assert position.quantidade == 10.0
+    assert position.preco_medio == pytest.approx(13.4)
+    assert session.get(Position, asset_id).ultima_data == date(2024, 3, 1)
+    assert check_positions(session) == []
+
+
+def test_record_transactions_backdated_recomputes_asset(session, asset_id):
+    _add(session, _tx(asset_id, date(2024, 1, 1), "BUY", 10.0, 10.0))
+    _add(session, _tx(asset_id, date(2024, 3, 1), "SELL", 30.0, 5.0))
+    _add(session, _tx(asset_id, date(2024, 2, 1), "BUY", 40.0, 10.0))
+
+    position = load_positions(session)[asset_id]
+    assert position.quantidade == 15.0
+    assert position.investido_liquido == pytest.approx(500.0 * 15 / 20)
+    assert session.get(Position, asset_id).ultima_data == date(2024, 3, 1)
+    assert check_positions(session) == []
+
+
+def test_rebuild_and_check(session, asset_id):
+    session.add(_tx(asset_id, date(2024, 1, 1), "BUY", 10.0, 10.0))
+    session.commit()
+    assert check_positions(session) == [asset_id]
+
+    assert rebuild_positions(session) == 1
+    assert check_positions(session) == []
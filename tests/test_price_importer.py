@@ -0,0 +1,88 @@
+import io
+from datetime import date
+
+import pytest
+from sqlalchemy import select, update
+
+from src.exporter import export_table
+from src.models import Asset, EquityCurveState, LedgerVersion, Price
+from src.price_importer import import_prices
+
+
+@pytest.fixture
+def assets(session):
+    session.add_all([Asset(nome="PETROBRAS PN", ticker_mercado="PETR4"), Asset(nome="VALE3")])
+    session.commit()
+
+
+def _prices(session):
+    rows = session.execute(
+        select(Asset.nome, Price.data, Price.preco, Price.fonte).join(Asset).order_by(Asset.nome, Price.data)
+    )
+    return [tuple(row) for row in rows]
+
+
+def test_import_maps_tickers_and_counts_rejects(session, assets):
+    source = io.BytesIO(
+        b"ticker,data,preco\n"
+        b"petr4,2024-01-02,38.5\n"
+        b"VALE3,2024-01-02,70.1\n"
+        b"ITUB4,2024-01-02,30.0\n"
+        b"PETR4,nunca,39.0\n"
+        b"PETR4,2024-01-03,0\n"
+    )
+    result = import_prices(session, source, fonte="b3", batch_size=2)
+    assert (result.rows, result.written, result.unknown, result.invalid) == (5, 2, 1, 2)
+    assert result.unknown_tickers == {"ITUB4"}
+    assert _prices(session) == [
+        ("PETROBRAS PN", date(2024, 1, 2), 38.5, "b3"),
+        ("VALE3", date(2024, 1, 2), 70.1, "b3"),
+    ]
+
+
+def test_reimport_only_writes_changed_prices(session, assets):
+    source = b"Ativo;Data;Fechamento;Fonte\nPETR4;02/01/2024;1.038,50;b3\nVALE3;02/01/2024;70,10;b3\n"
+    assert import_prices(session, io.BytesIO(source)).written == 2
+    version = session.scalar(select(LedgerVersion.versao))
+
+    # The same file again writes nothing and leaves the ledger version alone.
+    assert import_prices(session, io.BytesIO(source)).written == 0
+    assert session.scalar(select(LedgerVersion.versao)) == version
+
+    changed = source + b"PETR4;01/02/2024;40,00;b3\n"
+    session.execute(update(EquityCurveState).values(desde=None))
+    session.commit()
+    schema = session.connection().exec_driver_sql("PRAGMA schema_version").scalar()
+    assert import_prices(session, io.BytesIO(changed)).written == 1
+    assert session.scalar(select(LedgerVersion.versao)) == version + 1
+    # The curve is marked from the earliest price written, not from the
+    # unchanged rows before it, and the batch left the schema alone.
+    assert session.scalar(select(EquityCurveState.desde)) == date(2024, 2, 1)
+    assert session.connection().exec_driver_sql("PRAGMA schema_version").scalar() == schema
+    assert _prices(session) == [
+        ("PETROBRAS PN", date(2024, 1, 2), 1038.5, "b3"),
+        ("PETROBRAS PN", date(2024, 2, 1), 40.0, "b3"),
+        ("VALE3", date(2024, 1, 2), 70.1, "b3"),
+    ]
+    # Outside a batch the triggers still count ordinary writes.
+    session.add(Price(asset_id=1, data=date(2024, 1, 3), preco=39.0, fonte="manual"))
+    session.commit()
+    assert session.scalar(select(LedgerVersion.versao)) == version + 2
+    assert session.scalar(select(LedgerVersion.suspenso)) == 0
+
+
+def test_exported_parquet_imports_back(session, assets):
+    source = io.BytesIO(b"ticker,data,preco\nPETR4,2024-01-02,38.5\nVALE3,2024-01-03,70.1\n")
+    import_prices(session, source, fonte="b3")
+    exported = io.BytesIO()
+    export_table(session, "precos", exported, "parquet")
+    session.query(Price).delete()
+    session.commit()
+
+    exported.seek(0)
+    result = import_prices(session, exported, file_type="parquet")
+    assert (result.rows, result.written, result.unknown) == (2, 2, 0)
+    assert _prices(session) == [
+        ("PETROBRAS PN", date(2024, 1, 2), 38.5, "b3"),
+        ("VALE3", date(2024, 1, 3), 70.1, "b3"),
+    ]
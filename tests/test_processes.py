@@ -0,0 +1,31 @@
+import sys
+import threading
+
+from streamlit.testing.v1 import AppTest
+
+
+def _pool_page():
+    import streamlit as st
+
+    from src.processes import spawn_pool
+
+    # A worker that ran this page would start a pool while bootstrapping,
+    # which breaks the pool.
+    with spawn_pool(2) as pool:
+        st.text(sum(pool.map(abs, [-1, -2, -3])))
+
+
+def test_pages_start_pools_concurrently(monkeypatch):
+    # Each script run installs its page as __main__, so two sessions starting
+    # pools at once keep replacing it under each other's launches.
+    # AppTest leaves the last page installed as __main__ too.
+    monkeypatch.setitem(sys.modules, "__main__", sys.modules["__main__"])
+    apps = [AppTest.from_function(_pool_page, default_timeout=60) for _ in range(2)]
+    threads = [threading.Thread(target=app.run) for app in apps]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for app in apps:
+        assert not app.exception
+        assert [element.value for element in app.text] == ["6"]
@@ -0,0 +1,164 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from src.models import Asset, Dividend, Price, Transaction
+from src.queries import (
+    assets_frame,
+    count_dividends,
+    count_transactions,
+    dividends_frame,
+    dividends_page,
+    latest_prices,
+    latest_prices_frame,
+    prices_frame,
+    transactions_frame,
+    transactions_page,
+)
+from src.services.portfolio import compute_positions, portfolio_timeseries
+
+
+@pytest.fixture
+def ledger(session):
+    petr = Asset(nome="PETR4", categoria="Ações")
+    hglg = Asset(nome="HGLG11", categoria="FII")
+    session.add_all([petr, hglg])
+    session.flush()
+    session.add_all(
+        [
+            Transaction(
+                asset_id=petr.id,
+                data=date(2024, 1, 2),
+                tipo="BUY",
+                preco_unit=30.0,
+                quantidade=10.0,
+                taxas=1.0,
+                valor_total=300.0,
+            ),
+            Transaction(
+                asset_id=hglg.id,
+                data=date(2024, 1, 5),
+                tipo="BUY",
+                preco_unit=160.0,
+                quantidade=2.0,
+                taxas=0.0,
+                valor_total=320.0,
+            ),
+            Transaction(
+                asset_id=petr.id,
+                data=date(2024, 2, 1),
+                tipo="SELL",
+                preco_unit=35.0,
+                quantidade=4.0,
+                taxas=0.0,
+                valor_total=140.0,
+                resultado=20.0,
+                ganhos=20.0,
+            ),
+            Dividend(asset_id=hglg.id, data=date(2024, 2, 15), valor=2.2),
+            Price(asset_id=petr.id, data=date(2024, 3, 1), preco=38.0, fonte="manual"),
+        ]
+    )
+    session.commit()
+    return session
+
+
+def test_transactions_frame_types_and_join(ledger):
+    df = transactions_frame(ledger)
+    assert list(df["nome"]) == ["PETR4", "HGLG11", "PETR4"]
+    assert df["data"].dtype == "datetime64[ns]"
+    assert df["asset_id"].dtype == "int64"
+    assert df["resultado"].isna().tolist() == [True, True, False]
+    assert df["data"].iloc[-1] == pd.Timestamp(2024, 2, 1)
+
+
+def test_other_frames(ledger):
+    assert list(assets_frame(ledger)["nome"]) == ["HGLG11", "PETR4"]
+    assert dividends_frame(ledger)["valor"].tolist() == [2.2]
+    prices = prices_frame(ledger)
+    assert prices["nome"].tolist() == ["PETR4"]
+    assert prices["preco"].tolist() == [38.0]
+
+
+def test_services_accept_frames(ledger):
+    transactions = ledger.query(Transaction).all()
+    df = transactions_frame(ledger)
+
+    expected = compute_positions(transactions)
+    result = compute_positions(df)
+    for asset_id, position in expected.items():
+        assert result[asset_id].quantidade == position.quantidade
+        assert result[asset_id].investido_liquido == pytest.approx(position.investido_liquido)
+
+    expected_ts = portfolio_timeseries(transactions)
+    result_ts = portfolio_timeseries(df)
+    assert result_ts["patrimonio"].tolist() == pytest.approx(expected_ts["patrimonio"].tolist())
+
+
+def test_empty_frames(session):
+    df = transactions_frame(session)
+    assert df.empty
+    assert df["data"].dtype == "datetime64[ns]"
+    assert compute_positions(df) == {}
+    assert portfolio_timeseries(df).empty
+
+
+def test_latest_prices_prefers_manual_on_same_day(ledger):
+    petr, hglg = 1, 2
+    ledger.add_all(
+        [
+            Price(asset_id=petr, data=date(2024, 3, 1), preco=37.5, fonte="brapi"),
+            Price(asset_id=petr, data=date(2024, 2, 1), preco=36.0, fonte="manual"),
+            Price(asset_id=hglg, data=date(2024, 3, 4), preco=161.0, fonte="brapi"),
+            Price(asset_id=hglg, data=date(2024, 3, 4), preco=162.0, fonte="b3"),
+        ]
+    )
+    ledger.commit()
+    assert latest_prices(ledger) == {petr: 38.0, hglg: 162.0}
+    frame = latest_prices_frame(ledger)
+    assert dict(zip(frame["asset_id"], frame["fonte"])) == {petr: "manual", hglg: "b3"}
+
+
+def test_transaction_pages_walk_the_ledger_once(session):
+    asset = Asset(nome="ITSA4")
+    session.add(asset)
+    session.flush()
+    session.add_all(
+        [
+            Transaction(
+                asset_id=asset.id,
+                data=date(2024, 1, 1 + i // 3),
+                tipo="SELL" if i % 4 == 0 else "BUY",
+                preco_unit=10.0,
+                quantidade=1.0 + i,
+                taxas=0.0,
+                valor_total=10.0,
+            )
+            for i in range(11)
+        ]
+    )
+    session.commit()
+
+    seen, after = [], None
+    while True:
+        page = transactions_page(session, after=after, limit=4)
+        seen.extend(page.rows["quantidade"].tolist())
+        if page.next_key is None:
+            break
+        after = page.next_key
+    assert sorted(seen) == [1.0 + i for i in range(11)]
+    assert len(seen) == count_transactions(session) == 11
+
+    sells = transactions_page(session, tipo="SELL", start=date(2024, 1, 2))
+    assert sells.rows["quantidade"].tolist() == [9.0, 5.0]
+    assert count_transactions(session, tipo="SELL", start=date(2024, 1, 2)) == 2
+    assert count_transactions(session, asset_ids=[asset.id + 1]) == 0
+
+
+def test_dividend_page_filters_by_asset_and_period(session, ledger):
+    page = dividends_page(session, start=date(2024, 1, 1), end=date(2024, 12, 31))
+    assert page.next_key is None
+    assert list(page.rows["data"]) == sorted(page.rows["data"], reverse=True)
+    assert count_dividends(session, start=date(2024, 1, 1), end=date(2024, 12, 31)) == len(page.rows)
+    assert count_dividends(session, end=date(2024, 2, 14)) == 0
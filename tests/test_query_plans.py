@@ -0,0 +1,35 @@
+from sqlalchemy import select, text
+
+from src.models import Dividend
+from src.queries import last_trade_prices_stmt, latest_prices_stmt
+from src.services.positions import ledger_stmt
+
+
+def _plan(session, stmt):
+    compiled = stmt.compile(session.get_bind(), compile_kwargs={"literal_binds": True})
+    return [row[3] for row in session.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))]
+
+
+def test_latest_prices_is_an_index_only_lookup(session):
+    plan = _plan(session, latest_prices_stmt())
+    assert any(step.startswith("SEARCH latest USING COVERING INDEX") for step in plan)
+    assert any(step.startswith("SEARCH prices USING INTEGER PRIMARY KEY") for step in plan)
+    assert not any("SCAN prices" in step or "SCAN latest" in step for step in plan)
+
+
+def test_last_trade_prices_seek_per_asset(session):
+    plan = _plan(session, last_trade_prices_stmt())
+    assert any(step.startswith("SEARCH latest USING") and "(asset_id=?)" in step for step in plan)
+    assert not any("SCAN transactions" in step or "SCAN latest" in step for step in plan)
+
+
+def test_asset_ledger_uses_asset_data_index(session):
+    plan = _plan(session, ledger_stmt([1, 2]))
+    assert any(step.startswith("SEARCH transactions USING") and "(asset_id=?)" in step for step in plan)
+    assert not any(step.startswith("SCAN transactions") for step in plan)
+
+
+def test_dividends_by_asset_and_date_use_index(session):
+    stmt = select(Dividend.valor).where((Dividend.asset_id == 1) & (Dividend.data >= "2024-01-01"))
+    plan = _plan(session, stmt)
+    assert any(step.startswith("SEARCH dividends USING") and "asset_id=? AND data>?" in step for step in plan)
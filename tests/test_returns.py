@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.services.returns import daily_cash_flows, money_weighted_return, returns_frame, summarize_returns
+
+
+def _curve(values, start="2024-01-01"):
+    return pd.DataFrame({"data": pd.date_range(start, periods=len(values), freq="D"), "patrimonio": values})
+
+
+def _flat_cdi(dates, daily_rate=0.0):
+    return pd.DataFrame({"data": dates, "indice": 100.0 * (1 + daily_rate) ** np.arange(1, len(dates) + 1)})
+
+
+def test_contributions_are_not_counted_as_gains():
+    # 100 grows 10%, then 100 more is deposited and everything grows 10% again.
+    curve = _curve([100.0, 110.0, 210.0, 231.0])
+    transactions = pd.DataFrame(
+        {
+            "data": pd.to_datetime(["2024-01-01", "2024-01-03"]),
+            "tipo": ["BUY", "BUY"],
+            "valor_total": [100.0, 100.0],
+        }
+    )
+    dividends = pd.DataFrame({"data": pd.Series([], dtype="datetime64[ns]"), "valor": pd.Series([], dtype=float)})
+    flows = daily_cash_flows(transactions, dividends, pd.DatetimeIndex(curve["data"]))
+    assert flows.tolist() == [100.0, 0.0, 100.0, 0.0]
+
+    frame = returns_frame(curve, flows, _flat_cdi(curve["data"]))
+    assert frame["retorno"].tolist() == pytest.approx([0.0, 0.10, 0.0, 0.10])
+    assert frame["indice_carteira"].iloc[-1] == pytest.approx(121.0)
+    assert frame["patrimonio_cdi"].tolist() == pytest.approx([100.0, 100.0, 200.0, 200.0])
+
+
+def test_sells_and_dividends_leave_the_portfolio():
+    curve = _curve([100.0, 60.0, 55.0])
+    transactions = pd.DataFrame(
+        {"data": pd.to_datetime(["2024-01-01", "2024-01-02"]), "tipo": ["BUY", "SELL"], "valor_total": [100.0, 50.0]}
+    )
+    dividends = pd.DataFrame({"data": pd.to_datetime(["2024-01-03", "2024-02-01"]), "valor": [5.0, 9.0]})
+    flows = daily_cash_flows(transactions, dividends, pd.DatetimeIndex(curve["data"]))
+    assert flows.tolist() == [100.0, -50.0, -5.0]
+
+    frame = returns_frame(curve, flows, _flat_cdi(curve["data"]))
+    assert frame["retorno"].tolist() == pytest.approx([0.0, 0.10, 0.0])
+
+
+def test_money_weighted_return_matches_known_irr():
+    # -1000 today, +1100 a year later: 10% a year.
+    dates = pd.Series(pd.to_datetime(["2023-01-01", "2024-01-01"]))
+    assert money_weighted_return(dates, pd.Series([1000.0, 0.0]), 1100.0) == pytest.approx(0.10)
+    # Two deposits of 1000 a year apart, 2310 at the end of year two: 10% a year.
+    dates = pd.Series(pd.to_datetime(["2022-01-01", "2023-01-01", "2024-01-01"]))
+    assert money_weighted_return(dates, pd.Series([1000.0, 1000.0, 0.0]), 2310.0) == pytest.approx(0.10, abs=1e-3)
+    # Nothing ever invested: no rate to solve for.
+    assert np.isnan(money_weighted_return(dates, pd.Series([0.0, 0.0, 0.0]), 0.0))
+
+
+def test_cdi_benchmark_grows_every_contribution_from_its_own_date():
+    dates = pd.date_range("2024-01-01", periods=5, freq="D")
+    rate = 0.01
+    curve = pd.DataFrame({"data": dates, "patrimonio": [100.0] * 5})
+    flows = np.array([100.0, 0.0, 100.0, 0.0, 0.0])
+    frame = returns_frame(curve, flows, _flat_cdi(dates, rate))
+
+    expected = 100.0 * (1 + rate) ** 4 + 100.0 * (1 + rate) ** 2
+    assert frame["patrimonio_cdi"].iloc[-1] == pytest.approx(expected)
+    summary = summarize_returns(frame)
+    assert summary.cdi == pytest.approx((1 + rate) ** 4 - 1)
+    assert summary.patrimonio_cdi_final == pytest.approx(expected)
@@ -0,0 +1,74 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from src.models import Asset, Dividend, Price, Transaction
+from src.queries import assets_frame, dividends_frame, last_trade_prices_frame, latest_prices_frame
+from src.services.positions import load_positions, rebuild_positions
+from src.services.snapshot import TRADE_PRICE_SOURCE, portfolio_snapshot
+
+
+def _buy(asset_id, day, price, qty):
+    return Transaction(
+        asset_id=asset_id, data=day, tipo="BUY", preco_unit=price, quantidade=qty, taxas=0.0, valor_total=price * qty
+    )
+
+
+def test_snapshot_prices_values_and_weights(session):
+    session.add_all(
+        [
+            Asset(id=1, nome="PETR4", categoria="Ações"),
+            Asset(id=2, nome="HGLG11", categoria="FII"),
+            Asset(id=3, nome="VALE3", categoria="Ações"),
+            _buy(1, date(2024, 1, 2), 30.0, 10.0),
+            _buy(2, date(2024, 1, 5), 160.0, 1.0),
+            _buy(2, date(2024, 2, 5), 170.0, 1.0),
+            _buy(3, date(2024, 1, 8), 60.0, 5.0),
+            Transaction(
+                asset_id=3,
+                data=date(2024, 3, 1),
+                tipo="SELL",
+                preco_unit=65.0,
+                quantidade=5.0,
+                taxas=0.0,
+                valor_total=325.0,
+                resultado=25.0,
+                ganhos=25.0,
+            ),
+            Price(asset_id=1, data=date(2024, 3, 1), preco=40.0, fonte="manual"),
+            Dividend(asset_id=2, data=date(2024, 3, 15), valor=2.5),
+            Dividend(asset_id=2, data=date(2024, 4, 15), valor=2.5),
+        ]
+    )
+    session.flush()
+    rebuild_positions(session)
+
+    snapshot = portfolio_snapshot(
+        assets_frame(session),
+        load_positions(session),
+        latest_prices_frame(session),
+        last_trade_prices_frame(session),
+        dividends_frame(session),
+    )
+
+    # Sold-out positions are left out; rows follow the asset name order.
+    assert snapshot["nome"].tolist() == ["HGLG11", "PETR4"]
+    hglg, petr = snapshot.to_dict("records")
+    assert (petr["preco"], petr["fonte_preco"], petr["valor_atual"]) == (40.0, "manual", 400.0)
+    assert (hglg["preco"], hglg["fonte_preco"]) == (170.0, TRADE_PRICE_SOURCE)
+    assert hglg["data_preco"] == pd.Timestamp(2024, 2, 5)
+    assert hglg["dividendos"] == pytest.approx(5.0)
+    assert snapshot["participacao"].sum() == pytest.approx(1.0)
+    assert petr["participacao"] == pytest.approx(400.0 / 740.0)
+
+
+def test_snapshot_empty(session):
+    snapshot = portfolio_snapshot(
+        assets_frame(session),
+        {},
+        latest_prices_frame(session),
+        last_trade_prices_frame(session),
+        dividends_frame(session),
+    )
+    assert snapshot.empty
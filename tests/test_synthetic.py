@@ -0,0 +1,27 @@
+import pandas as pd
+
+from benchmarks.suite import compare
+from benchmarks.synthetic import generate_portfolio, write_database
+from src.services.portfolio import compute_positions
+
+
+def test_generator_is_deterministic():
+    first = generate_portfolio(n_assets=5, n_trades=300, years=1, seed=3)
+    second = generate_portfolio(n_assets=5, n_trades=300, years=1, seed=3)
+    pd.testing.assert_frame_equal(first.transactions, second.transactions)
+    pd.testing.assert_frame_equal(first.dividends, second.dividends)
+
+
+def test_generated_ledger_never_goes_short(tmp_path):
+    portfolio = generate_portfolio(n_assets=5, n_trades=500, years=2, seed=1)
+    positions = compute_positions(portfolio.transactions)
+    assert all(position.quantidade >= 0 for position in positions.values())
+    assert set(portfolio.transactions["tipo"]) == {"BUY", "SELL"}
+    write_database(portfolio, tmp_path / "carteira.db")
+
+
+def test_compare_flags_only_relevant_regressions():
+    baseline = {"resultados": {"a": {"pequena": 1.0}, "b": {"pequena": 0.001}, "c": {"pequena": 1.0}}}
+    current = {"resultados": {"a": {"pequena": 1.5}, "b": {"pequena": 0.003}, "c": {"pequena": 1.1}, "d": {}}}
+    flagged = {case for case, _, _, _, regressed in compare(baseline, current, 0.25, 0.01) if regressed}
+    assert flagged == {"a"}
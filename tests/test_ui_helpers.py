@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+from datetime import date
+
+import pytest
+from streamlit.delta_generator import DeltaGenerator
+from streamlit.testing.v1 import AppTest
+
+from src import portfolios
+from src.db import ChangeTracker
+from src.models import Asset, EquityCurvePoint, Price
+from src.portfolios import create_portfolio
+from src.ui_helpers import VersionedCache, ledger_version, portfolio_state
+
+
+def test_versioned_cache_reloads_only_on_new_version():
+    cache = VersionedCache(max_entries=4)
+    loads = []
+
+    def load(value):
+        loads.append(value)
+        return value
+
+    assert cache.get("ledger", 1, lambda: load("a")) == "a"
+    assert cache.get("ledger", 1, lambda: load("b")) == "a"
+    assert cache.get("ledger", 2, lambda: load("c")) == "c"
+    assert loads == ["a", "c"]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_versioned_cache_evicts_least_recently_used():
+    cache = VersionedCache(max_entries=2)
+    cache.get("a", 1, lambda: 1)
+    cache.get("b", 1, lambda: 2)
+    cache.get("a", 1, lambda: 1)
+    cache.get("c", 1, lambda: 3)
+    assert cache.get("a", 1, lambda: "recarregado") == 1
+    assert cache.get("b", 1, lambda: "recarregado") == "recarregado"
+
+
+def test_versioned_cache_loads_outside_the_lock():
+    cache = VersionedCache()
+    cache.get("assets", 1, lambda: "ativos")
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def slow():
+        loads.append("ledger")
+        started.set()
+        return "ledger" if release.wait(2) else "bloqueado"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("ledger", 1, slow))) for _ in range(2)]
+    threads[0].start()
+    started.wait(5)
+    threads[1].start()
+    # A warm key is served while the ledger is still loading.
+    assert cache.get("assets", 1, lambda: "recarregado") == "ativos"
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["ledger", "ledger"]
+    assert loads == ["ledger"]
+
+    # A failed load is not cached; the next caller loads again.
+    def failing():
+        raise RuntimeError("falhou")
+
+    with pytest.raises(RuntimeError):
+        cache.get("curva", 1, failing)
+    assert cache.get("curva", 1, lambda: "curva") == "curva"
+
+
+def test_change_tracker_sees_commits_from_other_connections(tmp_path):
+    path = tmp_path / "wallet.db"
+    writer = sqlite3.connect(path)
+    writer.execute("CREATE TABLE t (x INTEGER)")
+    writer.commit()
+    tracker = ChangeTracker(path)
+    before = tracker.version()
+    assert tracker.version() == before
+    writer.execute("INSERT INTO t VALUES (1)")
+    assert tracker.version() == before
+    writer.commit()
+    assert tracker.version() != before
+    tracker.close()
+    writer.close()
+
+
+def _export_page():
+    from src.ui_helpers import export_button
+
+    export_button("precos", "precos")
+
+
+def test_export_reads_the_selected_portfolio_off_the_script_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(portfolios, "DB_PATH", tmp_path / "principal.db")
+    monkeypatch.setattr(portfolios, "PORTFOLIOS_DIR", tmp_path / "carteiras")
+    renda = create_portfolio("renda")
+    with renda.database().SessionLocal() as session:
+        asset = Asset(nome="HGLG11")
+        session.add(asset)
+        session.flush()
+        session.add(Price(asset_id=asset.id, data=date(2024, 1, 2), preco=160.0, fonte="manual"))
+        session.commit()
+
+    builders = []
+    monkeypatch.setattr(DeltaGenerator, "download_button", lambda self, label, data, **kwargs: builders.append(data))
+    app = AppTest.from_function(_export_page)
+    app.session_state["carteira"] = "renda"
+    app.run()
+    assert not app.exception
+
+    # Streamlit calls the builder from a thread of its own, outside the script run.
+    exported = []
+    thread = threading.Thread(target=lambda: exported.append(builders[0]()))
+    thread.start()
+    thread.join()
+    assert b"HGLG11" in exported[0]
+
+
+def test_stored_equity_curve_keeps_the_ledger_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(portfolios, "PORTFOLIOS_DIR", tmp_path / "carteiras")
+    state = portfolio_state(create_portfolio("renda"))
+    version = ledger_version(state)
+    data_version = state.database.changes.version()
+
+    with state.database.SessionLocal() as session:
+        session.add(EquityCurvePoint(data=date(2024, 1, 2), patrimonio=100.0))
+        session.commit()
+    assert state.database.changes.version() != data_version
+    assert ledger_version(state) == version
+
+    with state.database.SessionLocal() as session:
+        session.add(Asset(nome="HGLG11"))
+        session.commit()
+    assert ledger_version(state) != version